@@ -4,17 +4,25 @@ from .controllers_ml import (
     predict_item_prices,
     get_group_with_models,
     delete_group_model,
+    get_item_training_graph,
+)
+from .controllers_steam import (
+    get_steam_top_games,
+    get_steam_top_inventory_items,
+    get_steam_item_history,
+    ingest_steam_price_histories,
 )
-from .controllers_steam import get_steam_top_games, get_steam_item_history
 from .controllers_items import (
     get_all_groups,
     get_group_by_id,
     create_group,
     update_group_name,
     add_item_to_group,
+    add_items_to_group_bulk,
     remove_item_from_group,
     delete_group,
     get_group_items,
+    get_group_item_history,
 )
 
 
@@ -27,15 +35,20 @@ __all__ = [
     "create_group",
     "update_group_name",
     "add_item_to_group",
+    "add_items_to_group_bulk",
     "remove_item_from_group",
     "delete_group",
     "get_group_items",
+    "get_group_item_history",
     # Steam Controllers
     "get_steam_top_games",
+    "get_steam_top_inventory_items",
     "get_steam_item_history",
+    "ingest_steam_price_histories",
     # ML Controllers
     "group_train_model",
     "predict_item_prices",
     "get_group_with_models",
     "delete_group_model",
+    "get_item_training_graph",
 ]
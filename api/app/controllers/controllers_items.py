@@ -1,25 +1,48 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from steam_market_s3_utils import validate_price_history, read_price_points
 from app.auth.cognito_jwt import get_current_user
-from app.services.sklearn import SklearnClient
-from app.services.redis import redis_cache
+from app.services.redis import redis_cache, GROUPS_NAMESPACE, group_namespace, user_namespace
+from app.services.price_history import price_history_ingestion
+from app.services.rate_limiter import RateLimitExceeded
+from app.services.steam import SteamUpstreamError
+from app.controllers.controllers_steam import steam_upstream_error
 from app.models import (
-    model_get_all_groups,
+    model_iter_groups_page,
     model_get_group_by_id,
     model_create_group,
     model_update_group,
     model_remove_group,
     model_add_item_to_group,
+    model_add_items_to_group,
     model_remove_item_from_group,
-    model_get_group_items
+    model_get_group_items_summary,
+    model_get_group_items_json,
+    model_get_group_item_history,
 )
-import logging
+import asyncio, json, logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Initialize sklearn client
-sklearn_client = SklearnClient()
+# Page size bounds for keyset pagination of public groups
+GROUPS_PAGE_DEFAULT = 50
+GROUPS_PAGE_MAX = 200
+GROUPS_PAGE_TTL = 300
+
+# Upper bound on items accepted by a single bulk insert
+BULK_ITEMS_MAX = 500
+
+# Cache key holding a group
+async def _group_cache_key(group_id: int):
+    return await redis_cache.versioned_key(f"group:{group_id}", group_namespace(group_id))
+
+# Cache key holding a user's view of a group's items
+async def _group_items_cache_key(group_id: int, user_id: int, view: str):
+    key = f"group:{group_id}:items:{user_id}" + (":summary" if view == "summary" else "")
+    return await redis_cache.versioned_key(key, group_namespace(group_id), user_namespace(user_id))
 
 # Create a new group
 async def create_group(request: Request, user=Depends(get_current_user)):
@@ -29,8 +52,8 @@ async def create_group(request: Request, user=Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Title is required")
     try:
         result = model_create_group(user["user_id"], title)
-        # Invalidate cache for all groups
-        await redis_cache.delete("groups:all")
+        # Invalidate cached pages of all groups
+        await redis_cache.bump_generation(GROUPS_NAMESPACE)
         logger.info(f"Group created: {title} for user {user['user_id']}")
         return {
             "message": "Group created",
@@ -51,42 +74,120 @@ async def update_group_name(group_id: int, request: Request, user=Depends(get_cu
         if not result.get("updated"):
             raise HTTPException(status_code=404, detail="Group not found or not owned by user")
         # Invalidate cache for this group and all groups
-        await redis_cache.delete(f"group:{group_id}")
-        await redis_cache.delete("groups:all")
-        logger.info(f"Cache invalidated for group {group_id} and all groups")
+        await redis_cache.bump_generation(group_namespace(group_id), GROUPS_NAMESPACE)
+        logger.info(f"Cache invalidated for group {group_id} and all group pages")
         return {"message": f"Group name updated to {title}"}
     except Exception as e:
         logger.error(f"Error updating group name: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Add item to an existing group
+# Add item to an existing group, either with an uploaded price history or referencing the shared one for its appid
 async def add_item_to_group(group_id: int, request: Request, user=Depends(get_current_user)):
     try:
         data = await request.json()
         item_name = data.get("item_name")
         item_json = data.get("item_json")
+        appid = data.get("appid")
 
-        is_valid, error_msg = await sklearn_client.validate_price_history(item_json)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=f"Invalid price history: {error_msg}")
-        if not item_name or not item_json or not group_id:
-            raise HTTPException(status_code=400, detail="Item name, item JSON, and Group ID are required")
+        if item_json is not None and not isinstance(item_json, dict):
+            raise HTTPException(status_code=400, detail="Item JSON must be an object")
+
+        price_history_id = None
+        points = None
+        if appid and not (item_json or {}).get("prices"):
+            if not item_name or not group_id:
+                raise HTTPException(status_code=400, detail="Item name and Group ID are required")
+            # Fetched once per market item and shared by every group tracking it instead of copied per user
+            market_hash_name = data.get("market_hash_name") or item_name
+            try:
+                price_history = await price_history_ingestion.ingest(appid, market_hash_name)
+            except RateLimitExceeded as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            except SteamUpstreamError as e:
+                logger.warning(f"Steam price history fetch failed for {market_hash_name}: {str(e)}")
+                raise steam_upstream_error(e)
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            price_history_id = price_history["id"]
+            item_json = {**(item_json or {}), "appid": appid, "market_hash_name": market_hash_name}
+        else:
+            is_valid, error_msg = validate_price_history(item_json)
+            if not is_valid:
+                raise HTTPException(status_code=400, detail=f"Invalid price history: {error_msg}")
+            if not item_name or not item_json or not group_id:
+                raise HTTPException(status_code=400, detail="Item name, item JSON, and Group ID are required")
+            # Converted here so entries the packed storage cannot hold are a 400, not a failed insert
+            points, error_msg = await run_in_threadpool(read_price_points, item_json["prices"])
+            if points is None:
+                raise HTTPException(status_code=400, detail=f"Invalid price history: {error_msg}")
 
         logger.info(f"Adding item {item_name} to group {group_id} for user {user['user_id']}")
-        result = model_add_item_to_group(user["user_id"], group_id, item_name, item_json)
+        result = model_add_item_to_group(user["user_id"], group_id, item_name, item_json, price_history_id, points)
         if not result.get("added"):
             raise HTTPException(status_code=404, detail="Group not found, not owned by user, or item could not be added")
         
-        await redis_cache.delete(f"group:{group_id}:items:{user['user_id']}")
-        logger.info(f"Cache deleted for group {group_id} items")
+        await redis_cache.bump_generation(group_namespace(group_id))
+        logger.info(f"Cache invalidated for group {group_id}")
         return {
             "message": f"Item {item_name} added to group",
             "id": result.get("id")
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in add_item_to_group: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Validate and convert every item of a bulk insert, returning the per-item errors and the converted points
+def _validate_bulk_items(items: list):
+    errors = []
+    points = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("item_name") or not item.get("item_json"):
+            errors.append({"index": index, "error": "Item name and item JSON are required"})
+            continue
+        is_valid, error_msg = validate_price_history(item["item_json"])
+        if is_valid:
+            # Converting is the costly step and what the insert needs, so it happens here once
+            item_points, error_msg = read_price_points(item["item_json"]["prices"])
+            if item_points is not None:
+                points.append(item_points)
+                continue
+        errors.append({"index": index, "item_name": item["item_name"], "error": f"Invalid price history: {error_msg}"})
+    return errors, points
+
+# Add many items to an existing group in a single transaction
+async def add_items_to_group_bulk(group_id: int, request: Request, user=Depends(get_current_user)):
+    try:
+        data = await request.json()
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            raise HTTPException(status_code=400, detail="A non-empty 'items' list is required")
+        if len(items) > BULK_ITEMS_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {BULK_ITEMS_MAX} items can be added at once")
+
+        # Validate locally off the event loop, rejecting the whole batch if any item is invalid
+        errors, points = await run_in_threadpool(_validate_bulk_items, items)
+        if errors:
+            raise HTTPException(status_code=400, detail={"message": "Invalid items", "errors": errors})
+
+        logger.info(f"Adding {len(items)} items to group {group_id} for user {user['user_id']}")
+        result = model_add_items_to_group(user["user_id"], group_id, items, points)
+        if not result.get("added"):
+            raise HTTPException(status_code=404, detail="Group not found or not owned by user")
+
+        await redis_cache.bump_generation(group_namespace(group_id))
+        logger.info(f"Cache invalidated for group {group_id}")
+        return {
+            "message": f"{len(result['ids'])} items added to group",
+            "ids": result["ids"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in add_items_to_group_bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Remove item from an existing group
 async def remove_item_from_group(group_id: int, request: Request, user=Depends(get_current_user)):
     data = await request.json()
@@ -98,8 +199,8 @@ async def remove_item_from_group(group_id: int, request: Request, user=Depends(g
         if not result.get("removed"):
             raise HTTPException(status_code=404, detail="Group or Item not found, or not owned by user")
         # Invalidate cache for this group's items
-        await redis_cache.delete(f"group:{group_id}:items:{user['user_id']}")
-        logger.info(f"Cache deleted for group {group_id} items")
+        await redis_cache.bump_generation(group_namespace(group_id))
+        logger.info(f"Cache invalidated for group {group_id}")
         return {"message": f"Item {item_name} removed from group"}
     except Exception as e:
         logger.error(f"Error removing item from group: {str(e)}")
@@ -112,29 +213,51 @@ async def delete_group(group_id: int, user=Depends(get_current_user)):
         if not result.get("deleted"):
             raise HTTPException(status_code=404, detail="Group not found or not owned by user")
         # Invalidate all related caches
-        await redis_cache.delete(f"group:{group_id}")
-        await redis_cache.delete(f"group:{group_id}:items:{user['user_id']}")
-        await redis_cache.delete("groups:all")
-        logger.info(f"Cache invalidated for group {group_id}, group items, and all groups")
+        await redis_cache.bump_generation(group_namespace(group_id), GROUPS_NAMESPACE)
+        logger.info(f"Cache invalidated for group {group_id}, group items and models, and all group pages")
         return {"message": "Group deleted"}
     except Exception as e:
         logger.error(f"Error deleting group: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Get all groups
-async def get_all_groups():
+# Stream rows as a JSON array, collecting them and flagging the page complete once the last row is sent
+def _stream_json_array(rows, page: list, state: dict):
+    yield "["
+    for index, row in enumerate(rows):
+        page.append(row)
+        yield ("," if index else "") + json.dumps(row)
+    yield "]"
+    state["complete"] = True
+
+# Cache a streamed page only when it was sent in full, not after a disconnect or a DB error mid-stream
+async def _cache_complete_page(cache_key: str, page: list, state: dict):
+    if state.get("complete"):
+        await redis_cache.set(cache_key, page, GROUPS_PAGE_TTL)
+    else:
+        logger.warning(f"Groups page {cache_key} was not sent in full, not caching it")
+
+# Get a page of groups, pass the last group id seen as `after` to fetch the next page
+async def get_all_groups(
+    after: int = Query(0, ge=0),
+    limit: int = Query(GROUPS_PAGE_DEFAULT, ge=1, le=GROUPS_PAGE_MAX),
+):
     try:
         # Check cache first
-        cached = await redis_cache.get("groups:all")
-        if cached:
-            logger.info("Cache hit for all groups")
+        cache_key = await redis_cache.versioned_key(f"groups:page:{after}:{limit}", GROUPS_NAMESPACE)
+        cached = await redis_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Cache hit for groups page after {after}")
             return JSONResponse(content=cached)
-        
-        # Cache miss: Query DB and cache
-        groups = model_get_all_groups()
-        await redis_cache.set("groups:all", groups, ttl=300)
-        logger.info("Cache set for all groups")
-        return JSONResponse(content=groups)
+
+        # Cache miss: Stream the page from a server-side cursor and cache it once fully sent
+        page, state = [], {}
+        rows = model_iter_groups_page(after, limit)
+        logger.info(f"Streaming groups page after {after} (limit {limit})")
+        return StreamingResponse(
+            _stream_json_array(rows, page, state),
+            media_type="application/json",
+            background=BackgroundTask(_cache_complete_page, cache_key, page, state),
+        )
     except Exception as e:
         logger.error(f"Error getting all groups: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -142,45 +265,66 @@ async def get_all_groups():
 # Get a group by ID
 async def get_group_by_id(group_id: int):
     try:
-        # Check cache first
-        cached = await redis_cache.get(f"group:{group_id}")
-        if cached:
-            logger.info(f"Cache hit for group {group_id}")
-            return JSONResponse(content=cached)
-        
-        # Cache miss: Query DB and cache
-        group = model_get_group_by_id(group_id)
+        # Read through the cache, concurrent misses share one DB query
+        group = await redis_cache.get_or_set(
+            await _group_cache_key(group_id), lambda: model_get_group_by_id(group_id), ttl=300
+        )
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
-        await redis_cache.set(f"group:{group_id}", group, ttl=300)
-        logger.info(f"Cache set for group {group_id}")
         return JSONResponse(content=group)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting group by ID {group_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Get all items in a group
-async def get_group_items(group_id: int, user=Depends(get_current_user)):
+# Get all items in a group, 'summary' view skips the price histories
+async def get_group_items(group_id: int, view: str = Query("full", pattern="^(full|summary)$"), user=Depends(get_current_user)):
     try:
+        # Fetch the cached group and the requested item view in a single round trip
+        group_key, cache_key = await asyncio.gather(
+            _group_cache_key(group_id), _group_items_cache_key(group_id, user["user_id"], view)
+        )
+        cached = await redis_cache.get_many([group_key, cache_key], decode=False)
+
         # Check group ownership first
-        group = model_get_group_by_id(group_id)
+        group = json.loads(cached[group_key]) if group_key in cached else model_get_group_by_id(group_id)
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
         if group["user_id"] != user["user_id"]:
             raise HTTPException(status_code=403, detail="Not authorized to view this group")
-        
-        # Check cache for items
-        cache_key = f"group:{group_id}:items:{user['user_id']}"
-        cached = await redis_cache.get(cache_key)
-        if cached:
-            logger.info(f"Cache hit for group {group_id} items")
-            return JSONResponse(content=cached)
-        
-        # Cache miss: Query DB and cache
-        items = model_get_group_items(user["user_id"], group_id)
-        await redis_cache.set(cache_key, items, ttl=300)
-        logger.info(f"Cache set for group {group_id} items")
-        return JSONResponse(content=items)
+
+        # Both views are cached as serialized JSON and served without a parse on the way through
+        if cache_key in cached:
+            logger.info(f"Cache hit for group {group_id} items ({view})")
+            return Response(content=cached[cache_key], media_type="application/json")
+
+        # Cache miss: concurrent requests share a single DB load of the view
+        if view == "summary":
+            items = await redis_cache.get_or_set(
+                cache_key, lambda: model_get_group_items_summary(user["user_id"], group_id), ttl=300
+            )
+            return JSONResponse(content=items)
+
+        items_json = await redis_cache.get_or_set(
+            cache_key, lambda: model_get_group_items_json(user["user_id"], group_id), ttl=300, raw=True
+        )
+        return Response(content=items_json, media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting group items: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Get the price history of a single item in a group
+async def get_group_item_history(group_id: int, item_id: int, user=Depends(get_current_user)):
+    try:
+        item_json = model_get_group_item_history(user["user_id"], group_id, item_id)
+        if item_json is None:
+            raise HTTPException(status_code=404, detail="Item not found in group or group not owned by user")
+        return Response(content=item_json, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting history for item {item_id} in group {group_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
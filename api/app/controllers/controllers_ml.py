@@ -1,17 +1,91 @@
 from fastapi import HTTPException, Depends, Request
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from app.auth.cognito_jwt import get_current_user
-from app.models import model_save_ml_index, model_get_ml_index, model_get_group_items, model_get_group_by_id, model_delete_ml_index
+from app.models import (
+    model_save_ml_index,
+    model_get_ml_index,
+    model_get_group_items,
+    model_get_group_item,
+    model_get_group_by_id,
+    model_get_group_items_with_ml_index,
+    model_delete_ml_index,
+)
 from app.services.sklearn import SklearnClient
 from app.services.sqs import sqs_client
-from app.services.redis import redis_cache
-from steam_market_s3_utils import S3StorageManager
+from app.services.redis import redis_cache, GROUPS_NAMESPACE, group_namespace, user_namespace
+from steam_market_s3_utils import get_storage_manager, validate_price_history, unpack_series
 from datetime import datetime
+from typing import Optional
+import numpy as np
 import os, logging
 
 # Initialize sklearn client
 sklearn_client = SklearnClient()
 
+# Model index changes flip the group's has_model flag, so the group and its listing go stale too
+async def _invalidate_group_models(group_id: int, user_id: int):
+    await redis_cache.bump_generation(group_namespace(group_id), user_namespace(user_id), GROUPS_NAMESPACE)
+
+# S3 keys of the artifacts saved for a trained model
+def _model_artifact_keys(data_hash: str):
+    return {
+        "model_url": f"models/model_{data_hash}.joblib",
+        "scaler_url": f"scalers/scaler_{data_hash}.joblib",
+        "stats_url": f"features/feature_means_{data_hash}.json",
+        "graph_url": f"graphs/training_graph_{data_hash}.png",
+    }
+
+# Graphs are streamed from storage in chunks of this many bytes
+GRAPH_CHUNK_SIZE = 64 * 1024
+
+# Clients asking for image/png get the graph itself instead of the JSON results
+def _wants_png(request: Request) -> bool:
+    return "image/png" in request.headers.get("accept", "")
+
+def _accepts_json(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return not accept or "application/json" in accept or "*/*" in accept
+
+def _open_graph(graph_key: str):
+    if os.path.exists(graph_key):
+        graph = open(graph_key, "rb")
+        return graph, iter(lambda: graph.read(GRAPH_CHUNK_SIZE), b"")
+    graph = get_storage_manager().open_file(graph_key)
+    if graph is None:
+        return None, None
+    return graph, graph.iter_chunks(GRAPH_CHUNK_SIZE)
+
+# Stream a stored graph PNG from the local storage directory or S3 without buffering it whole,
+# None when the API cannot reach it (LOCAL_STORAGE keys are paths inside the ML service's container)
+async def _graph_stream(graph_key: str) -> Optional[StreamingResponse]:
+    try:
+        graph, chunks = await run_in_threadpool(_open_graph, graph_key)
+    except OSError as e:
+        logger.warning(f"Could not open graph {graph_key}: {e}")
+        return None
+    if graph is None:
+        return None
+    return StreamingResponse(chunks, media_type="image/png", background=BackgroundTask(graph.close))
+
+# The graph when the client asked for an image and it can be opened, otherwise the JSON result if the client takes it
+async def _graph_or_result(request: Request, graph_key: str, result: dict):
+    if _wants_png(request):
+        graph = await _graph_stream(graph_key)
+        if graph is not None:
+            return graph
+        if not _accepts_json(request):
+            raise HTTPException(status_code=404, detail="Graph not found")
+        logger.warning(f"Graph {graph_key} is not reachable from the API, answering with JSON")
+    return result
+
+# Predicted series as [date, price] pairs
+def _prediction_points(series: dict):
+    times, prices = unpack_series(series)
+    dates = times.astype("datetime64[s]").astype("datetime64[D]").astype(str)
+    return [list(point) for point in zip(dates.tolist(), np.round(prices.astype("f8"), 2).tolist())]
+
 def use_sqs():
     """Check if SQS should be used - check dynamically each time"""
     #return False
@@ -41,6 +115,10 @@ async def group_train_model(request: Request, user=Depends(get_current_user)):
 
         logger.info(f"Found {len(group_items)} items to train for group {group_id}")
         results = []
+        # Items that could not be trained, reported alongside the trained ones instead of failing the group
+        failed = []
+        item_names = {}
+        training_jobs = []
         for item in group_items:
             item_id = item["id"]
             item_name = item["item_name"]
@@ -48,156 +126,152 @@ async def group_train_model(request: Request, user=Depends(get_current_user)):
             price_history = item_json.get("prices")
             price_history = {"prices": price_history}
 
-            logger.info(f"Training model for item {item_id} ({item_name}) in group {group_id}")
-
             # Validate JSON structure
-            is_valid, error_msg = await sklearn_client.validate_price_history(price_history)
+            is_valid, error_msg = validate_price_history(price_history)
             if not is_valid:
                 logger.error(f"Invalid price history for item {item_id}: {error_msg}")
-                raise HTTPException(status_code=400, detail=f"Invalid price history for item {item_id}: {error_msg}")
+                failed.append({"item_id": item_id, "item_name": item_name, "error": f"Invalid price history: {error_msg}"})
+                continue
+
+            if use_sqs():
+                # The worker reads the packed price points from the database, keeping the message small
+                success = sqs_client.send_training_job(
+                    user["user_id"],
+                    user["username"],
+                    group_id,
+                    item_id,
+                    item_name
+                )
 
-            # Call sklearn service to train model
+                if not success:
+                    logger.error(f"Failed to send training job to SQS for item {item_id}")
+                    failed.append({"item_id": item_id, "item_name": item_name, "error": "Failed to queue training job"})
+                    continue
+
+                logger.info(f"Training job queued for item {item_id} ({item_name})")
+                results.append({
+                    "item_id": item_id,
+                    "item_name": item_name,
+                    "message": "Training job queued. Please check back later for results."
+                })
+            else:
+                item_names[item_id] = item_name
+                training_jobs.append((item_id, item_name, price_history))
+
+        # Call sklearn service to train the models, a bounded number at once, saving each as it finishes
+        async for item_id, response in sklearn_client.train_models(user["user_id"], user["username"], training_jobs):
+            item_name = item_names[item_id]
             try:
-                if use_sqs():
-                    success = sqs_client.send_training_job(
-                        user["user_id"],
-                        user["username"],
-                        group_id,
-                        item_id,
-                        item_name,
-                        price_history
-                    )
-                    
-                    if not success:
-                        logger.error(f"Failed to send training job to SQS for item {item_id}")
-                        raise HTTPException(status_code=500, detail=f"Failed to queue training job for item {item_id}")
-                    
-                    logger.info(f"Training job queued for item {item_id} ({item_name})")
-                    results.append({
-                        "item_id": item_id,
-                        "item_name": item_name,
-                        "message": "Training job queued. Please check back later for results."
-                    })
-                else:
-                    response = await sklearn_client.train_model(
-                        user["user_id"], 
-                        user["username"], 
-                        item_id, 
-                        item_name, 
-                        price_history
-                    )
-                    
-                    if not response.get("success"):
-                        logger.error(f"Training failed for item {item_id} in group {group_id}")
-                        raise HTTPException(status_code=500, detail=f"Training failed for item {item_id}")
-                    
-                    model_data = response["data"]
-                    save_info = model_save_ml_index(
-                        user["user_id"],
-                        group_id,
-                        item_id,
-                        model_data["data_hash"]
-                    )
-                    
-                    logger.info(f"Successfully trained model for item {item_id} ({item_name})")
-                    results.append({
-                        "item_id": item_id,
-                        "item_name": item_name,
-                        "save_info": save_info,
-                        "graph": model_data["graph"],
-                        "graph_url": model_data["graph_url"],
-                        "metrics": model_data.get("metrics", {})
-                    })
+                if isinstance(response, Exception):
+                    raise response
+                if not response.get("success"):
+                    raise RuntimeError(response.get("message") or "Training failed")
+
+                model_data = response["data"]
+                save_info = model_save_ml_index(
+                    user["user_id"],
+                    group_id,
+                    item_id,
+                    model_data["data_hash"]
+                )
             except Exception as e:
-                logger.error(f"Training failed for item {item_id}: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Training failed for item {item_id}: {str(e)}")
+                logger.error(f"Training failed for item {item_id} in group {group_id}: {str(e)}")
+                failed.append({"item_id": item_id, "item_name": item_name, "error": f"Training failed: {str(e)}"})
+                continue
+
+            logger.info(f"Successfully trained model for item {item_id} ({item_name})")
+            results.append({
+                "item_id": item_id,
+                "item_name": item_name,
+                "save_info": save_info,
+                "graph_key": model_data["graph_key"],
+                "graph_url": model_data["graph_url"],
+                "metrics": model_data.get("metrics", {})
+            })
+
+        # Report the items in group order, whatever order their trainings finished in
+        positions = {item["id"]: position for position, item in enumerate(group_items)}
+        results.sort(key=lambda result: positions[result["item_id"]])
+        failed.sort(key=lambda failure: positions[failure["item_id"]])
 
         if not results:
-            logger.warning(f"No models trained for group {group_id} - no price history for any items")
-            raise HTTPException(status_code=400, detail="No models trained (no price history for any items)")
+            logger.warning(f"No models trained for group {group_id}: {len(failed)} items failed")
+            errors = "; ".join(f"item {failure['item_id']}: {failure['error']}" for failure in failed)
+            # Only invalid histories is the caller's problem, anything else failed on our side
+            invalid = all(failure["error"].startswith("Invalid price history") for failure in failed)
+            raise HTTPException(status_code=400 if invalid else 500, detail=f"No models trained ({errors})")
 
-        # Invalidate cache for this group's models
-        await redis_cache.delete(f"group:{group_id}:models:{user['user_id']}")
+        # Invalidate cache for this group's models, queued jobs invalidate again from the worker
+        await _invalidate_group_models(group_id, user["user_id"])
         logger.info(f"Cache invalidated for group {group_id} models, user {user['user_id']}")
         
-        logger.info(f"Group training completed for group {group_id}: {len(results)} models trained")
+        logger.info(f"Group training completed for group {group_id}: {len(results)} models trained, {len(failed)} failed")
         
-        # If only one item, return the singular graph and URL
-        if len(results) == 1:
-            return {
-                "graph": results[0]["graph"],  # Base64 PNG
-                "graph_url": results[0]["graph_url"]  # URL
-            }
-
-        # If multiple, return a JSON with graphs and URLs
-        return {"success": True, "trained_models": results}
+        # If the group has a single item, return its graph when asked for an image, otherwise its URL and metrics
+        if len(group_items) == 1 and "graph_key" in results[0]:
+            return await _graph_or_result(request, results[0]["graph_key"], {
+                "graph_url": results[0]["graph_url"],
+                "metrics": results[0]["metrics"]
+            })
+
+        # If multiple, return a JSON with graph URLs, the graphs themselves are streamed by GET .../graph
+        for result in results:
+            result.pop("graph_key", None)
+        return {"success": True, "trained_models": results, "failed_models": failed}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to train models for group {group_id}, user {user['user_id']}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to train models for group: {str(e)}")
 
-# Get a group that have generated models (Read: Cache result)
-async def get_group_with_models(group_id: int, user=Depends(get_current_user)):
-    try:
-        # Check cache first
-        cache_key = f"group:{group_id}:models:{user['user_id']}"
-        cached = await redis_cache.get(cache_key)
-        if cached:
-            logger.info(f"Cache hit for group {group_id} models, user {user['user_id']}")
-            return cached
-        
-        logger.info(f"Cache miss for group {group_id} models, user {user['user_id']} - querying database")
-        
-        # Cache miss: Query DB and cache
-        group = model_get_group_by_id(group_id)
-        if not group or group.get("user_id") != user["user_id"]:
-            raise HTTPException(status_code=404, detail="Group not found")
+# Build the model listing of a group from the database and S3, raising 404 if there is nothing to show
+def _load_group_with_models(group_id: int, user_id: int):
+    logger.info(f"Cache miss for group {group_id} models, user {user_id} - querying database")
+    group = model_get_group_by_id(group_id)
+    if not group or group.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Group not found")
 
-        # Get model info for each item
-        s3_manager = S3StorageManager()
-        items = model_get_group_items(user["user_id"], group_id)
-        items_with_models = []
-        for item in items:
-            item_id = item["id"]
-            item_name = item["item_name"]
-            model_info = model_get_ml_index(user["user_id"], item_id)
-            if model_info:
-                data_hash = model_info["data_hash"]
-                
-                # Generate download URLs for the artifacts
-                model_url = None
-                scaler_url = None
-                stats_url = None
-                graph_url = None
-                if s3_manager.s3_client:
-                    model_key = f"models/model_{data_hash}.joblib"
-                    model_url = s3_manager.generate_download_url(model_key)
-                    scaler_key = f"scalers/scaler_{data_hash}.joblib"
-                    scaler_url = s3_manager.generate_download_url(scaler_key)
-                    stats_key = f"features/feature_means_{data_hash}.json"
-                    stats_url = s3_manager.generate_download_url(stats_key)
-                    graph_key = f"graphs/training_graph_{data_hash}.png"
-                    graph_url = s3_manager.generate_download_url(graph_key)
-                items_with_models.append({
-                    "item_id": item_id,
-                    "item_name": item_name,
-                    "model_url": model_url,
-                    "scaler_url": scaler_url,
-                    "stats_url": stats_url,
-                    "graph_url": graph_url
-                })
+    # Get every item joined with its latest model info in a single query
+    items = [item for item in model_get_group_items_with_ml_index(user_id, group_id) if item["data_hash"]]
+
+    # Sign download URLs for every artifact of the group in one pass, reusing still valid ones
+    s3_manager = get_storage_manager()
+    artifact_keys = {item["item_id"]: _model_artifact_keys(item["data_hash"]) for item in items}
+    urls = {}
+    if s3_manager.s3_client:
+        urls = s3_manager.generate_download_urls(key for keys in artifact_keys.values() for key in keys.values())
+
+    items_with_models = []
+    for item in items:
+        items_with_models.append({
+            "item_id": item["item_id"],
+            "item_name": item["item_name"],
+            **{name: urls.get(key) for name, key in artifact_keys[item["item_id"]].items()},
+        })
 
-        if not items_with_models:
-            logger.warning(f"No generated models found for group {group_id}, user {user['user_id']}")
-            raise HTTPException(status_code=404, detail="No generated models found for this group")
-
-        result = {
-            "group_id": group_id,
-            "group_name": group["group_name"],
-            "items": items_with_models
-        }
-        await redis_cache.set(cache_key, result, ttl=300)
-        logger.info(f"Cache set for group {group_id} models, user {user['user_id']}")
-        return result
+    if not items_with_models:
+        logger.warning(f"No generated models found for group {group_id}, user {user_id}")
+        raise HTTPException(status_code=404, detail="No generated models found for this group")
+
+    return {
+        "group_id": group_id,
+        "group_name": group["group_name"],
+        "items": items_with_models
+    }
+
+# Get a group that have generated models (Read: Cache result, one loader per key on a miss)
+async def get_group_with_models(group_id: int, user=Depends(get_current_user)):
+    try:
+        cache_key = await redis_cache.versioned_key(
+            f"group:{group_id}:models:{user['user_id']}", group_namespace(group_id), user_namespace(user["user_id"])
+        )
+        return await redis_cache.get_or_set(
+            cache_key,
+            lambda: _load_group_with_models(group_id, user["user_id"]),
+            ttl=300
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to fetch group {group_id} with models for user {user['user_id']}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch group with models: {str(e)}")
@@ -207,25 +281,16 @@ async def delete_group_model(group_id: int, user=Depends(get_current_user)):
     try:
         logger.info(f"Deleting models for group {group_id}, user {user['user_id']}")
         
-        # Get all model_index entries for this group/user before deleting
-        items = model_get_group_items(user["user_id"], group_id)
-        model_files = []
-        for item in items:
-            model_info = model_get_ml_index(user["user_id"], item["id"])
-            if model_info:
-                data_hash = model_info["data_hash"]
-                model_files.append(f"models/model_{data_hash}.joblib")
-                model_files.append(f"scalers/scaler_{data_hash}.joblib")
-                model_files.append(f"features/feature_means_{data_hash}.json")
-                model_files.append(f"graphs/training_graph_{data_hash}.png")
-
-        # Delete from DB
+        # Delete from DB, the removed data hashes identify the artifacts to clean up
         result = model_delete_ml_index(user["user_id"], group_id)
         if result.get("deleted"):
+            model_files = []
+            for data_hash in result["data_hashes"]:
+                model_files.extend(_model_artifact_keys(data_hash).values())
             logger.info(f"Deleted {len(model_files)} model files for group {group_id}")
             
             # Delete files from disk or S3
-            s3_manager = S3StorageManager()
+            s3_manager = get_storage_manager()
             for f in model_files:
                 if os.path.exists(f):
                     try:
@@ -241,7 +306,7 @@ async def delete_group_model(group_id: int, user=Depends(get_current_user)):
                         logger.warning(f"Could not delete S3 object {f}: {e}")
             
             # Invalidate cache for this group's models
-            await redis_cache.delete(f"group:{group_id}:models:{user['user_id']}")
+            await _invalidate_group_models(group_id, user["user_id"])
             logger.info(f"Cache invalidated for group {group_id} models, user {user['user_id']}")
             return {"success": True, "message": "Models deleted for group", "group_id": group_id}
         else:
@@ -256,8 +321,7 @@ async def predict_item_prices(group_id: int, request: Request, user=Depends(get_
     try:
         data = await request.json()
         item_id = data.get("item_id")
-        items = model_get_group_items(user["user_id"], group_id)
-        item = next((i for i in items if i["id"] == item_id), None)
+        item = model_get_group_item(user["user_id"], group_id, item_id)
         if not item:
             raise HTTPException(status_code=404, detail="Item not found in group")
         item_name = item.get("item_name")
@@ -323,14 +387,37 @@ async def predict_item_prices(group_id: int, request: Request, user=Depends(get_
                 
                 prediction_data = response["data"]
                 logger.info(f"Successfully generated prediction for item {item_id} ({item_name})")
-                return {
-                    "graph": prediction_data["graph"],
-                    "graph_url": prediction_data["graph_url"]
-                }
+                return await _graph_or_result(request, prediction_data["graph_key"], {
+                    "graph_url": prediction_data["graph_url"],
+                    "predictions": _prediction_points(prediction_data["series"])
+                })
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Prediction failed for item {item_id}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to generate prediction for group {group_id}, user {user['user_id']}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate prediction: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate prediction: {str(e)}")
+
+# Stream the training graph of an item's latest model as image/png
+async def get_item_training_graph(group_id: int, item_id: int, user=Depends(get_current_user)):
+    try:
+        item = model_get_group_item(user["user_id"], group_id, item_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found in group")
+        model_info = model_get_ml_index(user["user_id"], item_id)
+        if not model_info:
+            raise HTTPException(status_code=404, detail="Model not found for user/item")
+        graph = await _graph_stream(_model_artifact_keys(model_info["data_hash"])["graph_url"])
+        if graph is None:
+            raise HTTPException(status_code=404, detail="Graph not found")
+        return graph
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to stream training graph for item {item_id} in group {group_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch training graph: {str(e)}")
@@ -1,23 +1,68 @@
-from fastapi import HTTPException, Request, Depends
+from fastapi import HTTPException, Request, Depends, Query
 from app.auth.cognito_jwt import get_current_user 
 from fastapi.responses import JSONResponse
 from app.services import steamAPI
+from app.services.steam import SteamPrivateError, SteamUpstreamError
+from app.services.steam_cache import steam_response_cache, steam_rate_limiter
+from app.services.rate_limiter import RateLimitExceeded
+from app.services.price_history import price_history_ingestion
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on items ingested by a single bulk price history request
+PRICE_HISTORY_BULK_MAX = 100
+
+# Steam throttling us is a 503 like our own request budget running out, anything else it failed at a 502
+def steam_upstream_error(e: SteamUpstreamError) -> HTTPException:
+    return HTTPException(status_code=503 if e.status_code == 429 else 502, detail=str(e))
+
+# Steam client for a user, with the shared response cache and rate limiter
+def _steam_client(user) -> steamAPI:
+    return steamAPI(user["steam_id"], cache=steam_response_cache, limiter=steam_rate_limiter)
+
 # Get top games for the authenticated user
 async def get_steam_top_games(user=Depends(get_current_user)):
     try:
         logger.info(f"Fetching top games for user {user['user_id']}")
-        steam = steamAPI(user["steam_id"])
-        top_games = steam.find_suitable_games()
+        steam = _steam_client(user)
+        top_games = await steam.find_suitable_games()
         logger.info(f"Successfully retrieved top games for user {user['user_id']}")
         return JSONResponse(content=top_games)
+    except RateLimitExceeded as e:
+        logger.warning(f"Steam request budget exhausted for user {user['user_id']}: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to fetch top games for user {user['user_id']}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Get the most held items of a game in the authenticated user's inventory
+async def get_steam_top_inventory_items(
+    appid: int,
+    top_n: int = Query(5, ge=1, le=100),
+    tradable_only: bool = Query(True),
+    include_icons: bool = Query(False),
+    user=Depends(get_current_user),
+):
+    try:
+        logger.info(f"Fetching top inventory items in app {appid} for user {user['user_id']}")
+        steam = _steam_client(user)
+        top_items = await steam.get_top_inventory_items(appid, top_n, tradable_only, include_icons)
+        logger.info(f"Successfully retrieved {len(top_items)} top inventory items for user {user['user_id']}")
+        return JSONResponse(content=top_items)
+    except SteamPrivateError as e:
+        logger.warning(f"Steam inventory is private for user {user['user_id']}: {str(e)}")
+        raise HTTPException(status_code=403, detail="Steam inventory is private")
+    except SteamUpstreamError as e:
+        logger.warning(f"Steam inventory fetch failed for user {user['user_id']}: {str(e)}")
+        raise steam_upstream_error(e)
+    except RateLimitExceeded as e:
+        logger.warning(f"Steam request budget exhausted for user {user['user_id']}: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to fetch top inventory items for user {user['user_id']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Get price history for a specific item
 async def get_steam_item_history(request: Request, user=Depends(get_current_user)):
     try:
@@ -29,10 +74,13 @@ async def get_steam_item_history(request: Request, user=Depends(get_current_user
             logger.warning(f"Missing appid or item_name for user {user['user_id']}")
             raise HTTPException(status_code=400, detail="App Id and Item name is required")
         
-        steam = steamAPI(user["steam_id"])
+        steam = _steam_client(user)
         try:
             logger.info(f"Searching for item '{item_name}' in app {appid} for user {user['user_id']}")
-            item_info = steam.search_item(appid, item_name)
+            item_info = await steam.search_item(appid, item_name)
+        except SteamUpstreamError as e:
+            logger.warning(f"Steam inventory fetch failed for user {user['user_id']}: {str(e)}")
+            raise steam_upstream_error(e)
         except ValueError as e:
             logger.warning(f"Item not found: {str(e)} for user {user['user_id']}")
             raise HTTPException(status_code=404, detail=str(e))
@@ -40,7 +88,7 @@ async def get_steam_item_history(request: Request, user=Depends(get_current_user
             logger.warning(f"Item not found in inventory for user {user['user_id']}")
             raise HTTPException(status_code=404, detail="Item not found in inventory")
         
-        item_history_url = steam.generate_price_history_url(
+        item_history_url = await steam.generate_price_history_url(
             appid=appid,
             marker_hash=item_info["market_hash_name"],
         )
@@ -48,6 +96,31 @@ async def get_steam_item_history(request: Request, user=Depends(get_current_user
         return JSONResponse(content={"price_history_url": item_history_url})
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        logger.warning(f"Steam request budget exhausted for user {user['user_id']}: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to fetch item history for user {user['user_id']}: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Ingest the shared price histories of many items of a game server side
+async def ingest_steam_price_histories(request: Request, user=Depends(get_current_user)):
+    try:
+        data = await request.json()
+        appid = data.get("appid")
+        market_hash_names = data.get("market_hash_names")
+        if not appid or not isinstance(market_hash_names, list) or not market_hash_names:
+            raise HTTPException(status_code=400, detail="App Id and a non-empty 'market_hash_names' list are required")
+        if len(market_hash_names) > PRICE_HISTORY_BULK_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {PRICE_HISTORY_BULK_MAX} items can be ingested at once")
+
+        logger.info(f"Ingesting {len(market_hash_names)} price histories in app {appid} for user {user['user_id']}")
+        results = await price_history_ingestion.ingest_many(appid, market_hash_names)
+        failed = sum("error" in result for result in results.values())
+        logger.info(f"Ingested {len(results) - failed} price histories ({failed} failed) for user {user['user_id']}")
+        return JSONResponse(content={"price_histories": results})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to ingest price histories for user {user['user_id']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,6 +3,8 @@ import psycopg2
 import time
 from psycopg2 import sql
 from distutils.util import strtobool
+from steam_market_s3_utils import price_points_from_list, pack_price_points
+import json
 
 # TODO Add to paramter store and secrets manager
 DB_HOST = "database-1-instance-1.ce2haupt2cta.ap-southeast-2.rds.amazonaws.com"
@@ -45,7 +47,9 @@ def drop_all_tables(conn: psycopg2.extensions.connection):
     try:
         tables_to_drop = [
             "model_index",
+            "group_item_prices",
             "group_items", 
+            "market_price_histories",
             "groups",
             "users"
         ]
@@ -102,6 +106,85 @@ def create_group_items_table(conn: psycopg2.extensions.connection):
     """)
     conn.commit()
 
+# Create group item prices table, one packed blob of timestamps, prices and volumes per item
+def create_group_item_prices_table(conn: psycopg2.extensions.connection):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS group_item_prices (
+            item_id INTEGER PRIMARY KEY REFERENCES group_items(id) ON DELETE CASCADE,
+            point_count INTEGER NOT NULL,
+            first_time BIGINT,
+            last_time BIGINT,
+            points BYTEA NOT NULL
+        );
+    """)
+    conn.commit()
+
+# Create the shared market price history table, one packed history per (appid, market_hash_name)
+# that any number of group items can reference through group_items.price_history_id
+def create_market_price_histories_table(conn: psycopg2.extensions.connection):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS market_price_histories (
+            id SERIAL PRIMARY KEY,
+            appid INTEGER NOT NULL,
+            market_hash_name VARCHAR(255) NOT NULL,
+            point_count INTEGER NOT NULL,
+            first_time BIGINT,
+            last_time BIGINT,
+            fetched_at BIGINT NOT NULL,
+            points BYTEA NOT NULL,
+            UNIQUE (appid, market_hash_name)
+        );
+    """)
+    cursor.execute("""
+        ALTER TABLE group_items ADD COLUMN IF NOT EXISTS price_history_id INTEGER
+        REFERENCES market_price_histories(id) ON DELETE SET NULL;
+    """)
+    conn.commit()
+
+# Move price lists out of group_items.item_json into packed group_item_prices rows
+def migrate_item_json_prices(conn: psycopg2.extensions.connection, batch_size: int = 100):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT group_items.id FROM group_items
+        LEFT JOIN group_item_prices ON group_item_prices.item_id = group_items.id
+        WHERE group_item_prices.item_id IS NULL
+        ORDER BY group_items.id
+    """)
+    item_ids = [row[0] for row in cursor.fetchall()]
+    migrated = 0
+    for start in range(0, len(item_ids), batch_size):
+        cursor.execute(
+            "SELECT id, item_json FROM group_items WHERE id = ANY(%s)",
+            (item_ids[start:start + batch_size],)
+        )
+        for item_id, item_json in cursor.fetchall():
+            try:
+                metadata = json.loads(item_json)
+                prices = metadata.pop("prices", None) if isinstance(metadata, dict) else None
+                if not isinstance(prices, list):
+                    continue
+                points = price_points_from_list(prices)
+            except Exception as e:
+                print(f"Skipping price migration for item {item_id}: {e}")
+                continue
+            cursor.execute("""
+                INSERT INTO group_item_prices (item_id, point_count, first_time, last_time, points)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (
+                item_id,
+                len(points),
+                int(points.times.min()) if len(points) else None,
+                int(points.times.max()) if len(points) else None,
+                psycopg2.Binary(pack_price_points(points)),
+            ))
+            cursor.execute("UPDATE group_items SET item_json = %s WHERE id = %s", (json.dumps(metadata), item_id))
+            migrated += 1
+        conn.commit()
+    cursor.close()
+    if migrated:
+        print(f"Migrated price history of {migrated} items into group_item_prices.")
 
 # Create model index table
 def create_model_index_table(conn: psycopg2.extensions.connection):
@@ -116,6 +199,11 @@ def create_model_index_table(conn: psycopg2.extensions.connection):
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
     """)
+    # Serves the latest-model-per-item lookup (DISTINCT ON item_id ORDER BY created_at DESC)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS model_index_user_item_created_idx
+        ON model_index (user_id, item_id, created_at DESC);
+    """)
     conn.commit()
     
 # Initialize the database and create the tables if they don't exist
@@ -131,7 +219,10 @@ def init_db():
         create_user_table(conn)
         create_groups_table(conn)
         create_group_items_table(conn)
+        create_group_item_prices_table(conn)
+        create_market_price_histories_table(conn)
         create_model_index_table(conn)
+        migrate_item_json_prices(conn)
         
         if RESET_DATABASE:
             print("Database reset and reinitialized successfully.")
@@ -27,6 +27,9 @@ def create_app():
     from app.routes.routes_users import router as users_router
     from app.routes.routes_steam import router as steam_router
     from app.routes.routes_auth import router as auth_router
+    from app.services.redis import redis_cache
+    from app.services.steam import close_http_client
+    from app.services.sklearn import close_http_client as close_sklearn_http_client, replica_pool
 
     app = FastAPI(
         title="Steam Market Price Predictor API",
@@ -42,9 +45,14 @@ def create_app():
         allow_headers=["*"],
     )
 
+    @app.on_event("shutdown")
+    async def shutdown():
+        await close_http_client()
+        await close_sklearn_http_client()
+
     @app.get("/health")
     def health():
-        return {"status": "ok"}
+        return {"status": "ok", "cache": redis_cache.stats(), "ml": replica_pool.status()}
 
     app.include_router(items_router, prefix="/group", tags=["Item Groups"])
     app.include_router(steam_router, prefix="/steam", tags=["Steam API"])
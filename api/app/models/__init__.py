@@ -5,15 +5,31 @@ from .models_users import (
 )
 from .models_items import (
     model_get_all_groups,
+    model_iter_groups_page,
     model_add_item_to_group,
+    model_add_items_to_group,
     model_create_group,
     model_get_group_by_id,
     model_remove_group,
     model_update_group,
     model_remove_item_from_group,
     model_get_group_items,
+    model_get_group_items_summary,
+    model_get_group_item,
+    model_get_group_item_history,
+    model_get_group_items_json,
+)
+from .models_prices import (
+    model_get_market_price_history,
+    model_save_market_price_history,
+    model_touch_market_price_history,
+)
+from .models_ml import (
+    model_save_ml_index,
+    model_get_ml_index,
+    model_get_group_items_with_ml_index,
+    model_delete_ml_index,
 )
-from .models_ml import model_save_ml_index, model_get_ml_index, model_delete_ml_index
 
 __all__ = [
     # User Models
@@ -22,15 +38,26 @@ __all__ = [
     "model_delete_user",
     # Item Models
     "model_get_all_groups",
+    "model_iter_groups_page",
     "model_add_item_to_group",
+    "model_add_items_to_group",
     "model_create_group",
     "model_get_group_by_id",
     "model_remove_group",
     "model_update_group",
     "model_remove_item_from_group",
     "model_get_group_items",
+    "model_get_group_items_summary",
+    "model_get_group_item",
+    "model_get_group_item_history",
+    "model_get_group_items_json",
+    # Price History Models
+    "model_get_market_price_history",
+    "model_save_market_price_history",
+    "model_touch_market_price_history",
     # ML Models
     "model_save_ml_index",
     "model_get_ml_index",
+    "model_get_group_items_with_ml_index",
     "model_delete_ml_index",
 ]
@@ -1,5 +1,46 @@
 from app.db import get_connection
-import json
+from steam_market_s3_utils import (
+    PricePoints,
+    price_points_from_list,
+    price_points_to_list,
+    price_points_to_json,
+    pack_price_points,
+    unpack_price_points,
+)
+from psycopg2.extras import execute_values
+import psycopg2, json
+
+PRICE_POINTS_UPSERT = """
+    INSERT INTO group_item_prices (item_id, point_count, first_time, last_time, points)
+    VALUES %s
+    ON CONFLICT (item_id) DO UPDATE SET
+        point_count = EXCLUDED.point_count,
+        first_time = EXCLUDED.first_time,
+        last_time = EXCLUDED.last_time,
+        points = EXCLUDED.points
+"""
+
+# Build the group_item_prices row for an item's price points
+def _price_points_row(item_id: int, points: PricePoints):
+    return (
+        item_id,
+        len(points),
+        int(points.times.min()) if len(points) else None,
+        int(points.times.max()) if len(points) else None,
+        psycopg2.Binary(pack_price_points(points)),
+    )
+
+# Store the packed price points of an item on an open cursor
+def _save_item_price_points(cursor, item_id: int, points: PricePoints):
+    execute_values(cursor, PRICE_POINTS_UPSERT, [_price_points_row(item_id, points)])
+
+# Add the packed prices back into the stored item_json metadata text as a "prices" list
+def _item_json_text_with_prices(item_json: str, points_blob):
+    if points_blob is None:
+        return item_json
+    prices_json = price_points_to_json(unpack_price_points(points_blob))
+    body = item_json.strip()[1:-1].strip()
+    return "{" + (body + ", " if body else "") + '"prices": ' + prices_json + "}"
 
 # Get all groups (with user info)
 def model_get_all_groups():
@@ -11,6 +52,22 @@ def model_get_all_groups():
     conn.close()
     return [dict(zip(columns, row)) for row in rows]
 
+# Stream one page of groups after a keyset cursor (the last group id seen) using a server-side cursor
+def model_iter_groups_page(after_id: int = 0, limit: int = 50, batch_size: int = 100):
+    conn = get_connection()
+    cursor = conn.cursor(name="groups_page")
+    cursor.itersize = batch_size
+    try:
+        cursor.execute("SELECT * FROM groups WHERE id > %s ORDER BY id LIMIT %s", (after_id, limit))
+        columns = None
+        for row in cursor:
+            if columns is None:
+                columns = [desc[0] for desc in cursor.description]
+            yield dict(zip(columns, row))
+    finally:
+        cursor.close()
+        conn.close()
+
 # Get all items in a group by group_id
 def model_get_group_by_id(group_id: int):
     conn = get_connection()
@@ -55,22 +112,75 @@ def model_remove_group(user_id: int, group_id: int):
     conn.close()
     return {"deleted": deleted}
 
-# Add an item to an existing group (must be owned by user)
-def model_add_item_to_group(user_id: int, group_id: int, item_name: str, item_json: dict):
+# Add an item to an existing group (must be owned by user), prices are stored packed in group_item_prices
+# unless the item references a shared market price history by price_history_id.
+# Pass the already converted points to skip converting item_json's prices again.
+def model_add_item_to_group(user_id: int, group_id: int, item_name: str, item_json: dict, price_history_id: int = None,
+                            points: PricePoints = None):
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id FROM groups WHERE id = %s AND user_id = %s", (group_id, user_id))
-    if not cursor.fetchone():
+    try:
+        cursor.execute("SELECT id FROM groups WHERE id = %s AND user_id = %s", (group_id, user_id))
+        if not cursor.fetchone():
+            return {"added": False}
+        metadata = {key: value for key, value in item_json.items() if key != "prices"}
+        cursor.execute(
+            "INSERT INTO group_items (group_id, item_name, item_json, price_history_id) VALUES (%s, %s, %s, %s) RETURNING id",
+            (group_id, item_name, json.dumps(metadata), price_history_id)
+        )
+        item_id = cursor.fetchone()[0]
+        if price_history_id is None:
+            if points is None:
+                points = price_points_from_list(item_json.get("prices") or [])
+            _save_item_price_points(cursor, item_id, points)
+        conn.commit()
+        return {"added": True, "id": item_id}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# Add many items to an existing group in one transaction (must be owned by user),
+# points holds each item's already converted price points in the same order when given
+def model_add_items_to_group(user_id: int, group_id: int, items: list, points: list = None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM groups WHERE id = %s AND user_id = %s", (group_id, user_id))
+        if not cursor.fetchone():
+            return {"added": False}
+        if points is None:
+            points = [price_points_from_list(item["item_json"].get("prices") or []) for item in items]
+        if len(points) != len(items):
+            raise ValueError(f"Got price points for {len(points)} of {len(items)} items")
+        # Ids are taken from the sequence up front, RETURNING order is not guaranteed to follow VALUES order
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence('group_items', 'id')) FROM generate_series(1, %s)",
+            (len(items),),
+        )
+        item_ids = [row[0] for row in cursor.fetchall()]
+        item_rows = [
+            (item_id, group_id, item["item_name"], json.dumps({key: value for key, value in item["item_json"].items() if key != "prices"}))
+            for item_id, item in zip(item_ids, items)
+        ]
+        execute_values(
+            cursor,
+            "INSERT INTO group_items (id, group_id, item_name, item_json) VALUES %s",
+            item_rows,
+            page_size=len(item_rows),
+        )
+        price_rows = [_price_points_row(item_id, item_points) for item_id, item_points in zip(item_ids, points)]
+        execute_values(cursor, PRICE_POINTS_UPSERT, price_rows, page_size=len(price_rows))
+        conn.commit()
+        return {"added": True, "ids": item_ids}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
         conn.close()
-        return {"added": False}
-    cursor.execute(
-        "INSERT INTO group_items (group_id, item_name, item_json) VALUES (%s, %s, %s) RETURNING id",
-        (group_id, item_name, json.dumps(item_json))
-    )
-    item_id = cursor.fetchone()[0]
-    conn.commit()
-    conn.close()
-    return {"added": True, "id": item_id}
 
 # Remove an item from an existing group (must be owned by user)
 def model_remove_item_from_group(user_id: int, group_id: int, item_name: str):
@@ -95,8 +205,11 @@ def model_get_group_items(user_id: int, group_id: int):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT group_items.* FROM group_items
+        SELECT group_items.*, COALESCE(group_item_prices.points, market_price_histories.points) AS points
+        FROM group_items
         JOIN groups ON group_items.group_id = groups.id
+        LEFT JOIN group_item_prices ON group_item_prices.item_id = group_items.id
+        LEFT JOIN market_price_histories ON market_price_histories.id = group_items.price_history_id
         WHERE groups.user_id = %s AND group_items.group_id = %s
     """, (user_id, group_id))
     rows = cursor.fetchall()
@@ -105,8 +218,80 @@ def model_get_group_items(user_id: int, group_id: int):
     conn.close()
     items = [dict(zip(columns, row)) for row in rows]
     for item in items:
+        points = item.pop("points")
         try:
             item["item_json"] = json.loads(item["item_json"])
         except Exception:
             pass
-    return items
\ No newline at end of file
+        if points is not None and isinstance(item["item_json"], dict):
+            item["item_json"]["prices"] = price_points_to_list(unpack_price_points(points))
+    return items
+
+# Get the id and name of every item in a group without loading price histories (must be owned by user)
+def model_get_group_items_summary(user_id: int, group_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT group_items.id, group_items.group_id, group_items.item_name FROM group_items
+        JOIN groups ON group_items.group_id = groups.id
+        WHERE groups.user_id = %s AND group_items.group_id = %s
+        ORDER BY group_items.id
+    """, (user_id, group_id))
+    rows = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    conn.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+# Get the id and name of a single item in a group (must be owned by user)
+def model_get_group_item(user_id: int, group_id: int, item_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT group_items.id, group_items.group_id, group_items.item_name FROM group_items
+        JOIN groups ON group_items.group_id = groups.id
+        WHERE groups.user_id = %s AND group_items.group_id = %s AND group_items.id = %s
+    """, (user_id, group_id, item_id))
+    row = cursor.fetchone()
+    columns = [desc[0] for desc in cursor.description]
+    conn.close()
+    return dict(zip(columns, row)) if row else None
+
+# Get the price history JSON text of a single item (must be owned by user)
+def model_get_group_item_history(user_id: int, group_id: int, item_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT group_items.item_json, COALESCE(group_item_prices.points, market_price_histories.points)
+        FROM group_items
+        JOIN groups ON group_items.group_id = groups.id
+        LEFT JOIN group_item_prices ON group_item_prices.item_id = group_items.id
+        LEFT JOIN market_price_histories ON market_price_histories.id = group_items.price_history_id
+        WHERE groups.user_id = %s AND group_items.group_id = %s AND group_items.id = %s
+    """, (user_id, group_id, item_id))
+    row = cursor.fetchone()
+    conn.close()
+    return _item_json_text_with_prices(row[0], row[1]) if row else None
+
+# Get all items in a group as a JSON array string, built from the stored text and packed prices without parsing
+def model_get_group_items_json(user_id: int, group_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT group_items.id, group_items.group_id, group_items.item_name, group_items.item_json,
+            COALESCE(group_item_prices.points, market_price_histories.points)
+        FROM group_items
+        JOIN groups ON group_items.group_id = groups.id
+        LEFT JOIN group_item_prices ON group_item_prices.item_id = group_items.id
+        LEFT JOIN market_price_histories ON market_price_histories.id = group_items.price_history_id
+        WHERE groups.user_id = %s AND group_items.group_id = %s
+        ORDER BY group_items.id
+    """, (user_id, group_id))
+    rows = cursor.fetchall()
+    conn.close()
+    # item_json is always written with json.dumps, so the stored text is already valid JSON
+    parts = [
+        f'{{"id": {item_id}, "group_id": {item_group_id}, "item_name": {json.dumps(item_name)}, '
+        f'"item_json": {_item_json_text_with_prices(item_json, points)}}}'
+        for item_id, item_group_id, item_name, item_json, points in rows
+    ]
+    return "[" + ", ".join(parts) + "]"
\ No newline at end of file
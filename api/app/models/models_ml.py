@@ -44,28 +44,42 @@ def model_get_ml_index(user_id: int, item_id: int):
     conn.close()
     return dict(zip(columns, row)) if row else None
 
-# Delete a model index for a specific item
-# HACK USING DIFFERENT CHECK FOR DELETE METHOD SINCE FOREIGN KEYS PROHIBIT DETECTING ROW CHANGE
-def model_delete_ml_index(user_id: int, group_id: int):
+# Get every item in a group joined with its latest model index in one round trip
+def model_get_group_items_with_ml_index(user_id: int, group_id: int):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT COUNT(*) FROM model_index WHERE group_id = %s AND user_id = %s
-    """, (group_id, user_id))
-    before_count = cursor.fetchone()[0]
+        SELECT DISTINCT ON (group_items.id)
+            group_items.id AS item_id,
+            group_items.item_name,
+            model_index.data_hash
+        FROM group_items
+        JOIN groups ON group_items.group_id = groups.id
+        LEFT JOIN model_index
+            ON model_index.item_id = group_items.id AND model_index.user_id = groups.user_id
+        WHERE groups.user_id = %s AND group_items.group_id = %s
+        ORDER BY group_items.id, model_index.created_at DESC NULLS LAST
+    """, (user_id, group_id))
+    rows = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    cursor.close()
+    conn.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+# Delete every model index for a group, returning the data hashes that were removed
+def model_delete_ml_index(user_id: int, group_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
     cursor.execute("""
         DELETE FROM model_index
         WHERE group_id = %s AND user_id = %s
+        RETURNING data_hash
     """, (group_id, user_id))
+    data_hashes = [row[0] for row in cursor.fetchall()]
     conn.commit()
-    cursor.execute("""
-        SELECT COUNT(*) FROM model_index WHERE group_id = %s AND user_id = %s
-    """, (group_id, user_id))
-    after_count = cursor.fetchone()[0]
-    deleted = before_count > after_count
-    #print("Rows before:", before_count, "Rows after:", after_count, "Deleted:", deleted)
+    deleted = len(data_hashes) > 0
     if deleted:
         model_set_group_has_ml(conn, group_id, False)
     cursor.close()
     conn.close()
-    return {"deleted": deleted}
\ No newline at end of file
+    return {"deleted": deleted, "data_hashes": data_hashes}
\ No newline at end of file
@@ -0,0 +1,60 @@
+from app.db import get_connection
+from steam_market_s3_utils import PricePoints, pack_price_points
+import psycopg2, time
+
+MARKET_PRICE_HISTORY_UPSERT = """
+    INSERT INTO market_price_histories (appid, market_hash_name, point_count, first_time, last_time, fetched_at, points)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (appid, market_hash_name) DO UPDATE SET
+        point_count = EXCLUDED.point_count,
+        first_time = EXCLUDED.first_time,
+        last_time = EXCLUDED.last_time,
+        fetched_at = EXCLUDED.fetched_at,
+        points = EXCLUDED.points
+    RETURNING id
+"""
+
+# Get the shared price history of a market item, with its packed points, or None if it was never ingested
+def model_get_market_price_history(appid: int, market_hash_name: str):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT * FROM market_price_histories WHERE appid = %s AND market_hash_name = %s",
+        (appid, market_hash_name)
+    )
+    row = cursor.fetchone()
+    columns = [desc[0] for desc in cursor.description]
+    cursor.close()
+    conn.close()
+    return dict(zip(columns, row)) if row else None
+
+# Store the full price history of a market item, returning its id
+def model_save_market_price_history(appid: int, market_hash_name: str, points: PricePoints):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(MARKET_PRICE_HISTORY_UPSERT, (
+        appid,
+        market_hash_name,
+        len(points),
+        int(points.times.min()) if len(points) else None,
+        int(points.times.max()) if len(points) else None,
+        int(time.time()),
+        psycopg2.Binary(pack_price_points(points)),
+    ))
+    price_history_id = cursor.fetchone()[0]
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return price_history_id
+
+# Mark a price history as checked against Steam without rewriting its points
+def model_touch_market_price_history(price_history_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE market_price_histories SET fetched_at = %s WHERE id = %s",
+        (int(time.time()), price_history_id)
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
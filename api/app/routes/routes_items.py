@@ -3,15 +3,18 @@ from app.controllers import (
     create_group,
     update_group_name,
     add_item_to_group,
+    add_items_to_group_bulk,
     remove_item_from_group,
     delete_group,
     get_all_groups,
     get_group_by_id,
     get_group_items,
+    get_group_item_history,
     group_train_model,
     predict_item_prices,
     get_group_with_models,
-    delete_group_model
+    delete_group_model,
+    get_item_training_graph
 )
 
 router = APIRouter()
@@ -22,8 +25,8 @@ router = APIRouter()
 # PUBLIC GROUPS
 
 # GET /
-# Takes: No body, no authentication.
-# Returns: JSON list of all groups.
+# Takes: Optional query params 'after' (last group id seen, default 0) and 'limit' (1-200, default 50). No authentication.
+# Returns: Streamed JSON list of up to 'limit' groups ordered by id, a shorter page means there are no more groups.
 router.get("/")(get_all_groups)
 
 # GET /{group_id}
@@ -50,15 +53,27 @@ router.put("/{group_id}")(update_group_name)
 router.delete("/{group_id}")(delete_group)
 
 # POST /{group_id}/items
-# Takes: JSON body with 'item_name' (str) and 'item_json' (dict). Requires authentication (JWT).
+# Takes: JSON body with 'item_name' (str) and 'item_json' (dict) holding the price history, or 'item_name',
+#        'appid' (int) and optionally 'market_hash_name' (defaults to item_name) to reference the shared history
+#        fetched from Steam server side. Requires authentication (JWT).
 # Returns: JSON message and item id if added, or 404/400/500 error if not found or missing fields.
 router.post("/{group_id}/items")(add_item_to_group)
 
+# POST /{group_id}/items/bulk
+# Takes: JSON body with 'items', a list of {'item_name': str, 'item_json': dict} (max 500). Requires authentication (JWT).
+# Returns: JSON message and the new item ids in input order, or 404/400/500 error if not found, any item is invalid, or server error.
+router.post("/{group_id}/items/bulk")(add_items_to_group_bulk)
+
 # GET /{group_id}/items
-# Takes: No body. Requires authentication (JWT).
-# Returns: JSON list of items in the group, or 500 error if server error.
+# Takes: Optional query param 'view' ('full' or 'summary', default 'full'). Requires authentication (JWT).
+# Returns: JSON list of items in the group, 'summary' omits item_json, or 500 error if server error.
 router.get("/{group_id}/items")(get_group_items)
 
+# GET /{group_id}/items/{item_id}/history
+# Takes: No body. Requires authentication (JWT).
+# Returns: The stored price history JSON for the item, or 404/500 error if not found or server error.
+router.get("/{group_id}/items/{item_id}/history")(get_group_item_history)
+
 # DELETE /{group_id}/items
 # Takes: JSON body with 'item_name' (str). Requires authentication (JWT).
 # Returns: JSON message if removed, or 404/400/500 error if not found or missing fields.
@@ -68,8 +83,8 @@ router.delete("/{group_id}/items")(remove_item_from_group)
 # PRIVATE MODELS
 
 # POST /{group_id}/train
-# Takes: No body. Requires authentication (JWT).
-# Returns: JSON with training results, or 400/500 error if group/items not found or server error.
+# Takes: No body. Requires authentication (JWT). Send 'Accept: image/png' to get the graph of a single trained item.
+# Returns: JSON with training results and graph URLs (or the PNG graph), or 400/500 error if group/items not found or server error.
 router.post("/{group_id}/train")(group_train_model)
 
 # GET /{group_id}/model
@@ -82,7 +97,12 @@ router.get("/{group_id}/model")(get_group_with_models)
 # Returns: JSON message if model deleted, or 404/500 error if not found or server error.
 router.delete("/{group_id}/model")(delete_group_model)
 
-# POST /{group_id}/predict
+# GET /{group_id}/items/{item_id}/graph
 # Takes: No body. Requires authentication (JWT).
-# Returns: JSON with prediction results, or 400/500 error if group/items not found or server error.
+# Returns: Streamed PNG training graph of the item's latest model, or 404/500 error if not found or server error.
+router.get("/{group_id}/items/{item_id}/graph")(get_item_training_graph)
+
+# POST /{group_id}/predict
+# Takes: JSON body with 'item_id', 'start_time' and 'end_time'. Requires authentication (JWT). Send 'Accept: image/png' for the graph.
+# Returns: JSON with the graph URL and predicted [date, price] points (or the PNG graph), or 400/500 error if group/items not found or server error.
 router.post("/{group_id}/predict")(predict_item_prices)
\ No newline at end of file
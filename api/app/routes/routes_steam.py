@@ -1,5 +1,10 @@
 from fastapi import APIRouter
-from app.controllers import get_steam_top_games, get_steam_item_history
+from app.controllers import (
+    get_steam_top_games,
+    get_steam_top_inventory_items,
+    get_steam_item_history,
+    ingest_steam_price_histories,
+)
 
 router = APIRouter()
 
@@ -8,7 +13,20 @@ router = APIRouter()
 # Returns: JSON list of the user's top suitable games by playtime.
 router.get("/top-games")(get_steam_top_games)
 
+# GET /inventory/{appid}/top-items
+# Takes: Path param 'appid', optional query params 'top_n' (1-100, default 5), 'tradable_only' (default true)
+#        and 'include_icons' (default false). Requires authentication (JWT).
+# Returns: JSON list of the most held items with 'count' and 'tradable_count', served from the cached inventory.
+#          403 if the inventory is private.
+router.get("/inventory/{appid}/top-items")(get_steam_top_inventory_items)
+
 # POST /item-history
 # Takes: JSON body with 'appid' (int) and 'item_name' (str). Requires authentication (JWT).
 # Returns: JSON with 'price_history_url' for the specified item, or 404/400 error if not found or missing fields.
-router.post("/item-history")(get_steam_item_history)
\ No newline at end of file
+router.post("/item-history")(get_steam_item_history)
+
+# POST /price-history
+# Takes: JSON body with 'appid' (int) and 'market_hash_names' (list of up to 100 str). Requires authentication (JWT).
+# Returns: JSON with 'price_histories' mapping each name to its shared history 'id', 'point_count' and 'added_points',
+#          or to an 'error' if Steam has no valid history for it.
+router.post("/price-history")(ingest_steam_price_histories)
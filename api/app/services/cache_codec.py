@@ -0,0 +1,158 @@
+from typing import Any, Optional
+import json, struct, zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Stored layout: magic byte, format id, compression id, then the (possibly compressed) payload.
+# JSON text never starts with a NUL byte, so values without the magic are pre-codec plain JSON.
+CODEC_MAGIC = 0
+CODEC_HEADER = struct.Struct("<BBB")
+
+FORMAT_TEXT = 0
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+FORMATS = {"json": FORMAT_JSON, "msgpack": FORMAT_MSGPACK}
+COMPRESSIONS = {
+    "none": COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "zstd": COMPRESSION_ZSTD,
+    "lz4": COMPRESSION_LZ4,
+}
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+
+def _compression_available(compression: int) -> bool:
+    if compression == COMPRESSION_ZSTD:
+        return zstandard is not None
+    if compression == COMPRESSION_LZ4:
+        return lz4 is not None
+    return True
+
+
+class CacheCodec:
+    """
+    Serializes cache values to bytes with a small header naming the format and compression used,
+    so any codec can read values written under a different configuration.
+    Payloads smaller than compress_threshold bytes are stored uncompressed.
+    """
+
+    def __init__(self, fmt: str = "json", compression: str = "zstd", compress_threshold: int = 1024,
+                 level: Optional[int] = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown cache format: {fmt}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        if fmt == "msgpack" and msgpack is None:
+            print("msgpack is not installed, caching as JSON")
+            fmt = "json"
+        if not _compression_available(COMPRESSIONS[compression]):
+            print(f"{compression} is not installed, compressing cache values with zlib")
+            compression = "zlib"
+
+        self.format = FORMATS[fmt]
+        self.compression = COMPRESSIONS[compression]
+        self.compress_threshold = compress_threshold
+        self.level = level
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize a value with the configured format."""
+        if self.format == FORMAT_MSGPACK:
+            return self._pack(FORMAT_MSGPACK, msgpack.packb(value, use_bin_type=True))
+        return self._pack(FORMAT_JSON, _json_dumps(value))
+
+    def encode_text(self, text: str) -> bytes:
+        """Store an already serialized string as is, only compressing it."""
+        return self._pack(FORMAT_TEXT, text.encode())
+
+    def decode(self, data: bytes) -> Any:
+        """Deserialize a stored value back into Python objects."""
+        fmt, payload = self._unpack(data)
+        if fmt == FORMAT_MSGPACK:
+            return msgpack.unpackb(payload, raw=False)
+        return _json_loads(payload)
+
+    def decode_text(self, data: bytes) -> str:
+        """Get a stored value as JSON text, without parsing it unless it was stored as msgpack."""
+        fmt, payload = self._unpack(data)
+        if fmt == FORMAT_MSGPACK:
+            return _json_dumps(msgpack.unpackb(payload, raw=False)).decode()
+        return bytes(payload).decode()
+
+    def _pack(self, fmt: int, payload: bytes) -> bytes:
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(payload) >= self.compress_threshold:
+            compression = self.compression
+            payload = self._compress(payload)
+        return CODEC_HEADER.pack(CODEC_MAGIC, fmt, compression) + payload
+
+    def _unpack(self, data: bytes):
+        if isinstance(data, str):
+            return FORMAT_TEXT, data.encode()
+        if not data or data[0] != CODEC_MAGIC:
+            return FORMAT_JSON, data
+        _, fmt, compression = CODEC_HEADER.unpack_from(data)
+        payload = memoryview(data)[CODEC_HEADER.size:]
+        return fmt, self._decompress(compression, payload)
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            if self._zstd_compressor is None:
+                self._zstd_compressor = zstandard.ZstdCompressor(level=self.level or 3)
+            return self._zstd_compressor.compress(payload)
+        if self.compression == COMPRESSION_LZ4:
+            return lz4.frame.compress(payload, compression_level=self.level or 0)
+        return zlib.compress(payload, self.level or 6)
+
+    def _decompress(self, compression: int, payload) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return payload
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise ValueError("Cached value is zstd compressed but zstandard is not installed")
+            if self._zstd_decompressor is None:
+                self._zstd_decompressor = zstandard.ZstdDecompressor()
+            return self._zstd_decompressor.decompress(payload)
+        if compression == COMPRESSION_LZ4:
+            if lz4 is None:
+                raise ValueError("Cached value is lz4 compressed but lz4 is not installed")
+            return lz4.frame.decompress(payload)
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(payload)
+        raise ValueError(f"Unknown cache compression id: {compression}")
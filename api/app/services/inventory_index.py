@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional
+from bisect import bisect_left
+import re
+
+# Search index over an inventory's descriptions, kept as plain dicts and lists so it is cached with them:
+#   names:    normalized name or market_hash_name -> position of the first description carrying it
+#   trigrams: trigram of either name -> ascending positions of the descriptions containing it
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    return _WHITESPACE.sub(" ", name).strip().casefold()
+
+
+def _trigrams(text: str):
+    return {text[start:start + 3] for start in range(len(text) - 2)}
+
+
+def _searchable_names(description: dict) -> List[str]:
+    return [normalize_name(description.get(field) or "") for field in ("market_hash_name", "name")]
+
+
+def new_inventory_index() -> Dict[str, Any]:
+    return {"names": {}, "trigrams": {}}
+
+
+# Add the description at `position` of the descriptions list, positions must be added in ascending order
+def add_to_inventory_index(index: Dict[str, Any], position: int, description: dict):
+    names = _searchable_names(description)
+    grams = set()
+    for name in names:
+        if name:
+            index["names"].setdefault(name, position)
+            grams |= _trigrams(name)
+    postings = index["trigrams"]
+    for gram in grams:
+        postings.setdefault(gram, []).append(position)
+
+
+def build_inventory_index(descriptions: List[dict]) -> Dict[str, Any]:
+    index = new_inventory_index()
+    for position, description in enumerate(descriptions):
+        add_to_inventory_index(index, position, description)
+    return index
+
+
+def _contains(positions: List[int], position: int) -> bool:
+    found = bisect_left(positions, position)
+    return found < len(positions) and positions[found] == position
+
+
+def _matches(description: dict, query: str) -> bool:
+    return any(query in name for name in _searchable_names(description))
+
+
+# Find the description whose name or market_hash_name contains the query (case-insensitive).
+# An exact name match wins, otherwise the first description in inventory order that contains it.
+def search_inventory_index(index: Dict[str, Any], descriptions: List[dict], query: str) -> Optional[dict]:
+    query = normalize_name(query)
+    if not query:
+        return None
+    position = index["names"].get(query)
+    if position is not None:
+        return descriptions[position]
+
+    if len(query) < 3:
+        # Too short for trigrams, fall back to a scan
+        return next((d for d in descriptions if _matches(d, query)), None)
+
+    # Every trigram of the query must be present, intersect the rarest posting lists first
+    postings = []
+    for gram in _trigrams(query):
+        positions = index["trigrams"].get(gram)
+        if not positions:
+            return None
+        postings.append(positions)
+    postings.sort(key=len)
+    candidates = postings[0]
+    for positions in postings[1:]:
+        # Posting lists are sorted, so probing them costs log(n) per remaining candidate
+        candidates = [p for p in candidates if _contains(positions, p)]
+        if not candidates:
+            return None
+
+    # Trigrams can match out of order, confirm the substring on the few remaining candidates
+    for position in candidates:
+        if _matches(descriptions[position], query):
+            return descriptions[position]
+    return None
@@ -0,0 +1,92 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import fnmatch, time
+
+# Rough per-entry bookkeeping overhead added to the key and value sizes
+ENTRY_OVERHEAD_BYTES = 128
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    In-process LRU cache bounded by total bytes, with a TTL per entry.
+    Entries keep the stored payload (which sizes the entry) and lazily its decoded value,
+    decoded values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int, max_ttl: float):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> [raw, decoded, expires_at, size, decoder]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    def _lookup(self, key: str) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[2] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get(self, key: str, decode) -> Tuple[bool, Any]:
+        """Get (hit, value) for a key, decoding the stored payload once per decoder."""
+        entry = self._lookup(key)
+        if entry is None:
+            return False, None
+        if entry[1] is _MISSING or entry[4] is not decode:
+            entry[1] = decode(entry[0])
+            entry[4] = decode
+        return True, entry[1]
+
+    def set(self, key: str, raw: bytes, ttl: Optional[float] = None):
+        """Store a serialized payload, the TTL is capped at max_ttl to bound staleness."""
+        ttl = self.max_ttl if not ttl else min(ttl, self.max_ttl)
+        size = len(key) + len(raw) + ENTRY_OVERHEAD_BYTES
+        self._remove(key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        self._entries[key] = [raw, _MISSING, time.monotonic() + ttl, size, None]
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self._remove(key)
+
+    def delete_pattern(self, pattern: str):
+        for key in [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[3]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
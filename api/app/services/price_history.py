@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from steam_market_s3_utils import PricePoints, read_price_points, unpack_price_points, validate_price_history
+from app.models import model_get_market_price_history, model_save_market_price_history, model_touch_market_price_history
+from app.services.steam import steamAPI
+from app.services.steam_cache import steam_rate_limiter
+import numpy as np
+import asyncio, logging, os, time
+
+logger = logging.getLogger(__name__)
+
+# Seconds a stored history is served before Steam is asked for new points again
+PRICE_HISTORY_REFRESH_SECONDS = int(os.getenv("PRICE_HISTORY_REFRESH_SECONDS", 3600))
+# Steam fetches running at once, the rate limiter still paces them
+PRICE_HISTORY_FETCH_CONCURRENCY = int(os.getenv("PRICE_HISTORY_FETCH_CONCURRENCY", 4))
+
+
+# Append the points of a fresh Steam history that are newer than the stored ones.
+# Steam coarsens old points to one per day, so the stored finer points are kept rather than replaced.
+def append_new_points(stored: Optional[PricePoints], fetched: PricePoints) -> PricePoints:
+    if stored is None or not len(stored):
+        return fetched
+    newer = fetched.times > stored.times.max()
+    return PricePoints(
+        times=np.concatenate([stored.times, fetched.times[newer]]),
+        prices=np.concatenate([stored.prices, fetched.prices[newer]]),
+        volumes=np.concatenate([stored.volumes, fetched.volumes[newer]]),
+    )
+
+
+class PriceHistoryIngestion:
+    """
+    Fetches Steam market price histories server side into market_price_histories, once per
+    (appid, market_hash_name) for every user tracking the item. Stored histories are served until
+    they are older than refresh_seconds, then refreshed by appending only the new points.
+    Concurrent requests for the same item share one fetch.
+    """
+
+    def __init__(self, refresh_seconds: int = 3600, concurrency: int = 4):
+        self.refresh_seconds = refresh_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    async def ingest(self, appid: int, market_hash_name: str) -> Dict[str, Any]:
+        """
+        Make sure the item's history is stored and fresh, returns its id, point count and how many points were added.
+        Raises ValueError if Steam has no valid history for the item, SteamUpstreamError if Steam throttles or fails.
+        """
+        key = (int(appid), market_hash_name)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._ingest(*key)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other caller was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def ingest_many(self, appid: int, market_hash_names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Ingest several items of a game, a failed item is reported with an 'error' instead of failing the rest."""
+        names = list(dict.fromkeys(market_hash_names))
+        results = await asyncio.gather(*(self.ingest(appid, name) for name in names), return_exceptions=True)
+        return {
+            name: {"error": str(result)} if isinstance(result, Exception) else result
+            for name, result in zip(names, results)
+        }
+
+    async def _ingest(self, appid: int, market_hash_name: str) -> Dict[str, Any]:
+        stored = await run_in_threadpool(model_get_market_price_history, appid, market_hash_name)
+        if stored and time.time() - stored["fetched_at"] < self.refresh_seconds:
+            return self._summary(stored["id"], stored["point_count"], 0)
+
+        async with self._semaphore:
+            data = await steamAPI(None, limiter=steam_rate_limiter).get_price_history(appid, market_hash_name)
+        is_valid, error_msg = validate_price_history(data)
+        if not is_valid:
+            raise ValueError(f"Invalid price history for {market_hash_name}: {error_msg}")
+
+        fetched, error_msg = read_price_points(data["prices"])
+        if fetched is None:
+            raise ValueError(f"Invalid price history for {market_hash_name}: {error_msg}")
+
+        previous = unpack_price_points(stored["points"]) if stored else None
+        points = append_new_points(previous, fetched)
+        added = len(points) - (len(previous) if previous is not None else 0)
+        if stored and not added:
+            await run_in_threadpool(model_touch_market_price_history, stored["id"])
+            return self._summary(stored["id"], stored["point_count"], 0)
+
+        price_history_id = await run_in_threadpool(model_save_market_price_history, appid, market_hash_name, points)
+        logger.info(f"Stored {added} new price points for {market_hash_name} in app {appid}")
+        return self._summary(price_history_id, len(points), added)
+
+    @staticmethod
+    def _summary(price_history_id: int, point_count: int, added: int) -> Dict[str, Any]:
+        return {"id": price_history_id, "point_count": point_count, "added_points": added}
+
+
+price_history_ingestion = PriceHistoryIngestion(PRICE_HISTORY_REFRESH_SECONDS, PRICE_HISTORY_FETCH_CONCURRENCY)
@@ -0,0 +1,148 @@
+from typing import Dict, Optional, Tuple
+import asyncio, math, time
+
+# Reserve one token from a bucket refilled at ARGV[1] tokens/s up to ARGV[2] tokens.
+# Tokens may go negative, which queues the caller: the reply is how many ms to wait before sending.
+# Returns -1 without reserving when the wait would exceed ARGV[3] ms. A cooldown key set after a
+# 429 pauses the whole bucket, its remaining ms are returned (as a negative wait of -2 - ms) so the caller retries.
+TOKEN_BUCKET_SCRIPT = """
+local cooldown = redis.call('PTTL', KEYS[2])
+if cooldown > 0 then
+    return -2 - cooldown
+end
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now_ms
+tokens = math.min(capacity, tokens + math.max(0, now_ms - ts) * rate / 1000) - 1
+local wait = 0
+if tokens < 0 then
+    wait = math.ceil(-tokens * 1000 / rate)
+    if wait > tonumber(ARGV[3]) then
+        return -1
+    end
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now_ms)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would have to queue longer than the limiter's max_wait."""
+
+
+class _LocalBucket:
+    """In-process token bucket, used while Redis is unavailable."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.cooldown_until = 0.0
+
+    def reserve(self, max_wait: float) -> Optional[Tuple[float, bool]]:
+        now = time.monotonic()
+        if self.cooldown_until > now:
+            return self.cooldown_until - now, False
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait, True
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket per host shared by every replica through Redis (falls back to a per-process bucket).
+    acquire() queues callers until their reserved slot comes up instead of failing them, and
+    penalize() pauses a host for everyone after the upstream answers 429.
+    """
+
+    def __init__(
+        self,
+        cache,
+        limits: Dict[str, Tuple[float, float]],
+        default_limit: Tuple[float, float],
+        max_wait: float = 60.0,
+        key_prefix: str = "ratelimit",
+    ):
+        self.cache = cache
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_wait = max_wait
+        self.key_prefix = key_prefix
+        self._local: Dict[str, _LocalBucket] = {}
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.penalties = 0
+
+    def _limit(self, host: str) -> Tuple[float, float]:
+        return self.limits.get(host, self.default_limit)
+
+    def _local_bucket(self, host: str) -> _LocalBucket:
+        bucket = self._local.get(host)
+        if bucket is None:
+            bucket = self._local[host] = _LocalBucket(*self._limit(host))
+        return bucket
+
+    async def _reserve(self, host: str) -> Optional[Tuple[float, bool]]:
+        """
+        (seconds to wait, whether a slot was reserved), None if the queue is too long.
+        No slot is reserved while the host is cooling down, the caller reserves again afterwards.
+        """
+        rate, capacity = self._limit(host)
+        result = None
+        if self.cache is not None:
+            result = await self.cache.run_script(
+                TOKEN_BUCKET_SCRIPT,
+                keys=[f"{self.key_prefix}:{host}", f"{self.key_prefix}:{host}:cooldown"],
+                args=[rate, capacity, int(self.max_wait * 1000)],
+            )
+        if result is None:
+            return self._local_bucket(host).reserve(self.max_wait)
+        if result == -1:
+            return None
+        if result < -1:
+            return -(result + 2) / 1000, False
+        return result / 1000, True
+
+    async def acquire(self, host: str):
+        """Wait for a request slot to the host, raising RateLimitExceeded if the queue is longer than max_wait."""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            reservation = await self._reserve(host)
+            if reservation is None or time.monotonic() + reservation[0] > deadline:
+                raise RateLimitExceeded(f"Rate limit queue for {host} is longer than {self.max_wait}s")
+            wait, reserved = reservation
+            if wait > 0:
+                self.waits += 1
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+            if reserved:
+                return
+
+    async def penalize(self, host: str, seconds: float):
+        """Pause all requests to the host for the given time, e.g. the upstream's Retry-After."""
+        self.penalties += 1
+        milliseconds = max(1, int(math.ceil(seconds * 1000)))
+        self._local_bucket(host).cooldown_until = max(
+            self._local_bucket(host).cooldown_until, time.monotonic() + seconds
+        )
+        if self.cache is not None:
+            # Keep the longest cooldown if several replicas were throttled at once
+            await self.cache.run_script(
+                "if redis.call('PTTL', KEYS[1]) < tonumber(ARGV[1]) then "
+                "return redis.call('SET', KEYS[1], '1', 'PX', ARGV[1]) end return 0",
+                keys=[f"{self.key_prefix}:{host}:cooldown"],
+                args=[milliseconds],
+            )
+
+    def stats(self) -> Dict[str, float]:
+        return {"waits": self.waits, "waited_seconds": round(self.waited_seconds, 3), "penalties": self.penalties}
@@ -1,6 +1,11 @@
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
+from contextlib import asynccontextmanager
+from collections import OrderedDict
 import redis.asyncio
-import os, joblib, json
+from app.services.local_cache import LocalCache
+from app.services.cache_codec import CacheCodec
+from app.services.redis_connection import RedisConnectionManager
+import os, joblib, json, asyncio, inspect, math, random, time, uuid
 
 # Redis queue configuration
 REDIS_HOST = os.environ.get("REDIS_HOST")
@@ -8,10 +13,58 @@ REDIS_PORT = int(os.environ.get("REDIS_PORT"))
 REDIS_DB = int(os.environ.get("REDIS_DB"))
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
 
+# Connection pool and circuit breaker settings, calls give up after the socket timeout
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 1.0))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get("REDIS_CONNECT_TIMEOUT", 1.0))
+REDIS_FAILURE_THRESHOLD = int(os.environ.get("REDIS_FAILURE_THRESHOLD", 5))
+REDIS_FAILURE_WINDOW = float(os.environ.get("REDIS_FAILURE_WINDOW", 10))
+REDIS_RECONNECT_BACKOFF_MAX = float(os.environ.get("REDIS_RECONNECT_BACKOFF_MAX", 30))
+
 REDIS_QUEUE_KEY = "ml_training_queue"
 MAX_CONCURRENT_TRAININGS = int(os.environ.get("MAX_CONCURRENT_TRAININGS", 1))
 MAX_QUEUE_SIZE = int(os.environ.get("MAX_QUEUE_SIZE", 10))
 
+# Read-through cache settings
+CACHE_LOCK_TIMEOUT = float(os.environ.get("CACHE_LOCK_TIMEOUT", 10))
+CACHE_LOCK_POLL_INTERVAL = 0.05
+CACHE_EARLY_REFRESH_BETA = float(os.environ.get("CACHE_EARLY_REFRESH_BETA", 1.0))
+CACHE_DEFAULT_RECOMPUTE_SECONDS = 0.1
+# Keys whose last recompute time is remembered, least recently loaded ones fall back to the default
+CACHE_RECOMPUTE_TRACKED_KEYS = int(os.environ.get("CACHE_RECOMPUTE_TRACKED_KEYS", 10000))
+
+# In-process cache tier, kept coherent across replicas over this pub/sub channel
+LOCAL_CACHE_MAX_BYTES = int(os.environ.get("LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+LOCAL_CACHE_MAX_TTL = float(os.environ.get("LOCAL_CACHE_MAX_TTL", 30))
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Stored value encoding, values written under other settings stay readable
+CACHE_FORMAT = os.environ.get("CACHE_FORMAT", "json")
+CACHE_COMPRESSION = os.environ.get("CACHE_COMPRESSION", "zstd")
+CACHE_COMPRESS_THRESHOLD = int(os.environ.get("CACHE_COMPRESS_THRESHOLD", 1024))
+
+# Namespace generation counters, derived keys embed them so one INCR orphans every derived key.
+# Counters outlive derived keys by far, so one expiring and restarting at 0 cannot revive stale entries.
+GENERATION_KEY_PREFIX = "gen:"
+GENERATION_TTL = int(os.environ.get("CACHE_GENERATION_TTL", 7 * 24 * 3600))
+
+# Namespaces of cached data, the ML worker bumps the same names after saving a model index
+GROUPS_NAMESPACE = "groups"
+
+def group_namespace(group_id: int) -> str:
+    return f"group:{group_id}"
+
+def user_namespace(user_id: int) -> str:
+    return f"user:{user_id}"
+
+# Release a lock only if it is still held by the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 # class RedisJobQueue:
 #     """
 #     Redis-based job queue for ML training tasks.
@@ -145,6 +198,10 @@ MAX_QUEUE_SIZE = int(os.environ.get("MAX_QUEUE_SIZE", 10))
 class RedisCache:
     """
     Async Redis-based caching service using redis-py 4.2.0+ native async support.
+    Reads are served from an in-process LRU tier first, which replicas keep coherent
+    by broadcasting the keys they write or delete over Redis pub/sub.
+    Values are stored as bytes produced by CacheCodec, both tiers hold the encoded form.
+    Every call degrades to a miss (or no-op) while the connection manager reports Redis unhealthy.
     """
     
     def __init__(self):
@@ -152,32 +209,94 @@ class RedisCache:
         self.port = REDIS_PORT
         self.db = REDIS_DB
         self.password = REDIS_PASSWORD
-        self.client = None
-        self.connected = False
-    
+        self.connection = RedisConnectionManager(
+            self.host,
+            self.port,
+            self.db,
+            self.password,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            connect_timeout=REDIS_CONNECT_TIMEOUT,
+            failure_threshold=REDIS_FAILURE_THRESHOLD,
+            failure_window=REDIS_FAILURE_WINDOW,
+            backoff_max=REDIS_RECONNECT_BACKOFF_MAX,
+        )
+        self.connection.on_connect(self._start_listener)
+        # In-flight loads per key, and how long each key last took to recompute
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._recompute_seconds: "OrderedDict[str, float]" = OrderedDict()
+        # Lua scripts registered on the current client
+        self._scripts: Dict[str, Any] = {}
+        # Local tier, invalidated by messages from other replicas
+        self.local = LocalCache(LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_MAX_TTL)
+        self.codec = CacheCodec(CACHE_FORMAT, CACHE_COMPRESSION, CACHE_COMPRESS_THRESHOLD)
+        self.instance_id = uuid.uuid4().hex
+        self._subscriber_task = None
+        self.redis_hits = 0
+        self.redis_misses = 0
+
+    @property
+    def client(self):
+        """The Redis client, None while Redis is unreachable so callers fall back to the database."""
+        return self.connection.client
+
     async def _ensure_connected(self):
-        """Ensure the client is connected (lazy connection)."""
-        if not self.connected and self.client is None:
-            await self._connect()
-            self.connected = True
-
-    async def _connect(self):
-        """Initialize async Redis client."""
-        try:
-            print("Connecting to Redis:", REDIS_HOST, REDIS_PORT)
-            self.client = redis.asyncio.Redis(
-                host=self.host,
-                port=self.port,
-                db=self.db,
-                password=self.password,
-                decode_responses=True
-            )
-            
-            await self.client.ping()
-            print("Async Redis cache connected successfully")
+        """Ensure the client is connected (lazy connection), reconnection after failures runs in the background."""
+        await self.connection.start()
+
+    def _on_error(self, message: str, error: Exception):
+        print(f"{message}: {error}")
+        self.connection.record_failure(error)
+
+    def _start_listener(self):
+        if self._subscriber_task is not None and not self._subscriber_task.done():
+            self._subscriber_task.cancel()
+        self._subscriber_task = asyncio.ensure_future(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """Evict local entries named in invalidation messages published by other replicas."""
+        while self.client:
+            client = self.client
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything cached before (re)subscribing may have missed messages
+                self.local.clear()
+                # Poll rather than block so the loop ends once the connection manager drops this client
+                while self.client is client:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") == self.instance_id:
+                        continue
+                    self.local.delete(*payload.get("keys", []))
+                    for pattern in payload.get("patterns", []):
+                        self.local.delete_pattern(pattern)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._on_error("Cache invalidation listener error", e)
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+        # Invalidations are not received while disconnected
+        self.local.clear()
+
+    async def _publish_invalidation(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """Tell other replicas to drop their local copies of these keys."""
+        try:
+            await self.client.publish(INVALIDATION_CHANNEL, json.dumps({
+                "origin": self.instance_id,
+                "keys": list(keys),
+                "patterns": list(patterns),
+            }))
         except Exception as e:
-            print(f"Async Redis connection failed: {e}")
-            self.client = None
+            self._on_error("Cache invalidation publish error", e)
 
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """
@@ -188,13 +307,17 @@ class RedisCache:
             return False
 
         try:
-            serialized_value = json.dumps(value)
+            serialized_value = self.codec.encode(value)
+            self.local.set(key, serialized_value, ttl)
             if ttl:
-                return await self.client.setex(key, ttl, serialized_value)
+                result = await self.client.setex(key, ttl, serialized_value)
             else:
-                return await self.client.set(key, serialized_value)
+                result = await self.client.set(key, serialized_value)
+            await self._publish_invalidation([key])
+            return result
         except Exception as e:
-            print(f"Cache set error: {e}")
+            self._on_error("Cache set error", e)
+            self.local.delete(key)
             return False
 
     async def get(self, key: str) -> Optional[Any]:
@@ -205,15 +328,81 @@ class RedisCache:
         if not self.client:
             return None
 
+        hit, value = self.local.get(key, self.codec.decode)
+        if hit:
+            return value
         try:
-            value = await self.client.get(key)
+            value, ttl_ms = await self._get_with_pttl(key)
             if value:
-                return json.loads(value)
+                self.redis_hits += 1
+                self.local.set(key, value, self._local_ttl(ttl_ms))
+                return self.codec.decode(value)
+            self.redis_misses += 1
             return None
         except Exception as e:
-            print(f"Cache get error: {e}")
+            self._on_error("Cache get error", e)
+            return None
+
+    async def set_raw(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        """
+        Set an already serialized string in cache, skipping JSON encoding.
+        """
+        await self._ensure_connected()
+        if not self.client:
+            return False
+
+        try:
+            serialized_value = self.codec.encode_text(value)
+            self.local.set(key, serialized_value, ttl)
+            if ttl:
+                result = await self.client.setex(key, ttl, serialized_value)
+            else:
+                result = await self.client.set(key, serialized_value)
+            await self._publish_invalidation([key])
+            return result
+        except Exception as e:
+            self._on_error("Cache set error", e)
+            self.local.delete(key)
+            return False
+
+    async def get_raw(self, key: str) -> Optional[str]:
+        """
+        Get a cached value as JSON text, skipping JSON decoding.
+        """
+        await self._ensure_connected()
+        if not self.client:
             return None
 
+        hit, value = self.local.get(key, self.codec.decode_text)
+        if hit:
+            return value
+        try:
+            value, ttl_ms = await self._get_with_pttl(key)
+            if value is None:
+                self.redis_misses += 1
+                return None
+            self.redis_hits += 1
+            self.local.set(key, value, self._local_ttl(ttl_ms))
+            return self.codec.decode_text(value)
+        except Exception as e:
+            self._on_error("Cache get error", e)
+            return None
+
+    async def set_nx(self, key: str, value: Any, ttl: int) -> bool:
+        """
+        Set a value only if the key does not exist yet, returns whether it was set.
+        Meant for short-lived markers such as "refresh in progress", so it bypasses the local tier.
+        """
+        await self._ensure_connected()
+        if not self.client:
+            return False
+
+        try:
+            return bool(await self.client.set(key, self.codec.encode(value), nx=True, ex=ttl))
+        except Exception as e:
+            self._on_error("Cache set nx error", e)
+            return False
+
     async def delete(self, key: str) -> bool:
         """
         Delete a key from cache.
@@ -222,11 +411,359 @@ class RedisCache:
         if not self.client:
             return False
 
+        self.local.delete(key)
+        try:
+            deleted = bool(await self.client.delete(key))
+            await self._publish_invalidation([key])
+            return deleted
+        except Exception as e:
+            self._on_error("Cache delete error", e)
+            return False
+
+    async def get_many(self, keys: Iterable[str], decode: bool = True) -> Dict[str, Any]:
+        """
+        Get several values in one MGET round trip, returns only the keys that were hit.
+        Pass decode=False to get JSON text without decoding it.
+        """
+        keys = list(keys)
+        await self._ensure_connected()
+        if not self.client or not keys:
+            return {}
+
+        decoder = self.codec.decode if decode else self.codec.decode_text
+        found = {}
+        remaining = []
+        for key in keys:
+            hit, value = self.local.get(key, decoder)
+            if hit:
+                found[key] = value
+            else:
+                remaining.append(key)
+        if not remaining:
+            return found
+
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.mget(remaining)
+                for key in remaining:
+                    pipe.pttl(key)
+                values, *ttls_ms = await pipe.execute()
+            for key, value, ttl_ms in zip(remaining, values, ttls_ms):
+                if value:
+                    self.redis_hits += 1
+                    self.local.set(key, value, self._local_ttl(ttl_ms))
+                    found[key] = decoder(value)
+                else:
+                    self.redis_misses += 1
+            return found
+        except Exception as e:
+            self._on_error("Cache get many error", e)
+            return found
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """
+        Set several values in one pipelined round trip with an optional shared TTL.
+        """
+        await self._ensure_connected()
+        if not self.client or not mapping:
+            return False
+
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    serialized_value = self.codec.encode(value)
+                    self.local.set(key, serialized_value, ttl)
+                    if ttl:
+                        pipe.setex(key, ttl, serialized_value)
+                    else:
+                        pipe.set(key, serialized_value)
+                pipe.publish(INVALIDATION_CHANNEL, json.dumps({
+                    "origin": self.instance_id,
+                    "keys": list(mapping),
+                    "patterns": [],
+                }))
+                results = await pipe.execute()
+            return all(results[:-1])
+        except Exception as e:
+            self._on_error("Cache set many error", e)
+            self.local.delete(*mapping)
+            return False
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        Delete several keys in one UNLINK round trip, memory is reclaimed in the background.
+        """
+        keys = list(keys)
+        await self._ensure_connected()
+        if not self.client or not keys:
+            return 0
+
+        self.local.delete(*keys)
+        try:
+            deleted = await self.client.unlink(*keys)
+            await self._publish_invalidation(keys)
+            return deleted
+        except Exception as e:
+            self._on_error("Cache delete many error", e)
+            return 0
+
+    async def delete_pattern(self, pattern: str) -> int:
+        """
+        Delete every key matching a glob pattern, returns the number of keys removed.
+        """
+        await self._ensure_connected()
+        if not self.client:
+            return 0
+
+        self.local.delete_pattern(pattern)
+        try:
+            await self._publish_invalidation(patterns=[pattern])
+            keys = [key async for key in self.client.scan_iter(match=pattern, count=500)]
+            if not keys:
+                return 0
+            return await self.client.unlink(*keys)
+        except Exception as e:
+            self._on_error("Cache delete pattern error", e)
+            return 0
+
+    async def versioned_key(self, key: str, *namespaces: str) -> str:
+        """
+        Stamp a key with the current generation of each namespace it derives from,
+        e.g. versioned_key("group:5:items:3", "group:5", "user:3") -> "group:5:items:3@2.7".
+        """
+        generation_keys = [GENERATION_KEY_PREFIX + namespace for namespace in namespaces]
+        generations = await self.get_many(generation_keys)
+        return key + "@" + ".".join(str(generations.get(gen_key, 0)) for gen_key in generation_keys)
+
+    async def bump_generation(self, *namespaces: str) -> bool:
+        """
+        Move namespaces to a new generation, keys derived from the old one are never read again
+        and age out through their TTL.
+        """
+        await self._ensure_connected()
+        if not self.client or not namespaces:
+            return False
+
+        generation_keys = [GENERATION_KEY_PREFIX + namespace for namespace in namespaces]
+        self.local.delete(*generation_keys)
         try:
-            return bool(await self.client.delete(key))
+            async with self.client.pipeline(transaction=False) as pipe:
+                for gen_key in generation_keys:
+                    pipe.incr(gen_key)
+                    pipe.expire(gen_key, GENERATION_TTL)
+                pipe.publish(INVALIDATION_CHANNEL, json.dumps({
+                    "origin": self.instance_id,
+                    "keys": generation_keys,
+                    "patterns": [],
+                }))
+                await pipe.execute()
+            return True
         except Exception as e:
-            print(f"Cache delete error: {e}")
+            self._on_error("Cache generation bump error", e)
             return False
 
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit rates of the local and Redis tiers, a Redis lookup only happens after a local miss,
+        and the state of the Redis connection and its circuit breaker.
+        """
+        redis_lookups = self.redis_hits + self.redis_misses
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_rate": round(self.redis_hits / redis_lookups, 4) if redis_lookups else 0.0,
+                "connection": self.connection.status(),
+            },
+        }
+
+    async def run_script(self, script: str, keys: Iterable[str] = (), args: Iterable[Any] = ()) -> Any:
+        """
+        Run a Lua script, sent once per connection and then called by its SHA.
+        Returns None when Redis is unavailable or the script fails.
+        """
+        await self._ensure_connected()
+        client = self.client
+        if not client:
+            return None
+
+        registered = self._scripts.get(script)
+        if registered is None or registered.registered_client is not client:
+            registered = self._scripts[script] = client.register_script(script)
+        try:
+            return await registered(keys=list(keys), args=list(args))
+        except Exception as e:
+            self._on_error("Cache script error", e)
+            return None
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Queue commands on a MULTI/EXEC pipeline that runs atomically when the block exits.
+        Yields None when Redis is unavailable so callers can skip caching.
+        Commands queued here bypass the local tier, pair writes with delete/delete_many to evict it.
+        """
+        await self._ensure_connected()
+        if not self.client:
+            yield None
+            return
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            yield pipe
+            try:
+                await pipe.execute()
+            except Exception as e:
+                self._on_error("Cache transaction error", e)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: int,
+        raw: bool = False,
+    ) -> Any:
+        """
+        Read-through get: on a miss only one caller per key runs the loader, in this process and across
+        replicas (via a Redis lock), everyone else waits for its result. Hot keys are refreshed in the
+        background shortly before they expire (probabilistic early expiry) so expiry does not stampede.
+        None results are returned but not cached. raw=True stores and returns JSON text without coding it.
+        """
+        await self._ensure_connected()
+        if not self.client:
+            return await self._call_loader(loader)
+
+        decoder = self._decoder(raw)
+        hit, value = self.local.get(key, decoder)
+        if hit:
+            return value
+
+        try:
+            value, ttl_ms = await self._get_with_pttl(key)
+        except Exception as e:
+            self._on_error("Cache get error", e)
+            return await self._call_loader(loader)
+
+        if value is not None:
+            self.redis_hits += 1
+            self.local.set(key, value, self._local_ttl(ttl_ms))
+            if self._should_refresh_early(key, ttl_ms) and key not in self._inflight:
+                asyncio.ensure_future(self._single_flight(key, loader, ttl, raw)).add_done_callback(
+                    self._consume_task_exception
+                )
+            return decoder(value)
+
+        self.redis_misses += 1
+        return await self._single_flight(key, loader, ttl, raw)
+
+    # Value and remaining TTL in milliseconds of a key in one round trip
+    async def _get_with_pttl(self, key: str):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            value, ttl_ms = await pipe.execute()
+        return value, ttl_ms
+
+    # Local tier TTL of a value read from Redis, never past its Redis expiry (LocalCache caps it at its max TTL)
+    @staticmethod
+    def _local_ttl(ttl_ms: Optional[int]) -> Optional[float]:
+        return ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else None
+
+    def _decoder(self, raw: bool):
+        return self.codec.decode_text if raw else self.codec.decode
+
+    # Decide whether to refresh before expiry, more likely as expiry nears and for slow loaders
+    def _should_refresh_early(self, key: str, ttl_ms: int) -> bool:
+        if ttl_ms is None or ttl_ms < 0:
+            return False
+        recompute = self._recompute_seconds.get(key, CACHE_DEFAULT_RECOMPUTE_SECONDS)
+        return -recompute * CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= ttl_ms / 1000
+
+    # Versioned keys never repeat once their generation is bumped, so only the most recent ones are kept
+    def _remember_recompute(self, key: str, seconds: float):
+        self._recompute_seconds[key] = seconds
+        self._recompute_seconds.move_to_end(key)
+        while len(self._recompute_seconds) > CACHE_RECOMPUTE_TRACKED_KEYS:
+            self._recompute_seconds.popitem(last=False)
+
+    # Coalesce concurrent loads of one key in this process onto a single future
+    async def _single_flight(self, key: str, loader, ttl: int, raw: bool):
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._load_with_lock(key, loader, ttl, raw)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other caller was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    # Take the cross-process lock and load, or wait for the replica holding it to fill the key
+    async def _load_with_lock(self, key: str, loader, ttl: int, raw: bool):
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.client.set(lock_key, token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000))
+        except Exception as e:
+            self._on_error("Cache lock error", e)
+            return await self._call_loader(loader)
+
+        if not acquired:
+            deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(CACHE_LOCK_POLL_INTERVAL)
+                try:
+                    value = await self.client.get(key)
+                except Exception:
+                    break
+                if value is not None:
+                    return self._decoder(raw)(value)
+                try:
+                    if not await self.client.exists(lock_key):
+                        break
+                except Exception:
+                    break
+            # Lock holder failed or timed out, load without it
+            return await self._call_loader(loader)
+
+        try:
+            started = time.monotonic()
+            result = await self._call_loader(loader)
+            self._remember_recompute(key, time.monotonic() - started)
+            if result is not None:
+                if raw:
+                    await self.set_raw(key, result, ttl=ttl)
+                else:
+                    await self.set(key, result, ttl=ttl)
+            return result
+        finally:
+            try:
+                await self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                self._on_error("Cache lock release error", e)
+
+    @staticmethod
+    def _consume_task_exception(task: asyncio.Future):
+        if not task.cancelled() and task.exception():
+            print(f"Cache background refresh error: {task.exception()}")
+
+    @staticmethod
+    async def _call_loader(loader):
+        result = loader()
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
 print("Initializing Redis cache...")
 redis_cache = RedisCache()
\ No newline at end of file
@@ -0,0 +1,173 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import deque
+import redis.asyncio
+import redis.exceptions
+import asyncio, random, time
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+
+# Errors that mean Redis itself is unhealthy, anything else (bad data, script errors) is the caller's problem
+CONNECTION_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, asyncio.TimeoutError, OSError)
+
+
+async def _close(resource):
+    close = getattr(resource, "aclose", None) or resource.close
+    await close()
+
+
+class RedisConnectionManager:
+    """
+    Owns the Redis connection pool and a circuit breaker in front of it.
+    While the circuit is open `client` is None so cache calls fail fast to the database path,
+    and a background task probes Redis with exponential backoff until it answers again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        db: int,
+        password: Optional[str],
+        max_connections: int = 50,
+        socket_timeout: float = 1.0,
+        connect_timeout: float = 1.0,
+        failure_threshold: int = 5,
+        failure_window: float = 10.0,
+        backoff_min: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.connect_timeout = connect_timeout
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.state = CIRCUIT_OPEN
+        self.last_error: Optional[str] = None
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self.reconnect_attempts = 0
+        self._client = None
+        self._started = False
+        self._failures = deque()
+        self._reconnect_task = None
+        self._on_connect: List[Callable[[], Any]] = []
+
+    @property
+    def client(self):
+        """The Redis client, or None while the circuit is open."""
+        return self._client if self.state == CIRCUIT_CLOSED else None
+
+    def on_connect(self, callback: Callable[[], Any]):
+        """Run a callback every time a connection is (re)established."""
+        self._on_connect.append(callback)
+
+    async def start(self):
+        """Connect on first use, a failure opens the circuit and hands over to background reconnection."""
+        if self._started:
+            return
+        self._started = True
+        print("Connecting to Redis:", self.host, self.port)
+        try:
+            await self._open_client()
+        except Exception as e:
+            print(f"Async Redis connection failed: {e}")
+            self._trip(e)
+
+    def record_failure(self, error: Exception):
+        """Count a failed call, opening the circuit after failure_threshold failures within failure_window."""
+        if not isinstance(error, CONNECTION_ERRORS) or self.state == CIRCUIT_OPEN:
+            return
+        now = time.monotonic()
+        self._failures.append(now)
+        while self._failures and self._failures[0] < now - self.failure_window:
+            self._failures.popleft()
+        if len(self._failures) >= self.failure_threshold:
+            self._trip(error)
+
+    async def _open_client(self):
+        pool = redis.asyncio.BlockingConnectionPool(
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            password=self.password,
+            max_connections=self.max_connections,
+            # Wait at most a socket timeout for a free connection instead of opening unbounded ones
+            timeout=self.socket_timeout,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.connect_timeout,
+            health_check_interval=30,
+            decode_responses=False,
+        )
+        client = redis.asyncio.Redis(connection_pool=pool)
+        try:
+            await client.ping()
+        except Exception:
+            await _close(client)
+            await pool.disconnect()
+            raise
+
+        self._client = client
+        self._failures.clear()
+        self.state = CIRCUIT_CLOSED
+        self.opened_at = None
+        print("Async Redis cache connected successfully")
+        for callback in self._on_connect:
+            callback()
+
+    def _trip(self, error: Exception):
+        self.last_error = str(error)
+        if self.state == CIRCUIT_OPEN and self._reconnect_task is not None:
+            return
+        if self.state == CIRCUIT_CLOSED:
+            print(f"Redis circuit opened: {error}")
+            self.trips += 1
+        self.state = CIRCUIT_OPEN
+        self.opened_at = time.time()
+
+        client, self._client = self._client, None
+        if client is not None:
+            asyncio.ensure_future(self._dispose(client))
+        self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _dispose(self, client):
+        try:
+            await _close(client)
+            await client.connection_pool.disconnect()
+        except Exception:
+            pass
+
+    async def _reconnect(self):
+        delay = self.backoff_min
+        try:
+            while self.state == CIRCUIT_OPEN:
+                # Equal jitter (half the delay fixed, half random) keeps replicas from probing a recovering Redis in lockstep
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                self.reconnect_attempts += 1
+                try:
+                    await self._open_client()
+                    print(f"Redis circuit closed after {self.reconnect_attempts} reconnect attempts")
+                except Exception as e:
+                    self.last_error = str(e)
+                    delay = min(delay * 2, self.backoff_max)
+        finally:
+            self._reconnect_task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state if self._started else "not_started",
+            "last_error": self.last_error,
+            "open_for_seconds": round(time.time() - self.opened_at, 1) if self.opened_at else None,
+            "trips": self.trips,
+            "reconnect_attempts": self.reconnect_attempts,
+            "max_connections": self.max_connections,
+            "socket_timeout": self.socket_timeout,
+            "connect_timeout": self.connect_timeout,
+        }
@@ -1,67 +1,245 @@
-from typing import Dict, Any
-import httpx, os, logging
+from typing import Dict, Any, Optional, Iterable, Tuple, AsyncIterator, Union
+from distutils.util import strtobool
+from steam_market_s3_utils import MSGPACK_MEDIA_TYPE, msgpack_available, decode_results
+from app.services.sklearn_replicas import Replica, ReplicaPool
+import httpx, os, logging, hashlib, importlib.util, json, asyncio, time
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-operation timeouts in seconds, training fits models synchronously so it gets the longest budget
+SKLEARN_TRAIN_TIMEOUT = float(os.getenv("SKLEARN_TRAIN_TIMEOUT", 300))
+SKLEARN_PREDICT_TIMEOUT = float(os.getenv("SKLEARN_PREDICT_TIMEOUT", 60))
+SKLEARN_HEALTH_TIMEOUT = float(os.getenv("SKLEARN_HEALTH_TIMEOUT", 5))
+SKLEARN_CONNECT_TIMEOUT = float(os.getenv("SKLEARN_CONNECT_TIMEOUT", 3))
+SKLEARN_POOL_TIMEOUT = float(os.getenv("SKLEARN_POOL_TIMEOUT", 10))
+
+# Shared connection pool to the ML service, connections are kept alive between requests
+SKLEARN_MAX_CONNECTIONS = int(os.getenv("SKLEARN_MAX_CONNECTIONS", 20))
+SKLEARN_MAX_KEEPALIVE = int(os.getenv("SKLEARN_MAX_KEEPALIVE", 10))
+SKLEARN_KEEPALIVE_EXPIRY = float(os.getenv("SKLEARN_KEEPALIVE_EXPIRY", 60))
+
+# ML service replicas as a comma separated list, falling back to the single SKLEARN_SERVICE_URL
+SKLEARN_SERVICE_URLS = [
+    url.strip() for url in (os.getenv("SKLEARN_SERVICE_URLS") or os.getenv("SKLEARN_SERVICE_URL") or "").split(",")
+    if url.strip()
+]
+SKLEARN_HEALTH_INTERVAL = float(os.getenv("SKLEARN_HEALTH_INTERVAL", 10))
+# Trainings of one group sent at once, by default the ML service's two training workers on every replica
+SKLEARN_GROUP_TRAIN_CONCURRENCY = int(os.getenv("SKLEARN_GROUP_TRAIN_CONCURRENCY", 2 * max(1, len(SKLEARN_SERVICE_URLS))))
+# Send a prediction to a second replica when the first is slower than the recent p95
+SKLEARN_HEDGE_PREDICTIONS = bool(strtobool(os.getenv("SKLEARN_HEDGE_PREDICTIONS", "True")))
+SKLEARN_HEDGE_DEFAULT_DELAY = float(os.getenv("SKLEARN_HEDGE_DEFAULT_DELAY", 1.0))
+
+# Errors raised before a request reached the replica, so it is safe to send it to another one
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+# Results come back as msgpack when it is installed, graphs are referenced by key and URL rather than embedded
+SKLEARN_ACCEPT = f"{MSGPACK_MEDIA_TYPE}, application/json" if msgpack_available() else "application/json"
+
+# HTTP/2 needs the optional h2 package and is only negotiated over TLS, otherwise HTTP/1.1 keep-alive is used
+SKLEARN_HTTP2 = importlib.util.find_spec("h2") is not None
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared async HTTP client for the ML service, requests beyond SKLEARN_MAX_CONNECTIONS wait for a free connection.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=SKLEARN_HTTP2,
+            timeout=httpx.Timeout(SKLEARN_TRAIN_TIMEOUT, connect=SKLEARN_CONNECT_TIMEOUT, pool=SKLEARN_POOL_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=SKLEARN_MAX_CONNECTIONS,
+                max_keepalive_connections=SKLEARN_MAX_KEEPALIVE,
+                keepalive_expiry=SKLEARN_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    replica_pool.stop()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+replica_pool = ReplicaPool(
+    SKLEARN_SERVICE_URLS,
+    health_interval=SKLEARN_HEALTH_INTERVAL,
+    health_timeout=SKLEARN_HEALTH_TIMEOUT,
+    hedge_default_delay=SKLEARN_HEDGE_DEFAULT_DELAY,
+)
+
+def _timeout(seconds: float) -> httpx.Timeout:
+    return httpx.Timeout(seconds, connect=SKLEARN_CONNECT_TIMEOUT, pool=SKLEARN_POOL_TIMEOUT)
+
+# Serialize a request body once, so it can be sized and fingerprinted for the logs without logging its content
+def _encode_json(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+def _describe(body: bytes) -> str:
+    return f"{len(body)} bytes, blake2b {hashlib.blake2b(body, digest_size=8).hexdigest()}"
 
 class SklearnClient:
-    """Client to communicate with the sklearn ML service"""
-    
-    def __init__(self):
-        self.base_url = os.getenv("SKLEARN_SERVICE_URL")
-        self.timeout = 300.0 #5 minutes
-    
-    async def train_model(self, user_id: int, username: str, item_id: int, item_name: str, price_history: Dict[str, Any]) -> Dict[str, Any]:
-        """Send training request to sklearn service"""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            logging.info(f"Sending training request for item {item_name} (ID: {item_id}) of user {username} (ID: {user_id})")
-            logging.info(f"Price history data: \n===========\n{price_history}\n===========")
-            response = await client.post(
-                f"{self.base_url}/train",
-                json={
-                    "user_id": user_id,
-                    "username": username,
-                    "item_id": item_id,
-                    "item_name": item_name,
-                    "price_history": price_history
-                }
+    """
+    Client to communicate with the sklearn ML service.
+    All requests go through the shared pooled HTTP client with a timeout per operation, balanced over
+    the ML replicas by least outstanding requests. Predictions slower than the recent p95 are hedged
+    on a second replica and the first answer wins.
+    """
+
+    def __init__(self, pool: ReplicaPool = replica_pool):
+        self.pool = pool
+
+    async def _post_json(self, path: str, payload: Any, timeout: float, log_level: int = logging.DEBUG,
+                         hedge: bool = False) -> httpx.Response:
+        body = _encode_json(payload)
+        # Hashing a large body is only worth it when the line is actually logged
+        if logger.isEnabledFor(log_level):
+            logger.log(log_level, f"POST {path} ({_describe(body)})")
+
+        self.pool.start_health_checks(get_http_client)
+        replica = self.pool.pick()
+        if replica is None:
+            raise ValueError("No ML service URL configured, set SKLEARN_SERVICE_URLS")
+        if hedge and SKLEARN_HEDGE_PREDICTIONS and len(self.pool.replicas) > 1:
+            return await self._post_hedged(replica, path, body, timeout)
+        try:
+            return await self._send(replica, path, body, timeout)
+        except CONNECT_ERRORS as e:
+            return await self._failover(replica, e, path, body, timeout)
+
+    async def _send(self, replica: Replica, path: str, body: bytes, timeout: float, measure: bool = False) -> httpx.Response:
+        replica.outstanding += 1
+        replica.requests += 1
+        started = time.perf_counter()
+        try:
+            response = await get_http_client().post(
+                f"{replica.url}{path}",
+                content=body,
+                headers={"Content-Type": "application/json", "Accept": SKLEARN_ACCEPT},
+                timeout=_timeout(timeout),
             )
             response.raise_for_status()
-            return response.json()
-    
-    async def predict_price(self, user_id: int, username: str, item_id: int, item_name: str, 
+        except Exception as e:
+            self.pool.record_failure(replica, e)
+            raise
+        finally:
+            replica.outstanding -= 1
+        self.pool.record_success(replica, time.perf_counter() - started if measure else None)
+        return response
+
+    # Resend a request that never reached its replica to another one
+    async def _failover(self, replica: Replica, error: Exception, path: str, body: bytes, timeout: float,
+                        measure: bool = False) -> httpx.Response:
+        fallback = self.pool.pick(exclude=[replica])
+        if fallback is None:
+            raise error
+        logger.warning(f"ML replica {replica.url} unreachable, sending {path} to {fallback.url}")
+        return await self._send(fallback, path, body, timeout, measure)
+
+    # Send to the picked replica, and to a second one as well if no answer came within the hedge delay
+    async def _post_hedged(self, replica: Replica, path: str, body: bytes, timeout: float) -> httpx.Response:
+        primary = asyncio.ensure_future(self._send(replica, path, body, timeout, measure=True))
+        tasks = {primary}
+        try:
+            await asyncio.wait(tasks, timeout=self.pool.hedge_delay())
+            if primary.done():
+                error = primary.exception()
+                if isinstance(error, CONNECT_ERRORS):
+                    return await self._failover(replica, error, path, body, timeout, measure=True)
+                return primary.result()
+
+            second = self.pool.pick(exclude=[replica])
+            if second is None:
+                return await primary
+            self.pool.hedges += 1
+            hedged = asyncio.ensure_future(self._send(second, path, body, timeout, measure=True))
+            tasks.add(hedged)
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self.pool.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The slower request is abandoned, its connection is closed rather than reused
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def train_model(self, user_id: int, username: str, item_id: int, item_name: str, price_history: Dict[str, Any]) -> Dict[str, Any]:
+        """Send training request to sklearn service"""
+        payload = {
+            "user_id": user_id,
+            "username": username,
+            "item_id": item_id,
+            "item_name": item_name,
+            "price_history": price_history
+        }
+        prices = price_history.get("prices") if isinstance(price_history, dict) else None
+        logger.info(
+            f"Sending training request for item {item_name} (ID: {item_id}) of user {username} (ID: {user_id}), "
+            f"{len(prices) if isinstance(prices, list) else 0} price points"
+        )
+        response = await self._post_json("/train", payload, SKLEARN_TRAIN_TIMEOUT, logging.INFO)
+        return decode_results(response.content, response.headers.get("content-type"))
+
+    async def train_models(self, user_id: int, username: str, items: Iterable[Tuple[int, str, Dict[str, Any]]],
+                           concurrency: int = SKLEARN_GROUP_TRAIN_CONCURRENCY
+                           ) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+        """
+        Train several (item_id, item_name, price_history) items with at most `concurrency` trainings in flight.
+        Yields (item_id, response) as each training finishes, the response is the exception for a failed item
+        so one failure does not stop the others.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def train(item_id: int, item_name: str, price_history: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    return item_id, await self.train_model(user_id, username, item_id, item_name, price_history)
+                except Exception as e:
+                    return item_id, e
+
+        tasks = [asyncio.ensure_future(train(*item)) for item in items]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # Trainings still running when the caller stops are not waited for
+            for task in tasks:
+                task.cancel()
+
+    async def predict_price(self, user_id: int, username: str, item_id: int, item_name: str,
                            data_hash: str, start_time: str, end_time: str) -> Dict[str, Any]:
         """Send prediction request to sklearn service"""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/predict",
-                json={
-                    "user_id": user_id,
-                    "username": username,
-                    "item_id": item_id,
-                    "item_name": item_name,
-                    "data_hash": data_hash,
-                    "start_time": start_time,
-                    "end_time": end_time
-                }
-            )
-            response.raise_for_status()
-            return response.json()
-    
-    async def validate_price_history(self, price_history: Dict[str, Any]) -> bool:
-        """Validate price history data format"""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            logging.info(f"Validating price history data: \n===========\n{price_history}\n===========")
-            response = await client.post(f"{self.base_url}/validate", json=price_history)
-            response.raise_for_status()
-            result = response.json()
-            data = result.get("data", {})
-            return data.get("valid", False), data.get("error", "")
-    
+        response = await self._post_json("/predict", {
+            "user_id": user_id,
+            "username": username,
+            "item_id": item_id,
+            "item_name": item_name,
+            "data_hash": data_hash,
+            "start_time": start_time,
+            "end_time": end_time
+        }, SKLEARN_PREDICT_TIMEOUT, hedge=True)
+        return decode_results(response.content, response.headers.get("content-type"))
+
     async def health_check(self) -> bool:
-        """Check if sklearn service is healthy"""
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.base_url}/health")
+        """Check if at least one sklearn service replica is healthy"""
+        async def check(replica: Replica) -> bool:
+            try:
+                response = await get_http_client().get(f"{replica.url}/health", timeout=_timeout(SKLEARN_HEALTH_TIMEOUT))
                 return response.status_code == 200
-        except:
-            return False
\ No newline at end of file
+            except Exception:
+                return False
+        return any(await asyncio.gather(*(check(replica) for replica in self.pool.replicas)))
@@ -0,0 +1,127 @@
+from typing import Any, Dict, Iterable, List, Optional
+from collections import deque
+import httpx
+import asyncio, logging, random, time
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    """One ML service endpoint with its in-flight request count and recent prediction latencies."""
+
+    def __init__(self, url: str, latency_window: int):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.latencies = deque(maxlen=latency_window)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaPool:
+    """
+    The ML service replicas a client balances over. pick() returns the healthy replica with the fewest
+    outstanding requests (random among ties), so a replica busy with long training calls stops getting new work.
+    Replicas are probed on /health in the background, and one that refuses connections is taken out of
+    rotation until a probe succeeds again. When every replica is down, all of them are tried anyway.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        health_interval: float = 10.0,
+        health_timeout: float = 5.0,
+        latency_window: int = 200,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.05,
+        hedge_default_delay: float = 1.0,
+    ):
+        self.replicas: List[Replica] = [Replica(url, latency_window) for url in urls if url]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.latencies = deque(maxlen=latency_window)
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._health_task = None
+
+    def pick(self, exclude: Iterable[Replica] = ()) -> Optional[Replica]:
+        """Least outstanding healthy replica not in exclude, None if there is no other replica."""
+        excluded = set(map(id, exclude))
+        candidates = [replica for replica in self.replicas if id(replica) not in excluded]
+        healthy = [replica for replica in candidates if replica.healthy] or candidates
+        if not healthy:
+            return None
+        fewest = min(replica.outstanding for replica in healthy)
+        return random.choice([replica for replica in healthy if replica.outstanding == fewest])
+
+    def record_success(self, replica: Replica, latency: Optional[float] = None):
+        replica.healthy = True
+        if latency is not None:
+            replica.latencies.append(latency)
+            self.latencies.append(latency)
+
+    def record_failure(self, replica: Replica, error: Exception):
+        """Count a failed request, connection failures take the replica out of rotation until it answers a probe."""
+        replica.failures += 1
+        replica.last_error = str(error) or type(error).__name__
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            replica.healthy = False
+
+    def hedge_delay(self) -> float:
+        """How long to wait for a prediction before hedging it: the p95 of recent predictions across replicas."""
+        if len(self.latencies) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        ordered = sorted(self.latencies)
+        return max(self.hedge_min_delay, ordered[int(len(ordered) * 0.95) - 1])
+
+    def start_health_checks(self, client_factory):
+        """Start probing the replicas in the background, once per pool."""
+        if self._health_task is None and len(self.replicas) > 1:
+            self._health_task = asyncio.ensure_future(self._check_health(client_factory))
+
+    async def _check_health(self, client_factory):
+        try:
+            while True:
+                await asyncio.gather(*(self._probe(client_factory(), replica) for replica in self.replicas))
+                await asyncio.sleep(self.health_interval)
+        finally:
+            self._health_task = None
+
+    async def _probe(self, client: httpx.AsyncClient, replica: Replica):
+        try:
+            response = await client.get(f"{replica.url}/health", timeout=self.health_timeout)
+            healthy = response.status_code == 200
+            if not healthy:
+                replica.last_error = f"health check answered {response.status_code}"
+        except Exception as e:
+            healthy = False
+            replica.last_error = str(e) or type(e).__name__
+        if healthy != replica.healthy:
+            logger.warning(f"ML replica {replica.url} is {'back in rotation' if healthy else 'out of rotation'}")
+        replica.healthy = healthy
+
+    def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "replicas": [replica.status() for replica in self.replicas],
+            "hedge_delay": round(self.hedge_delay(), 3),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
@@ -2,7 +2,7 @@ import boto3
 import json
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
@@ -30,7 +30,7 @@ class SQSClient:
             self.sqs = None
     
     def send_training_job(self, user_id: int, username: str, group_id: int, item_id: int, 
-                         item_name: str, price_history: Dict[str, Any]) -> bool:
+                         item_name: str, price_history: Optional[Dict[str, Any]] = None) -> bool:
         """
         Send a training job to the SQS queue.
         
@@ -39,7 +39,7 @@ class SQSClient:
             username: Username
             item_id: Item ID
             item_name: Item name
-            price_history: Price history data
+            price_history: Price history data, omit to have the worker read the stored price points
             
         Returns:
             bool: True if message was sent successfully
@@ -55,9 +55,10 @@ class SQSClient:
             "group_id": group_id,
             "item_id": item_id,
             "item_name": item_name,
-            "price_history": price_history,
             "timestamp": str(os.getenv("TIMESTAMP", ""))
         }
+        if price_history is not None:
+            message_body["price_history"] = price_history
         
         try:
             response = self.sqs.send_message(
@@ -1,79 +1,316 @@
-import requests, os, json
-from urllib.parse import urlencode
+import httpx, asyncio, heapq, os, json, random
 from collections import Counter
-from typing import Optional
+from operator import itemgetter
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from app.services.inventory_index import new_inventory_index, add_to_inventory_index, search_inventory_index, normalize_name
+from typing import Dict, Iterable, List, Optional, Tuple
 
 STEAM_COM_BASE = os.getenv("STEAM_COM_BASE")
 STEAM_API_BASE = os.getenv("STEAM_API_BASE")
 
 API_KEY = os.getenv("STEAM_API_KEY")
+# Steam only serves market price history to a signed in session
+STEAM_LOGIN_SECURE = os.getenv("STEAM_LOGIN_SECURE")
+
+# Shared HTTP client settings, connections to Steam are pooled and kept alive between requests
+STEAM_TIMEOUT = float(os.getenv("STEAM_TIMEOUT", 10))
+STEAM_CONNECT_TIMEOUT = float(os.getenv("STEAM_CONNECT_TIMEOUT", 3))
+STEAM_POOL_TIMEOUT = float(os.getenv("STEAM_POOL_TIMEOUT", 5))
+STEAM_MAX_CONNECTIONS = int(os.getenv("STEAM_MAX_CONNECTIONS", 20))
+STEAM_MAX_KEEPALIVE = int(os.getenv("STEAM_MAX_KEEPALIVE", 10))
+STEAM_KEEPALIVE_EXPIRY = float(os.getenv("STEAM_KEEPALIVE_EXPIRY", 30))
+
+# Request budget per Steam host as (requests per second, burst), Steam Community throttles much harder
+STEAM_RATE_LIMITS = {
+    "api.steampowered.com": (float(os.getenv("STEAM_API_RATE", 10)), float(os.getenv("STEAM_API_BURST", 20))),
+    "steamcommunity.com": (float(os.getenv("STEAM_COMMUNITY_RATE", 0.5)), float(os.getenv("STEAM_COMMUNITY_BURST", 5))),
+}
+STEAM_DEFAULT_RATE_LIMIT = (float(os.getenv("STEAM_DEFAULT_RATE", 5)), float(os.getenv("STEAM_DEFAULT_BURST", 10)))
+STEAM_RATE_LIMIT_MAX_WAIT = float(os.getenv("STEAM_RATE_LIMIT_MAX_WAIT", 30))
+
+# Retries of throttled (429), failed (5xx) and dropped requests, with full-jitter exponential backoff
+STEAM_MAX_RETRIES = int(os.getenv("STEAM_MAX_RETRIES", 4))
+STEAM_BACKOFF_BASE = float(os.getenv("STEAM_BACKOFF_BASE", 0.5))
+STEAM_BACKOFF_MAX = float(os.getenv("STEAM_BACKOFF_MAX", 30))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Inventories are fetched page by page, bounded so a runaway pagination cannot loop forever
+STEAM_INVENTORY_PAGE_SIZE = int(os.getenv("STEAM_INVENTORY_PAGE_SIZE", 2000))
+STEAM_INVENTORY_MAX_PAGES = int(os.getenv("STEAM_INVENTORY_MAX_PAGES", 50))
+
+# Class pairs resolved per GetAssetClassInfo call
+STEAM_CLASS_INFO_BATCH_SIZE = int(os.getenv("STEAM_CLASS_INFO_BATCH_SIZE", 100))
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared async HTTP client for Steam, requests beyond STEAM_MAX_CONNECTIONS wait for a free connection.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(STEAM_TIMEOUT, connect=STEAM_CONNECT_TIMEOUT, pool=STEAM_POOL_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=STEAM_MAX_CONNECTIONS,
+                max_keepalive_connections=STEAM_MAX_KEEPALIVE,
+                keepalive_expiry=STEAM_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Delay before retry number `attempt` (0-based), honouring a Retry-After header when Steam sends one
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), STEAM_BACKOFF_MAX)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                return min(max(delay, 0.0), STEAM_BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(STEAM_BACKOFF_MAX, STEAM_BACKOFF_BASE * 2 ** attempt))
+
+_ASSET_CLASS = itemgetter("classid", "instanceid")
+
+# Normalized (classid, instanceid) pair, Steam ids are compared as strings and a missing instance is 0
+def _class_pair(classid, instanceid) -> Tuple[str, str]:
+    return str(classid), str(instanceid or 0)
+
+# Count the copies of every item in one pass, as rows of
+# [market_hash_name, copies, tradable copies, position of its first description] in inventory order
+def summarize_inventory(assets: Optional[List[dict]], descriptions: List[dict]) -> List[list]:
+    if assets:
+        # Copies per class, Steam sends the ids of assets and descriptions as the same strings
+        copies = Counter(map(_ASSET_CLASS, assets))
+        for asset in assets:
+            if asset.get("amount", "1") != "1":
+                copies[_ASSET_CLASS(asset)] += int(asset["amount"]) - 1
+    else:
+        # Inventories cached without assets only have one entry per description
+        copies = Counter(map(_ASSET_CLASS, descriptions))
+
+    rows = {}
+    for position, desc in enumerate(descriptions):
+        amount = copies.get(_ASSET_CLASS(desc))
+        name = desc.get("market_hash_name")
+        if not amount or not name:
+            continue
+        row = rows.get(name)
+        if row is None:
+            row = rows[name] = [name, 0, 0, position]
+        row[1] += amount
+        if desc.get("tradable", 0):
+            row[2] += amount
+    return list(rows.values())
+
+# The top_n most held items from an inventory's summary
+def top_inventory_items(inventory: dict, top_n: int = 5, tradable_only: bool = True, include_icons: bool = False) -> List[dict]:
+    descriptions = inventory.get("descriptions", [])
+    summary = inventory.get("summary")
+    if summary is None:
+        summary = summarize_inventory(inventory.get("assets"), descriptions)
+
+    column = 2 if tradable_only else 1
+    # nlargest keeps inventory order between items held the same number of times
+    ranked = heapq.nlargest(top_n, (row for row in summary if row[column]), key=itemgetter(column))
+    result = []
+    for name, count, tradable_count, position in ranked:
+        desc = descriptions[position]
+        item = {
+            "market_hash_name": name,
+            "count": count,
+            "tradable_count": tradable_count,
+            "name": desc.get("name"),
+            "tradable": tradable_count > 0,
+        }
+        if include_icons:
+            item["icon_url"] = desc.get("icon_url")
+        result.append(item)
+    return result
+
+class SteamPrivateError(ValueError):
+    """Raised when Steam refuses data because the profile or inventory is private."""
+
+class SteamUpstreamError(RuntimeError):
+    """Raised when Steam keeps throttling (status_code 429), failing or timing out after the retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 class steamAPI:
     """
     A simple class for interacting with the Steam Web API and Steam Community.
     Provides methods to fetch user games, inventory, item details, and generate price history URLs.
+    All requests are async and go through the shared pooled HTTP client.
+    Pass a response cache (see steam_cache.SteamResponseCache) to serve owned games and inventories from it,
+    and a rate limiter (see rate_limiter.TokenBucketRateLimiter) to keep requests within Steam's budget.
     """
-    def __init__(self, steam_id: int):
+    def __init__(self, steam_id: int, cache=None, limiter=None):
         self.steam_com_base = STEAM_COM_BASE
         self.steam_api_base = STEAM_API_BASE
         self.api_key = API_KEY
         self.steam_id = steam_id
+        self.cache = cache
+        self.limiter = limiter
+
+    # Fetch through the response cache when one is configured
+    async def _cached(self, endpoint: str, appid: Optional[int], fetch):
+        if self.cache is None:
+            return await fetch()
+        return await self.cache.fetch(self.steam_id, endpoint, appid, fetch)
+
+    # Send a GET request to Steam and decode the JSON body, retrying throttled and failed requests
+    async def _get_json(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None):
+        host = httpx.URL(url).host
+        for attempt in range(STEAM_MAX_RETRIES + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire(host)
+            try:
+                response = await get_http_client().get(url, params=params, headers=headers)
+            except httpx.TransportError:
+                if attempt == STEAM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < STEAM_MAX_RETRIES:
+                delay = _retry_delay(attempt, response)
+                if response.status_code == 429 and self.limiter is not None:
+                    # Pause the host for every caller, the retry then queues behind the cooldown
+                    await self.limiter.penalize(host, delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response.json()
 
     # Get the list of user games
-    def _get_game_list(self):
+    async def _get_game_list(self):
         url = f"{self.steam_api_base}/IPlayerService/GetOwnedGames/v1"
         params = {
             "key": self.api_key,
             "steamid": self.steam_id,
-            "include_appinfo": True,
-            "include_played_free_games": True
+            "include_appinfo": "true",
+            "include_played_free_games": "true"
         }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return await self._cached("owned_games", None, lambda: self._get_json(url, params))
 
     # Get the user inventory for a specific game
-    def _get_inventory(self, game_id: int):
+    async def _get_inventory(self, game_id: int):
+        return await self._cached("inventory", game_id, lambda: self._fetch_inventory(game_id))
+
+    # Yield the pages of a user inventory as they arrive, following more_items/last_assetid
+    async def _iter_inventory_pages(self, game_id: int):
         url = f"{self.steam_com_base}/inventory/{self.steam_id}/{game_id}/2"
+        params = {"l": "english", "count": STEAM_INVENTORY_PAGE_SIZE}
+        for _ in range(STEAM_INVENTORY_MAX_PAGES):
+            page = await self._get_json(url, params)
+            yield page
+            if not page.get("more_items") or not page.get("last_assetid"):
+                return
+            params = {**params, "start_assetid": page["last_assetid"]}
+
+    # Load every page of an inventory, indexing its descriptions for search while they stream in
+    # and summarizing the copies held of every item once all assets are in
+    async def _fetch_inventory(self, game_id: int):
+        assets = []
+        descriptions = []
+        seen = set()
+        index = new_inventory_index()
+        total = None
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except requests.HTTPError as e:
-            raise ValueError(f"Steam inventory fetch failed: {e}")
+            async for page in self._iter_inventory_pages(game_id):
+                total = page.get("total_inventory_count", total)
+                assets.extend(page.get("assets", []))
+                for desc in page.get("descriptions", []):
+                    # The same class can be described again on later pages
+                    class_key = (desc.get("classid"), desc.get("instanceid"))
+                    if class_key in seen:
+                        continue
+                    seen.add(class_key)
+                    add_to_inventory_index(index, len(descriptions), desc)
+                    descriptions.append(desc)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (401, 403):
+                raise SteamPrivateError(f"Steam inventory is private: {e}")
+            raise SteamUpstreamError(f"Steam inventory fetch failed: {e}", e.response.status_code)
+        except httpx.TransportError as e:
+            raise SteamUpstreamError(f"Steam inventory fetch failed: {e}")
+        return {
+            "assets": assets,
+            "descriptions": descriptions,
+            "total_inventory_count": total if total is not None else len(assets),
+            "index": index,
+            "summary": summarize_inventory(assets, descriptions),
+        }
 
     # Get the hash for the specific item
-    def _get_market_hash(self, appid: int, classid: int, instanceid: int):
+    async def _get_market_hash(self, appid: int, classid: int, instanceid: int):
+        market_hashes = await self._get_market_hashes(appid, [(classid, instanceid)])
+        return market_hashes.get(_class_pair(classid, instanceid))
+
+    # Resolve the market hash names of many items, keyed by their normalized (classid, instanceid) pair
+    async def _get_market_hashes(self, appid: int, pairs: Iterable[Tuple[int, int]]) -> Dict[Tuple[str, str], Optional[str]]:
+        unique = list(dict.fromkeys(_class_pair(classid, instanceid) for classid, instanceid in pairs))
+        if not unique:
+            return {}
+        if self.cache is None:
+            market_hashes = await self._fetch_market_hashes(appid, unique)
+        else:
+            # Class info never changes, only pairs missing from the cache are sent to Steam
+            market_hashes = await self.cache.fetch_class_info(
+                appid, unique, lambda missing: self._fetch_market_hashes(appid, missing)
+            )
+        return {pair: market_hashes.get(pair) for pair in unique}
+
+    # Send the pairs to Steam in batches of STEAM_CLASS_INFO_BATCH_SIZE, the rate limiter paces the batches
+    async def _fetch_market_hashes(self, appid: int, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        batches = [pairs[start:start + STEAM_CLASS_INFO_BATCH_SIZE] for start in range(0, len(pairs), STEAM_CLASS_INFO_BATCH_SIZE)]
+        market_hashes = {}
+        for batch in await asyncio.gather(*(self._fetch_class_info_batch(appid, batch) for batch in batches)):
+            market_hashes.update(batch)
+        return market_hashes
+
+    async def _fetch_class_info_batch(self, appid: int, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
         url = f"{self.steam_api_base}/ISteamEconomy/GetAssetClassInfo/v1/"
         params = {
             "key": self.api_key,
             "appid": appid,
-            "classid0": classid,
-            "instanceid0": instanceid,
-            "class_count": 1,
+            "class_count": len(pairs),
         }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        for position, (classid, instanceid) in enumerate(pairs):
+            params[f"classid{position}"] = classid
+            params[f"instanceid{position}"] = instanceid
+        data = await self._get_json(url, params)
 
-        # Get the results and search through the key items for the market hash name
+        # Steam keys results by classid, or by classid_instanceid for items with an instance
         result = data.get("result", {})
-        result_keys = [k for k in result.keys() if k != "success"]
-        if not result_keys:
-            return None
-        first_key = result_keys[0]
-        class_info = result.get(first_key, {})
-        market_hash_name = class_info.get("market_hash_name")
-        return market_hash_name
+        market_hashes = {}
+        for classid, instanceid in pairs:
+            class_info = result.get(f"{classid}_{instanceid}") or result.get(classid) or {}
+            market_hashes[(classid, instanceid)] = class_info.get("market_hash_name")
+        return market_hashes
 
     # Find the top n amount of suitable games with the most playtime
-    def find_suitable_games(self, top_n: int = 10, min_playtime: int = 60):
+    async def find_suitable_games(self, top_n: int = 10, min_playtime: int = 60):
         """
         Returns a list of the user's top games by playtime, with their appids and names.
         Only includes games with playtime above min_playtime (in minutes).
         """
         # Check for games
-        games_data = self._get_game_list()
+        games_data = await self._get_game_list()
         if not games_data or 'response' not in games_data or 'games' not in games_data['response']:
             return []
         
@@ -90,17 +327,32 @@ class steamAPI:
         ]
 
     # Get price history for a specific item (market_hash_name) in a game
-    def generate_price_history_url(self, appid: int, marker_hash: Optional[str] = None, classid: Optional[int] = None, instanceid: Optional[int] = None):
+    async def generate_price_history_url(self, appid: int, marker_hash: Optional[str] = None, classid: Optional[int] = None, instanceid: Optional[int] = None):
         if marker_hash:
             market_hash_name = marker_hash
         elif classid is not None and instanceid is not None:
-            market_hash_name = self._get_market_hash(appid, classid, instanceid)
+            market_hash_name = await self._get_market_hash(appid, classid, instanceid)
             if not market_hash_name:
                 raise ValueError("Could not resolve market_hash_name from classid/instanceid.")
         else:
             raise ValueError("You must provide either marker_hash or both classid and instanceid.")
 
-        # Return a steam market price history URL
+        return self._price_history_url(appid, market_hash_name)
+
+    # Get price history URLs for many items at once, keyed by (classid, instanceid) as strings
+    async def generate_price_history_urls(self, appid: int, pairs: Iterable[Tuple[int, int]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Resolves every pair with as few GetAssetClassInfo calls as possible.
+        Items whose market_hash_name could not be resolved map to None.
+        """
+        market_hashes = await self._get_market_hashes(appid, pairs)
+        return {
+            pair: self._price_history_url(appid, market_hash_name) if market_hash_name else None
+            for pair, market_hash_name in market_hashes.items()
+        }
+
+    # Return a steam market price history URL
+    def _price_history_url(self, appid: int, market_hash_name: str) -> str:
         url = f"{self.steam_com_base}/market/pricehistory/"
         params = {
             "appid": appid,
@@ -109,50 +361,60 @@ class steamAPI:
         full_url = url + "?" + urlencode(params)
         return full_url
 
+    # Fetch the market price history of an item, {"prices": [[date, price, quantity], ...]}
+    async def get_price_history(self, appid: int, market_hash_name: str):
+        url = f"{self.steam_com_base}/market/pricehistory/"
+        params = {
+            "appid": appid,
+            "market_hash_name": market_hash_name
+        }
+        headers = {"Cookie": f"steamLoginSecure={STEAM_LOGIN_SECURE}"} if STEAM_LOGIN_SECURE else None
+        try:
+            data = await self._get_json(url, params, headers)
+        except httpx.HTTPStatusError as e:
+            raise SteamUpstreamError(f"Steam price history fetch failed: {e}", e.response.status_code)
+        except httpx.TransportError as e:
+            raise SteamUpstreamError(f"Steam price history fetch failed: {e}")
+        # Steam answers unknown items with an empty list or success false
+        if not isinstance(data, dict) or not data.get("success"):
+            raise ValueError(f"No price history for {market_hash_name} in app {appid}")
+        return data
+
     # Search for a specific item in the user's inventory
-    def search_item(self, appid: int, item_name: str):
-        inventory = self._get_inventory(appid)
+    async def search_item(self, appid: int, item_name: str):
+        inventory = await self._get_inventory(appid)
         descriptions = inventory.get("descriptions", [])
 
-        # Search for the market hash name
-        for desc in descriptions:
-            if item_name.lower() in desc.get("market_hash_name", "").lower() or \
-            item_name.lower() in desc.get("name", "").lower():
-                return {
-                    "market_hash_name": desc.get("market_hash_name"),
-                    "classid": desc.get("classid"),
-                    "instanceid": desc.get("instanceid"),
-                    "name": desc.get("name"),
-                    "icon_url": desc.get("icon_url"),
-                    "tradable": desc.get("tradable"),
-                }
-        return None
-
-    # Get the top N inventory items
-    # NOTE: This is not in use currently, maybe for assignment 2??
-    def get_top_inventory_items(self, appid: int, top_n: int = 5, tradable_only: bool = True):
-        inventory = self._get_inventory(appid)
-        descriptions = inventory.get("descriptions", [])
-        if tradable_only:
-            descriptions = [d for d in descriptions if d.get("tradable", 0)]
-        counts = Counter([d.get("market_hash_name") for d in descriptions])
-        top_items = counts.most_common(top_n)
-        result = []
-        for name, count in top_items:
-            for desc in descriptions:
-                if desc.get("market_hash_name") == name:
-                    result.append({
-                        "market_hash_name": name,
-                        "count": count,
-                        "name": desc.get("name"),
-                        "icon_url": desc.get("icon_url"),
-                        "tradable": desc.get("tradable"),
-                    })
-                    break
-        return result
+        # Search for the market hash name through the index cached with the inventory
+        index = inventory.get("index")
+        if index is not None:
+            desc = search_inventory_index(index, descriptions, item_name)
+        else:
+            query = normalize_name(item_name)
+            desc = next((d for d in descriptions if query in normalize_name(d.get("market_hash_name", "")) or
+                         query in normalize_name(d.get("name", ""))), None)
+        if desc is None:
+            return None
+        return {
+            "market_hash_name": desc.get("market_hash_name"),
+            "classid": desc.get("classid"),
+            "instanceid": desc.get("instanceid"),
+            "name": desc.get("name"),
+            "icon_url": desc.get("icon_url"),
+            "tradable": desc.get("tradable"),
+        }
+
+    # Get the top N inventory items, served by GET /steam/inventory/{appid}/top-items
+    async def get_top_inventory_items(self, appid: int, top_n: int = 5, tradable_only: bool = True, include_icons: bool = False):
+        """
+        Returns the user's most held items in a game by number of copies, with how many of them are tradable.
+        With tradable_only, items are ranked by their tradable copies and untradable ones are left out.
+        """
+        inventory = await self._get_inventory(appid)
+        return top_inventory_items(inventory, top_n, tradable_only, include_icons)
 
 # TESTING
-if __name__ == "__main__":
+async def _main():
     STEAMID = "76561198281140980"
     SAMPLE_GAME = "440"
     SAMPLE_CLASS_ID = 2570543230
@@ -160,14 +422,15 @@ if __name__ == "__main__":
     SAMPLE_HASH = "Civic Duty Mk.II Knife (Factory New)"
 
     steam = steamAPI(STEAMID)
-    games = steam._get_game_list()
-    inventory = steam._get_inventory(SAMPLE_GAME)
-    market_hash = steam._get_market_hash(SAMPLE_GAME)
+    games = await steam._get_game_list()
+    inventory = await steam._get_inventory(SAMPLE_GAME)
+    market_hash = await steam._get_market_hash(SAMPLE_GAME, SAMPLE_CLASS_ID, SAMPLE_INSTANCE_ID)
     print(market_hash)
-    price_history = steam.generate_price_history_url(SAMPLE_GAME)
-    suitable_games = steam.find_suitable_games()
-    search_results = steam.search_item(market_hash)
+    price_history = await steam.generate_price_history_url(SAMPLE_GAME, marker_hash=SAMPLE_HASH)
+    suitable_games = await steam.find_suitable_games()
+    search_results = await steam.search_item(SAMPLE_GAME, SAMPLE_HASH)
     print(search_results)
+    await close_http_client()
     items = [games, inventory, market_hash, price_history, suitable_games]
     file = ["games.json", "inventory.json", "market_hash.json", "price_history.txt", "suitable_games.json"]
     for i in range(len(file)):
@@ -175,4 +438,7 @@ if __name__ == "__main__":
             if i == 3:
                 f.write(price_history)
             else:
-                json.dump(items[i], f, indent=2)
\ No newline at end of file
+                json.dump(items[i], f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,144 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.services.redis import redis_cache
+from app.services.steam import SteamPrivateError, STEAM_RATE_LIMITS, STEAM_DEFAULT_RATE_LIMIT, STEAM_RATE_LIMIT_MAX_WAIT
+from app.services.rate_limiter import TokenBucketRateLimiter
+import asyncio, logging, os, time
+
+logger = logging.getLogger(__name__)
+
+# Seconds a response is fresh, then how much longer it may be served stale while it is refreshed
+STEAM_CACHE_TTLS = {
+    "owned_games": (int(os.getenv("STEAM_CACHE_GAMES_TTL", 3600)), 24 * 3600),
+    "inventory": (int(os.getenv("STEAM_CACHE_INVENTORY_TTL", 300)), 6 * 3600),
+}
+# Private profiles and empty responses are remembered briefly, then fetched again before being served
+STEAM_CACHE_NEGATIVE_TTL = int(os.getenv("STEAM_CACHE_NEGATIVE_TTL", 120))
+STEAM_CACHE_REFRESH_LOCK_TTL = 30
+# Asset class info is immutable, it is only bounded so classes nobody looks up again eventually expire
+STEAM_CLASS_INFO_TTL = int(os.getenv("STEAM_CLASS_INFO_TTL", 30 * 24 * 3600))
+
+
+class SteamResponseCache:
+    """
+    Caches Steam responses in Redis per (steam_id, endpoint, appid) with stale-while-revalidate:
+    fresh entries are served as is, stale ones are served immediately while a single background
+    refresh (across replicas) replaces them. Private and empty results are cached negatively for
+    a short time so repeated lookups do not hit Steam either, once expired they are fetched again
+    by a single request per key that concurrent callers wait for.
+    """
+
+    def __init__(self):
+        self._refreshing: Set[str] = set()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def fetch(self, steam_id: Any, endpoint: str, appid: Optional[int], fetch: Callable[[], Awaitable[Any]]):
+        fresh_ttl, stale_ttl = STEAM_CACHE_TTLS[endpoint]
+        key = f"steam:{endpoint}:{steam_id}:{appid or 0}"
+
+        # Cold misses share a single Steam request per key
+        entry = await redis_cache.get_or_set(key, lambda: self._load(endpoint, fetch), ttl=fresh_ttl + stale_ttl)
+        age = time.time() - entry["fetched_at"]
+
+        if entry["negative"]:
+            if age > STEAM_CACHE_NEGATIVE_TTL:
+                entry = await self._refresh_shared(key, endpoint, fetch, fresh_ttl + stale_ttl)
+            if "error" in entry:
+                raise SteamPrivateError(entry["error"])
+        elif age > fresh_ttl:
+            self._schedule_refresh(key, endpoint, fetch, fresh_ttl + stale_ttl)
+        return entry["data"]
+
+    async def fetch_class_info(
+        self,
+        appid: int,
+        pairs: List[Tuple[str, str]],
+        fetch_missing: Callable[[List[Tuple[str, str]]], Awaitable[Dict[Tuple[str, str], Optional[str]]]],
+    ) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Market hash names per (classid, instanceid), shared across users. Cached names are read in one
+        round trip and only the missing pairs are fetched. Unresolved pairs are not cached.
+        """
+        keys = {pair: f"steam:classinfo:{appid}:{pair[0]}:{pair[1]}" for pair in pairs}
+        cached = await redis_cache.get_many(keys.values())
+        market_hashes = {pair: cached[key] for pair, key in keys.items() if key in cached}
+
+        missing = [pair for pair in pairs if pair not in market_hashes]
+        if missing:
+            fetched = await fetch_missing(missing)
+            market_hashes.update(fetched)
+            resolved = {keys[pair]: name for pair, name in fetched.items() if name}
+            if resolved:
+                await redis_cache.set_many(resolved, ttl=STEAM_CLASS_INFO_TTL)
+        return market_hashes
+
+    async def _load(self, endpoint: str, fetch) -> Dict[str, Any]:
+        try:
+            data = await fetch()
+        except SteamPrivateError as e:
+            return {"fetched_at": time.time(), "negative": True, "error": str(e)}
+        return {"fetched_at": time.time(), "negative": self._is_empty(endpoint, data), "data": data}
+
+    async def _refresh(self, key: str, endpoint: str, fetch, ttl: int) -> Dict[str, Any]:
+        entry = await self._load(endpoint, fetch)
+        await redis_cache.set(key, entry, ttl=ttl)
+        return entry
+
+    # Refresh inline, concurrent callers of the same key wait for one Steam request instead of each sending theirs
+    async def _refresh_shared(self, key: str, endpoint: str, fetch, ttl: int) -> Dict[str, Any]:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await self._refresh(key, endpoint, fetch, ttl)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other caller was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _schedule_refresh(self, key: str, endpoint: str, fetch, ttl: int):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        asyncio.ensure_future(self._refresh_in_background(key, endpoint, fetch, ttl))
+
+    async def _refresh_in_background(self, key: str, endpoint: str, fetch, ttl: int):
+        try:
+            # Only one replica refreshes a given key, the others keep serving the stale entry
+            if await redis_cache.set_nx(f"lock:{key}:refresh", 1, STEAM_CACHE_REFRESH_LOCK_TTL):
+                await self._refresh(key, endpoint, fetch, ttl)
+                logger.info(f"Refreshed stale Steam response {key}")
+        except Exception as e:
+            logger.warning(f"Background refresh of Steam response {key} failed, serving stale data: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    @staticmethod
+    def _is_empty(endpoint: str, data: Any) -> bool:
+        if endpoint == "inventory":
+            return not data or not data.get("descriptions")
+        if endpoint == "owned_games":
+            return not data or not data.get("response", {}).get("games")
+        return not data
+
+
+steam_response_cache = SteamResponseCache()
+
+# One request budget per Steam host, shared by all replicas through Redis
+steam_rate_limiter = TokenBucketRateLimiter(
+    redis_cache,
+    STEAM_RATE_LIMITS,
+    STEAM_DEFAULT_RATE_LIMIT,
+    max_wait=STEAM_RATE_LIMIT_MAX_WAIT,
+    key_prefix="steam:ratelimit",
+)
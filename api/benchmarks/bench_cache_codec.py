@@ -0,0 +1,89 @@
+"""
+Benchmark cache codecs on a real Steam price history.
+
+Reports encode/decode time and stored bytes for each format and compression the cache can use,
+against the previous plain json.dumps storage. Codecs whose libraries are not installed are skipped.
+
+    python api/benchmarks/bench_cache_codec.py [path/to/price_history.json] [--runs 50]
+"""
+from pathlib import Path
+import argparse, importlib.util, json, statistics, time
+
+API_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_HISTORY = API_DIR / "sklearn_worker" / "price_history_raw_1.json"
+
+# Load the codec module on its own, importing app.services would connect to Redis
+_spec = importlib.util.spec_from_file_location("cache_codec", API_DIR / "app" / "services" / "cache_codec.py")
+cache_codec = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cache_codec)
+
+
+def _time_ms(func, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _available(fmt: str, compression: str) -> bool:
+    if fmt == "msgpack" and cache_codec.msgpack is None:
+        return False
+    return cache_codec._compression_available(cache_codec.COMPRESSIONS[compression])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("history", nargs="?", default=str(DEFAULT_HISTORY))
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    text = Path(args.history).read_text()
+    value = json.loads(text)
+    # Shape the history the way the group items cache stores it
+    items = [{"id": 1, "group_id": 1, "item_name": "benchmark", "item_json": value}]
+    items_text = json.dumps(items)
+    print(f"{args.history}: {len(text)} bytes on disk, {len(value.get('prices', []))} price points")
+    print(f"orjson: {'yes' if cache_codec.orjson else 'no'}, median of {args.runs} runs\n")
+
+    rows = [(
+        "json.dumps (previous)",
+        _time_ms(lambda: json.dumps(items), args.runs),
+        _time_ms(lambda: json.loads(items_text), args.runs),
+        len(items_text.encode()),
+    )]
+    for fmt in ("json", "msgpack"):
+        for compression in ("none", "zlib", "zstd", "lz4"):
+            if not _available(fmt, compression):
+                continue
+            codec = cache_codec.CacheCodec(fmt, compression)
+            stored = codec.encode(items)
+            assert codec.decode(stored) == items
+            rows.append((
+                f"{fmt}+{compression}",
+                _time_ms(lambda: codec.encode(items), args.runs),
+                _time_ms(lambda: codec.decode(stored), args.runs),
+                len(stored),
+            ))
+    for compression in ("none", "zlib", "zstd", "lz4"):
+        if not _available("json", compression):
+            continue
+        codec = cache_codec.CacheCodec("json", compression)
+        stored = codec.encode_text(items_text)
+        assert codec.decode_text(stored) == items_text
+        rows.append((
+            f"text+{compression} (raw view)",
+            _time_ms(lambda: codec.encode_text(items_text), args.runs),
+            _time_ms(lambda: codec.decode_text(stored), args.runs),
+            len(stored),
+        ))
+
+    baseline = rows[0][3]
+    print(f"{'codec':<26}{'encode ms':>11}{'decode ms':>11}{'bytes':>10}{'ratio':>8}")
+    for name, encode_ms, decode_ms, size in rows:
+        print(f"{name:<26}{encode_ms:>11.3f}{decode_ms:>11.3f}{size:>10}{size / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
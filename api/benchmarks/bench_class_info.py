@@ -0,0 +1,65 @@
+"""
+Benchmark market hash resolution against the local Steam stub.
+
+Resolves the price history URLs of a whole inventory one GetAssetClassInfo call per item (how the
+client used to work) and through the batched resolver, counting the requests the stub served.
+
+    python api/benchmarks/bench_class_info.py [--items 1000] [--latency 0.05]
+"""
+from pathlib import Path
+import argparse, asyncio, os, sys, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from service_loader import load_service
+from steam_stub import SteamStubHandler, inventory, start_stub_server
+
+
+async def per_item(steam, pairs: list):
+    client = steam.steamAPI("76561190")
+    semaphore = asyncio.Semaphore(steam.STEAM_MAX_CONNECTIONS)
+
+    async def resolve(classid, instanceid):
+        async with semaphore:
+            return await client._fetch_class_info_batch(730, [steam._class_pair(classid, instanceid)])
+
+    await asyncio.gather(*(resolve(classid, instanceid) for classid, instanceid in pairs))
+    await steam.close_http_client()
+
+
+async def batched(steam, pairs: list):
+    urls = await steam.steamAPI("76561190").generate_price_history_urls(730, pairs)
+    await steam.close_http_client()
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated Steam latency in seconds")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.update({"STEAM_API_BASE": base_url, "STEAM_COM_BASE": base_url, "STEAM_API_KEY": "stub"})
+    steam = load_service("steam")
+
+    # Every asset of the inventory, duplicates included
+    assets = inventory(730, size=args.items, count=args.items)["assets"]
+    pairs = [(asset["classid"], asset["instanceid"]) for asset in assets] * 2
+
+    print(f"{len(pairs)} items ({args.items} distinct), {args.latency * 1000:.0f} ms simulated latency, "
+          f"batches of {steam.STEAM_CLASS_INFO_BATCH_SIZE}\n")
+    print(f"{'resolver':<14}{'wall':>9}{'requests':>10}")
+    for name, run in (("per item", per_item), ("batched", batched)):
+        SteamStubHandler.requests_served = 0
+        started = time.perf_counter()
+        urls = asyncio.run(run(steam, pairs))
+        wall = time.perf_counter() - started
+        print(f"{name:<14}{wall:>8.2f}s{SteamStubHandler.requests_served:>10}")
+    unresolved = sum(url is None for url in urls.values())
+    print(f"\n{len(urls)} urls, {unresolved} unresolved")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
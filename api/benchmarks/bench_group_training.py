@@ -0,0 +1,115 @@
+"""
+Benchmark training a whole group of items over HTTP.
+
+Starts local stand-ins for the ML service that train two models at a time each (its default training
+workers) and fail every seventh item. Trains the same group one item after another (how group training
+used to work) and through SklearnClient.train_models with its concurrency matched to the replicas.
+
+    python api/benchmarks/bench_group_training.py [--items 20] [--train-seconds 0.3]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse, asyncio, json, os, sys, threading, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from service_loader import load_service
+
+
+def start_ml_stub(train_seconds: float, workers: int = 2):
+    training = threading.Semaphore(workers)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._reply(200, b'{"app_status":"healthy"}')
+
+        def do_POST(self):
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            with training:
+                time.sleep(train_seconds)
+            if job["item_id"] % 7 == 0:
+                self._reply(500, b'{"detail":"Error in create_model: not enough points"}')
+                return
+            data = {"data_hash": f"{job['item_id']:016x}", "graph_key": "graphs/g.png", "graph_url": "graphs/g.png"}
+            self._reply(200, json.dumps({"success": True, "message": "Model trained successfully", "data": data}).encode())
+
+    server_class = type("MLStubServer", (ThreadingHTTPServer,), {"request_queue_size": 128})
+    server = server_class(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", server
+
+
+async def sequential(client, items):
+    trained, failed = 0, 0
+    for item in items:
+        try:
+            await client.train_model(1, "bench", *item)
+            trained += 1
+        except Exception:
+            failed += 1
+    return trained, failed
+
+
+async def bounded(client, items, concurrency: int):
+    trained, failed = 0, 0
+    async for _, response in client.train_models(1, "bench", items, concurrency):
+        if isinstance(response, Exception):
+            failed += 1
+        else:
+            trained += 1
+    return trained, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--train-seconds", type=float, default=0.3)
+    args = parser.parse_args()
+
+    stubs = [start_ml_stub(args.train_seconds) for _ in range(2)]
+    urls = [url for url, _ in stubs]
+    os.environ["SKLEARN_SERVICE_URLS"] = urls[0]
+    sklearn = load_service("sklearn")
+    history = {"prices": [["Jul 14 2025 01: +0", 1.5, "3"]] * 100}
+    items = [(item_id, f"Item {item_id}", history) for item_id in range(1, args.items + 1)]
+
+    print(f"{args.items} items, {args.train_seconds}s per training, 2 trainings at a time per replica\n")
+    print(f"{'group training':<34}{'wall':>8}{'trained':>9}{'failed':>8}")
+    for name, replicas, concurrency in (
+        ("one item at a time", 1, None),
+        ("bounded, 1 replica", 1, 2),
+        ("bounded, 2 replicas", 2, 4),
+    ):
+        client = sklearn.SklearnClient(sklearn.ReplicaPool(urls[:replicas]))
+
+        async def run():
+            started = time.perf_counter()
+            if concurrency is None:
+                counts = await sequential(client, items)
+            else:
+                counts = await bounded(client, items, concurrency)
+            wall = time.perf_counter() - started
+            await sklearn.close_http_client()
+            return wall, counts
+
+        wall, (trained, failed) = asyncio.run(run())
+        label = name if concurrency is None else f"{name} (limit {concurrency})"
+        print(f"{label:<34}{wall:>7.2f}s{trained:>9}{failed:>8}")
+    for _, server in stubs:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
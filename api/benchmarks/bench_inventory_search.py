@@ -0,0 +1,66 @@
+"""
+Benchmark inventory search against a large paged inventory from the local Steam stub.
+
+Fetches the inventory page by page through the Steam client, then times the same item searches
+as a linear scan over the descriptions (how search_item used to work) and through the name index.
+
+    python api/benchmarks/bench_inventory_search.py [--inventory-size 20000] [--searches 2000]
+"""
+from pathlib import Path
+import argparse, asyncio, os, sys, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from service_loader import load_service
+from steam_stub import start_stub_server
+
+
+def linear_search(descriptions: list, item_name: str):
+    for desc in descriptions:
+        if item_name.lower() in desc.get("market_hash_name", "").lower() or \
+        item_name.lower() in desc.get("name", "").lower():
+            return desc
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inventory-size", type=int, default=20000)
+    parser.add_argument("--searches", type=int, default=2000)
+    args = parser.parse_args()
+
+    server = start_stub_server(inventory_size=args.inventory_size)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.update({"STEAM_API_BASE": base_url, "STEAM_COM_BASE": base_url, "STEAM_API_KEY": "stub"})
+    steam = load_service("steam")
+    index_module = load_service("inventory_index")
+
+    async def fetch():
+        started = time.perf_counter()
+        inventory = await steam.steamAPI("76561190")._get_inventory(730)
+        await steam.close_http_client()
+        return inventory, time.perf_counter() - started
+
+    inventory, fetch_seconds = asyncio.run(fetch())
+    descriptions = inventory["descriptions"]
+    pages = -(-args.inventory_size // steam.STEAM_INVENTORY_PAGE_SIZE)
+    print(f"fetched {len(descriptions)} descriptions in {pages} pages ({fetch_seconds:.2f}s)\n")
+
+    # Late items, substrings and misses are the expensive cases for a scan
+    queries = [f"Item {index % 200} (Well-Worn)" if index % 3 == 0 else
+               f"em {index % 200} (" if index % 3 == 1 else f"Missing {index}"
+               for index in range(args.searches)]
+    print(f"{'search':<14}{'total':>10}{'per query':>14}")
+    for name, search in (
+        ("linear scan", lambda query: linear_search(descriptions, query)),
+        ("name index", lambda query: index_module.search_inventory_index(inventory["index"], descriptions, query)),
+    ):
+        started = time.perf_counter()
+        for query in queries:
+            search(query)
+        wall = time.perf_counter() - started
+        print(f"{name:<14}{wall:>9.3f}s{wall / len(queries) * 1e6:>11.1f} us")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark event loop responsiveness of the ML service while it trains.
+
+Runs CPU-bound stand-ins for model fitting the way the /train endpoint used to (called inline from the
+async endpoint) and through the training executor, while a probe on the same event loop plays the part of
+/health and records how late it is answered. A last round has every client disconnect early to show that
+queued jobs are dropped instead of trained.
+
+    python api/benchmarks/bench_ml_executor.py [--jobs 6] [--job-seconds 1.0]
+"""
+from pathlib import Path
+import argparse, asyncio, importlib.util, statistics, time
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+
+def load_executor():
+    # Loaded from its file, the ML service modules are not a package
+    spec = importlib.util.spec_from_file_location("executor", API_DIR / "sklearn_worker" / "executor.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fit(seconds: float, cancelled=None):
+    # Pure Python work holds the GIL, the worst case for threads sharing it with the event loop
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return total
+
+
+async def probe(delays: list, stop: asyncio.Event, interval: float = 0.01):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        delays.append(time.perf_counter() - started - interval)
+
+
+async def measure(name: str, train, jobs: int):
+    delays, stop = [], asyncio.Event()
+    prober = asyncio.ensure_future(probe(delays, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(train() for _ in range(jobs)), return_exceptions=True)
+    wall = time.perf_counter() - started
+    stop.set()
+    await prober
+    delays.sort()
+    p99 = delays[int(len(delays) * 0.99) - 1] if len(delays) > 1 else delays[-1]
+    print(f"{name:<24}{wall:>8.2f}s{len(delays):>8}{statistics.median(delays) * 1e3:>10.1f}"
+          f"{p99 * 1e3:>10.1f}{delays[-1] * 1e3:>10.1f}")
+
+
+async def main(args):
+    executor = load_executor()
+    pool = executor.JobExecutor("training", args.workers, args.jobs)
+
+    async def inline():
+        return fit(args.job_seconds)
+
+    async def offloaded():
+        return await pool.run(fit, args.job_seconds)
+
+    print(f"{args.jobs} jobs of {args.job_seconds}s, {args.workers} training workers\n")
+    print(f"{'training':<24}{'wall':>9}{'probes':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    await measure("inline in endpoint", inline, args.jobs)
+    await measure("training executor", offloaded, args.jobs)
+
+    # Clients give up after a first poll, only the jobs already running are trained
+    async def gone():
+        return True
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(pool.run(fit, args.job_seconds, is_disconnected=gone)
+                                     for _ in range(args.jobs)), return_exceptions=True)
+    while pool.pending:
+        await asyncio.sleep(0.01)
+    dropped = sum(isinstance(result, executor.ClientDisconnected) for result in results)
+    print(f"\n{dropped} disconnected clients, pool idle again after {time.perf_counter() - started:.2f}s "
+          f"instead of {args.jobs * args.job_seconds / args.workers:.2f}s")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=6)
+    parser.add_argument("--job-seconds", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=2)
+    asyncio.run(main(parser.parse_args()))
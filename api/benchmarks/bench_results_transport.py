@@ -0,0 +1,67 @@
+"""
+Benchmark how prediction results travel from the ML service through the API to the client.
+
+Before: the ML service embedded the graph PNG as base64 in its JSON, the API decoded it and embedded it
+again in its own JSON. After: the ML service sends msgpack with the graph key and URL and the packed predicted
+series, and the API answers with the series as JSON or streams the stored PNG as image/png.
+Counts the bytes of both hops and times the API side of each response (decoding plus building its reply).
+
+    python api/benchmarks/bench_results_transport.py [--graph-kb 80] [--days 90] [--repeat 500]
+"""
+from pathlib import Path
+import argparse, base64, json, os, sys, timeit
+import numpy as np
+
+API_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(API_DIR / "shared"))
+from steam_market_s3_utils import utils_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph-kb", type=int, default=80, help="size of the graph PNG, a 12x6in matplotlib figure")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    # PNG data is already deflated, random bytes compress and encode the same way
+    graph = os.urandom(args.graph_kb * 1024)
+    times = np.arange(args.days, dtype="int64") * 86400 + 1752451200
+    prices = np.random.default_rng(0).uniform(1, 100, args.days)
+    graph_key = "predictions/prediction_graph_0123456789abcdef.png"
+    graph_url = f"https://bucket.s3.amazonaws.com/{graph_key}?X-Amz-Signature=" + "0" * 64
+
+    old_body = json.dumps({"success": True, "message": "Prediction completed", "data": {
+        "graph": base64.b64encode(graph).decode(), "graph_url": graph_url}}).encode()
+    new_body = utils_results.encode_results({"success": True, "message": "Prediction completed", "data": {
+        "graph_key": graph_key, "graph_url": graph_url, "series": utils_results.pack_series(times, prices)}})
+
+    def old_api():
+        data = json.loads(old_body)["data"]
+        return json.dumps({"graph": data["graph"], "graph_url": data["graph_url"]}).encode()
+
+    def new_api_json():
+        data = utils_results.decode_results(new_body, utils_results.MSGPACK_MEDIA_TYPE)["data"]
+        series_times, series_prices = utils_results.unpack_series(data["series"])
+        dates = series_times.astype("datetime64[s]").astype("datetime64[D]").astype(str)
+        points = [list(point) for point in zip(dates.tolist(), np.round(series_prices.astype("f8"), 2).tolist())]
+        return json.dumps({"graph_url": data["graph_url"], "predictions": points}).encode()
+
+    def new_api_png():
+        # The PNG bytes are streamed from storage as they are, only the results are decoded
+        utils_results.decode_results(new_body, utils_results.MSGPACK_MEDIA_TYPE)
+        return graph
+
+    print(f"{args.graph_kb} KiB graph, {args.days} predicted days\n")
+    print(f"{'transport':<30}{'ML -> API':>12}{'API -> client':>15}{'API time':>12}")
+    for name, body, reply in (
+        ("base64 graph in JSON", old_body, old_api),
+        ("msgpack refs, series JSON", new_body, new_api_json),
+        ("msgpack refs, PNG stream", new_body, new_api_png),
+    ):
+        best = min(timeit.repeat(reply, number=args.repeat, repeat=5)) / args.repeat
+        print(f"{name:<30}{len(body):>10} B{len(reply()):>13} B{best * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
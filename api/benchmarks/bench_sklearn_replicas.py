@@ -0,0 +1,102 @@
+"""
+Benchmark prediction latency across ML replicas when one of them is saturated.
+
+Starts two local stand-ins for the ML service: a healthy one and one that is busy training, so a share
+of its predictions stall. Sends the same batch of concurrent predictions to the busy replica alone (how the
+client used to work), balanced over both by least outstanding requests, and balanced with hedging.
+
+    python api/benchmarks/bench_sklearn_replicas.py [--requests 300] [--concurrency 16]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse, asyncio, json, os, random, sys, threading, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from service_loader import load_service
+
+
+def start_ml_stub(latency: float, stall: float = 0.0, stall_rate: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, body: bytes):
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client abandoned the losing request of a hedge
+                pass
+
+        def do_GET(self):
+            self._reply(b'{"app_status":"healthy"}')
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(stall if random.random() < stall_rate else latency * random.uniform(0.8, 1.2))
+            self._reply(b'{"success":true,"message":"Prediction completed","data":{}}')
+
+    server_class = type("MLStubServer", (ThreadingHTTPServer,), {"request_queue_size": 128})
+    server = server_class(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", server
+
+
+async def run(sklearn, client, count: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def predict(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.predict_price(1, "bench", index, "item", "hash", "2024-01-01", "2024-02-01")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(predict(index) for index in range(count)))
+    wall = time.perf_counter() - started
+    client.pool.stop()
+    await sklearn.close_http_client()
+    return wall, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02, help="normal prediction time in seconds")
+    parser.add_argument("--stall", type=float, default=1.5, help="prediction time on the busy replica when it stalls")
+    parser.add_argument("--stall-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    busy_url, busy = start_ml_stub(args.latency, args.stall, args.stall_rate)
+    healthy_url, healthy = start_ml_stub(args.latency)
+    os.environ["SKLEARN_SERVICE_URLS"] = busy_url
+    sklearn = load_service("sklearn")
+
+    print(f"{args.requests} predictions, {args.concurrency} concurrent, busy replica stalls "
+          f"{args.stall_rate:.0%} of requests for {args.stall}s\n")
+    print(f"{'client':<30}{'wall':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'hedges':>8}")
+    for name, urls, hedge in (
+        ("single busy replica", [busy_url], False),
+        ("least outstanding", [busy_url, healthy_url], False),
+        ("least outstanding + hedging", [busy_url, healthy_url], True),
+    ):
+        sklearn.SKLEARN_HEDGE_PREDICTIONS = hedge
+        client = sklearn.SklearnClient(sklearn.ReplicaPool(urls))
+        wall, latencies = asyncio.run(run(sklearn, client, args.requests, args.concurrency))
+        percentile = lambda share: latencies[int(len(latencies) * share) - 1] * 1000
+        print(f"{name:<30}{wall:>7.2f}s{percentile(0.5):>9.1f}{percentile(0.95):>9.1f}{percentile(0.99):>9.1f}"
+              f"{client.pool.hedges:>8}")
+    busy.shutdown()
+    healthy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
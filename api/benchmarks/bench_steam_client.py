@@ -0,0 +1,79 @@
+"""
+Benchmark the async Steam client against the local Steam stub.
+
+Runs the same batch of concurrent top-games lookups through blocking per-call requests (how the
+client used to work, serializing the event loop) and through the pooled async client.
+
+    python api/benchmarks/bench_steam_client.py [--requests 200] [--latency 0.05]
+"""
+from pathlib import Path
+from urllib.request import urlopen
+import argparse, asyncio, os, statistics, sys, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from service_loader import load_service
+from steam_stub import start_stub_server
+
+
+def load_steam_module(base_url: str):
+    os.environ["STEAM_API_BASE"] = base_url
+    os.environ["STEAM_COM_BASE"] = base_url
+    os.environ.setdefault("STEAM_API_KEY", "stub")
+    return load_service("steam")
+
+
+def _summary(name: str, wall: float, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28}{wall:>9.2f}s{len(latencies) / wall:>10.1f}{statistics.median(latencies) * 1000:>10.1f}{p95 * 1000:>10.1f}")
+
+
+async def run_blocking(base_url: str, count: int):
+    latencies = []
+
+    async def call():
+        started = time.perf_counter()
+        with urlopen(f"{base_url}/IPlayerService/GetOwnedGames/v1?steamid=1") as response:
+            response.read()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(count)))
+    return time.perf_counter() - started, latencies
+
+
+async def run_async(steam, count: int):
+    latencies = []
+
+    async def call(index: int):
+        started = time.perf_counter()
+        await steam.steamAPI(f"7656119{index}").find_suitable_games()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(index) for index in range(count)))
+    wall = time.perf_counter() - started
+    await steam.close_http_client()
+    return wall, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated Steam latency in seconds")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    steam = load_steam_module(base_url)
+
+    print(f"{args.requests} concurrent requests, {args.latency * 1000:.0f} ms simulated latency, "
+          f"{steam.STEAM_MAX_CONNECTIONS} pooled connections\n")
+    print(f"{'client':<28}{'wall':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    _summary("blocking, no session", *asyncio.run(run_blocking(base_url, args.requests)))
+    _summary("async pooled", *asyncio.run(run_async(steam, args.requests)))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
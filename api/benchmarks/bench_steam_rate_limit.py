@@ -0,0 +1,64 @@
+"""
+Benchmark the Steam rate limiter and retry policy against the throttling Steam stub.
+
+Sends a burst of concurrent inventory requests to a stub that allows --rate requests per second,
+once with retries only and once through the token bucket limiter configured at the same budget.
+The limiter runs on its per-process bucket here, in the API the bucket is shared through Redis.
+
+    python api/benchmarks/bench_steam_rate_limit.py [--requests 100] [--rate 20]
+"""
+from pathlib import Path
+import argparse, asyncio, os, sys, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from service_loader import load_service
+from steam_stub import SteamStubHandler, start_stub_server
+
+
+async def run(steam, count: int, limiter):
+    SteamStubHandler.requests_served = 0
+    SteamStubHandler.requests_throttled = 0
+    failures = 0
+
+    async def call(index: int):
+        nonlocal failures
+        try:
+            await steam.steamAPI(f"7656119{index}", limiter=limiter)._get_inventory(730)
+        except Exception:
+            failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(index) for index in range(count)))
+    wall = time.perf_counter() - started
+    await steam.close_http_client()
+    return wall, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=20, help="stub budget in requests per second")
+    parser.add_argument("--burst", type=float, default=5)
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=0.01, rate=args.rate, burst=args.burst)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.update({"STEAM_API_BASE": base_url, "STEAM_COM_BASE": base_url, "STEAM_API_KEY": "stub"})
+    os.environ.setdefault("STEAM_MAX_RETRIES", "8")
+    steam = load_service("steam")
+    rate_limiter = load_service("rate_limiter")
+
+    print(f"{args.requests} concurrent inventory requests, stub allows {args.rate:g}/s (burst {args.burst:g})\n")
+    print(f"{'client':<24}{'wall':>9}{'ok/s':>8}{'failed':>8}{'sent':>7}{'429s':>7}")
+    for name, limiter in (
+        ("retries only", None),
+        ("token bucket + retries", rate_limiter.TokenBucketRateLimiter(None, {}, (args.rate, args.burst))),
+    ):
+        wall, failures = asyncio.run(run(steam, args.requests, limiter))
+        print(f"{name:<24}{wall:>8.2f}s{(args.requests - failures) / wall:>8.1f}{failures:>8}"
+              f"{SteamStubHandler.requests_served:>7}{SteamStubHandler.requests_throttled:>7}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark price history validation.
+
+Times the per-entry validation loop the ML service used to run, the shared validator the API now
+calls in process, and the /validate round trip the API used to make for every item, against a
+local stdlib server that decodes the body and runs the validator.
+
+    python api/benchmarks/bench_validation.py [--entries 2570] [--repeat 200]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse, importlib.util, json, threading, time, timeit
+import httpx
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+
+def load_validation():
+    # Loaded from its file so the S3 utilities (and boto3) are not imported with the package
+    path = API_DIR / "shared" / "steam_market_s3_utils" / "utils_validation.py"
+    spec = importlib.util.spec_from_file_location("utils_validation", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def loop_validate(price_history: dict):
+    if not isinstance(price_history, dict):
+        return False, "Price history must be a dictionary"
+    prices = price_history.get("prices")
+    if not isinstance(prices, list) or not prices:
+        return False, "Missing or invalid 'prices' list"
+    for entry in prices:
+        if not (isinstance(entry, list) and len(entry) == 3):
+            return False, "Each price entry must be a list of [date, price, quantity]"
+        date, price, quantity = entry
+        if not isinstance(date, str):
+            return False, "Date must be a string"
+        try:
+            float(price)
+        except (ValueError, TypeError):
+            return False, "Price must be a number"
+        if not (isinstance(quantity, (str, int))):
+            return False, "Quantity must be a string or integer"
+    return True, ""
+
+
+def start_validate_server(validate):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            is_valid, error = validate(json.loads(body))
+            reply = json.dumps({"success": True, "data": {"valid": is_valid, "error": error}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    Handler.protocol_version = "HTTP/1.1"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=2570)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    validation = load_validation()
+    sample = json.loads((API_DIR / "sklearn_worker" / "price_history_raw_1.json").read_text())["prices"]
+    history = {"prices": [sample[index % len(sample)] for index in range(args.entries)]}
+    assert loop_validate(history) == validation.validate_price_history(history) == (True, "")
+
+    server = start_validate_server(validation.validate_price_history)
+    client = httpx.Client(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+
+    def round_trip():
+        return client.post("/validate", content=json.dumps(history).encode(),
+                           headers={"Content-Type": "application/json"}).json()
+
+    round_trip()
+    print(f"{len(history['prices'])} entries\n{'validation':<20}{'per history':>14}")
+    for name, validate, number in (
+        ("per-entry loop", lambda: loop_validate(history), args.repeat),
+        ("shared validator", lambda: validation.validate_price_history(history), args.repeat),
+        ("/validate hop", round_trip, max(1, args.repeat // 10)),
+    ):
+        best = min(timeit.repeat(validate, number=number, repeat=5)) / number
+        print(f"{name:<20}{best * 1e6:>11.1f} us")
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
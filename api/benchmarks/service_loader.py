@@ -0,0 +1,22 @@
+"""
+Loads app.services modules for the benchmarks without running app/services/__init__.py,
+which creates the shared Redis cache and connects to it.
+"""
+from pathlib import Path
+import importlib, sys, types
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+
+def load_service(name: str):
+    # The shared utilities are pip installed in the images, here they are imported from the tree
+    shared = str(API_DIR / "shared")
+    if shared not in sys.path:
+        sys.path.insert(0, shared)
+    # Bare packages let services import their siblings as app.services.<name>
+    for package, path in (("app", API_DIR / "app"), ("app.services", API_DIR / "app" / "services")):
+        if package not in sys.modules:
+            module = types.ModuleType(package)
+            module.__path__ = [str(path)]
+            sys.modules[package] = module
+    return importlib.import_module(f"app.services.{name}")
@@ -0,0 +1,175 @@
+"""
+Local stand-in for the Steam Web API and Steam Community endpoints the API calls.
+
+Serves deterministic games, inventories, asset class info and price history with optional latency,
+so the Steam client can be exercised and benchmarked without touching Steam.
+
+    python api/benchmarks/steam_stub.py --port 8765 --latency 0.2 --rate 5
+
+With --rate the stub throttles like Steam, answering 429 with Retry-After beyond that many requests per second.
+
+Point STEAM_API_BASE and STEAM_COM_BASE at http://127.0.0.1:8765 to use it.
+Steam ids starting with "private" get a 403 like a private profile, "empty" ones an empty inventory.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from pathlib import Path
+import argparse, json, threading, time
+
+API_DIR = Path(__file__).resolve().parents[1]
+PRICE_HISTORY_FILE = API_DIR / "sklearn_worker" / "price_history_raw_1.json"
+
+
+def owned_games(count: int = 50):
+    return {"response": {"game_count": count, "games": [
+        {"appid": 400 + index, "name": f"Game {index}", "playtime_forever": (index * 37) % 5000}
+        for index in range(count)
+    ]}}
+
+
+# Pages through the inventory like Steam: `count` assets from after `start_assetid`, with more_items/last_assetid
+def inventory(appid: int, size: int = 500, count: int = 2000, start_assetid: int = 0):
+    first = start_assetid
+    last = min(size, first + count)
+    descriptions = [{
+        "appid": appid,
+        "classid": str(1000 + index),
+        "instanceid": str(index % 7),
+        "market_hash_name": f"Item {index % 120} ({['Factory New', 'Field-Tested', 'Well-Worn'][index % 3]})",
+        "name": f"Item {index % 120}",
+        "icon_url": f"icon_{index}",
+        "tradable": index % 4 != 0,
+    } for index in range(first, last)]
+    assets = [{"appid": appid, "assetid": str(first + position + 1), "classid": d["classid"],
+               "instanceid": d["instanceid"], "amount": "1"} for position, d in enumerate(descriptions)]
+    page = {"assets": assets, "descriptions": descriptions, "total_inventory_count": size, "success": 1}
+    if last < size:
+        page.update({"more_items": 1, "last_assetid": str(last)})
+    return page
+
+
+def asset_class_info(query: dict):
+    count = int(query.get("class_count", ["1"])[0])
+    result = {"success": True}
+    for index in range(count):
+        classid = query.get(f"classid{index}", ["0"])[0]
+        instanceid = query.get(f"instanceid{index}", ["0"])[0]
+        # Like Steam, results for items with an instance are keyed classid_instanceid
+        key = classid if instanceid == "0" else f"{classid}_{instanceid}"
+        result[key] = {"classid": classid, "instanceid": instanceid, "market_hash_name": f"Item {int(classid) % 120}"}
+    return {"result": result}
+
+
+class Throttle:
+    """Token bucket deciding which requests the stub answers with 429."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class SteamStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    throttle = None
+    retry_after = 1
+    inventory_size = 500
+    price_history = None
+    requests_served = 0
+    requests_throttled = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body, headers: dict = None):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        with SteamStubHandler._lock:
+            SteamStubHandler.requests_served += 1
+            throttled = self.throttle is not None and not self.throttle.allow()
+            if throttled:
+                SteamStubHandler.requests_throttled += 1
+        if throttled:
+            return self._send_json(429, {"success": False}, {"Retry-After": str(self.retry_after)})
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+
+        if url.path.startswith("/IPlayerService/GetOwnedGames"):
+            return self._send_json(200, owned_games())
+        if url.path.startswith("/ISteamEconomy/GetAssetClassInfo"):
+            return self._send_json(200, asset_class_info(query))
+        if url.path.startswith("/market/pricehistory"):
+            if SteamStubHandler.price_history is None:
+                SteamStubHandler.price_history = PRICE_HISTORY_FILE.read_bytes()
+            return self._send_json(200, SteamStubHandler.price_history)
+        if len(parts) >= 3 and parts[0] == "inventory":
+            steam_id, appid = parts[1], int(parts[2])
+            if steam_id.startswith("private"):
+                return self._send_json(403, {"success": False})
+            if steam_id.startswith("empty"):
+                return self._send_json(200, {"total_inventory_count": 0, "success": 1})
+            return self._send_json(200, inventory(
+                appid,
+                self.inventory_size,
+                int(query.get("count", ["2000"])[0]),
+                int(query.get("start_assetid", ["0"])[0]),
+            ))
+        return self._send_json(404, {"error": "not found"})
+
+
+def start_stub_server(port: int = 0, latency: float = 0.0, rate: float = 0.0, burst: float = 1.0,
+                      inventory_size: int = 500) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread, returns the server (server.server_address has the bound port)."""
+    throttle = Throttle(rate, burst) if rate else None
+    handler = type("ConfiguredSteamStubHandler", (SteamStubHandler,), {
+        "latency": latency, "throttle": throttle, "inventory_size": inventory_size,
+    })
+    server_class = type("SteamStubServer", (ThreadingHTTPServer,), {"request_queue_size": 128})
+    server = server_class(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--rate", type=float, default=0.0, help="requests per second before answering 429")
+    parser.add_argument("--burst", type=float, default=1.0)
+    parser.add_argument("--inventory-size", type=int, default=500, help="items in every inventory")
+    args = parser.parse_args()
+    server = start_stub_server(args.port, args.latency, args.rate, args.burst, args.inventory_size)
+    print(f"Steam stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,8 @@ setup(
     install_requires=[
         "boto3",
         "botocore",
-        "joblib"
+        "joblib",
+        "numpy"
     ],
     python_requires=">=3.9",
 )
\ No newline at end of file
@@ -1,3 +1,46 @@
-from .utils_s3 import S3StorageManager
+from .utils_s3 import S3StorageManager, get_storage_manager
+from .utils_prices import (
+    PricePoints,
+    parse_steam_time,
+    format_steam_time,
+    price_points_from_list,
+    read_price_points,
+    price_points_to_list,
+    price_points_to_json,
+    pack_price_points,
+    unpack_price_points,
+)
+from .utils_validation import validate_price_history
+from .utils_results import (
+    MSGPACK_MEDIA_TYPE,
+    msgpack_available,
+    accepts_msgpack,
+    pack_series,
+    unpack_series,
+    series_to_lists,
+    encode_results,
+    decode_results,
+)
 
-__all__ = ["S3StorageManager"]
\ No newline at end of file
+__all__ = [
+    "S3StorageManager",
+    "get_storage_manager",
+    "PricePoints",
+    "parse_steam_time",
+    "format_steam_time",
+    "price_points_from_list",
+    "read_price_points",
+    "price_points_to_list",
+    "price_points_to_json",
+    "pack_price_points",
+    "unpack_price_points",
+    "validate_price_history",
+    "MSGPACK_MEDIA_TYPE",
+    "msgpack_available",
+    "accepts_msgpack",
+    "pack_series",
+    "unpack_series",
+    "series_to_lists",
+    "encode_results",
+    "decode_results",
+]
\ No newline at end of file
@@ -0,0 +1,95 @@
+from typing import NamedTuple, Optional, Tuple
+from datetime import datetime, timezone
+import numpy as np
+import calendar, json, struct, zlib
+
+# Packed layout: version byte, point count, then zlib(time deltas <i8 | prices <f8 | volumes <u4)
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<BI")
+
+MONTHS = {name: index for index, name in enumerate(calendar.month_abbr) if name}
+
+
+class PricePoints(NamedTuple):
+    """
+    Columnar price history: epoch-second timestamps, prices and volumes as numpy arrays.
+    """
+    times: np.ndarray
+    prices: np.ndarray
+    volumes: np.ndarray
+
+    def __len__(self):
+        return len(self.times)
+
+
+# Parse a Steam market timestamp such as "Oct 21 2017 01: +0" into epoch seconds (UTC)
+def parse_steam_time(value: str) -> int:
+    parts = value.split()
+    if len(parts) >= 4 and parts[0] in MONTHS:
+        hour = parts[3].rstrip(":") or "0"
+        return calendar.timegm((int(parts[2]), MONTHS[parts[0]], int(parts[1]), int(hour), 0, 0))
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+# Format epoch seconds back into the Steam market timestamp format
+def format_steam_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime("%b %d %Y %H") + ": +0"
+
+
+# Convert a list of [date, price, quantity] entries into columnar arrays
+def price_points_from_list(prices: list) -> PricePoints:
+    return PricePoints(
+        times=np.fromiter((parse_steam_time(str(entry[0])) for entry in prices), dtype="<i8", count=len(prices)),
+        prices=np.fromiter((float(entry[1]) for entry in prices), dtype="<f8", count=len(prices)),
+        volumes=np.fromiter((int(entry[2]) for entry in prices), dtype="<u4", count=len(prices)),
+    )
+
+
+# Convert a price list like price_points_from_list, returning (points, "") or (None, error) when an entry
+# cannot be converted (unparseable date, quantity that is not a non-negative integer, ...)
+def read_price_points(prices: list) -> Tuple[Optional[PricePoints], str]:
+    try:
+        return price_points_from_list(prices), ""
+    except (ValueError, TypeError, OverflowError, IndexError) as e:
+        return None, f"Unreadable price entry: {e}"
+
+
+# Convert columnar arrays back into the [date, price, quantity] list Steam returns
+def price_points_to_list(points: PricePoints) -> list:
+    return [
+        [format_steam_time(t), p, str(v)]
+        for t, p, v in zip(points.times.tolist(), points.prices.tolist(), points.volumes.tolist())
+    ]
+
+
+# Serialize columnar arrays straight to the JSON text of a [date, price, quantity] list
+def price_points_to_json(points: PricePoints) -> str:
+    return json.dumps(price_points_to_list(points))
+
+
+# Pack columnar arrays into a compact binary blob for storage
+def pack_price_points(points: PricePoints) -> bytes:
+    count = len(points)
+    time_deltas = np.diff(points.times.astype("<i8"), prepend=np.int64(0))
+    body = (
+        time_deltas.astype("<i8").tobytes()
+        + points.prices.astype("<f8").tobytes()
+        + points.volumes.astype("<u4").tobytes()
+    )
+    return PACK_HEADER.pack(PACK_VERSION, count) + zlib.compress(body, 6)
+
+
+# Unpack a binary blob produced by pack_price_points into columnar arrays
+def unpack_price_points(blob: bytes) -> PricePoints:
+    version, count = PACK_HEADER.unpack_from(blob)
+    if version != PACK_VERSION:
+        raise ValueError(f"Unsupported price points version: {version}")
+    body = zlib.decompress(memoryview(blob)[PACK_HEADER.size:])
+    return PricePoints(
+        times=np.cumsum(np.frombuffer(body, dtype="<i8", count=count, offset=0)),
+        prices=np.frombuffer(body, dtype="<f8", count=count, offset=8 * count),
+        volumes=np.frombuffer(body, dtype="<u4", count=count, offset=16 * count),
+    )
@@ -0,0 +1,54 @@
+from typing import Any, Dict, Optional, Tuple
+import json
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Results exchanged between the ML service and the API. Graphs stay in storage and only their key and
+# URL travel, predicted series are sent as packed arrays: little endian int64 epoch seconds and float32 prices.
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    return msgpack is not None and MSGPACK_MEDIA_TYPE in (accept or "")
+
+
+def pack_series(times, prices) -> Dict[str, bytes]:
+    return {
+        "times": np.asarray(times, dtype="<i8").tobytes(),
+        "prices": np.asarray(prices, dtype="<f4").tobytes(),
+    }
+
+
+def unpack_series(series: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Times and prices of a series, packed by pack_series or already spelled out as lists by series_to_lists."""
+    times, prices = series["times"], series["prices"]
+    if isinstance(times, (bytes, bytearray)):
+        return np.frombuffer(times, dtype="<i8"), np.frombuffer(prices, dtype="<f4")
+    return np.asarray(times, dtype="<i8"), np.asarray(prices, dtype="<f4")
+
+
+# JSON has no binary type, the series goes as plain lists for clients that did not ask for msgpack
+def series_to_lists(series: Dict[str, Any]) -> Dict[str, list]:
+    times, prices = unpack_series(series)
+    return {"times": times.tolist(), "prices": prices.tolist()}
+
+
+def encode_results(results: Dict[str, Any]) -> bytes:
+    return msgpack.packb(results, use_bin_type=True)
+
+
+def decode_results(body: bytes, content_type: Optional[str]) -> Dict[str, Any]:
+    """Decode a response body of the ML service, msgpack or JSON depending on its content type."""
+    if MSGPACK_MEDIA_TYPE in (content_type or ""):
+        if msgpack is None:
+            raise RuntimeError("Received a msgpack response but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
@@ -1,11 +1,16 @@
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable
+from collections import OrderedDict
 from botocore.exceptions import ClientError
-import boto3, joblib, json, io, os, logging
+import boto3, joblib, json, io, os, logging, threading, time
 
 logger = logging.getLogger(__name__)
 
 REGION_NAME = os.environ.get('AWS_REGION')
 
+# Presigned URLs are reused until this many seconds (or a fifth of their lifetime) before they expire
+PRESIGNED_URL_SAFETY_MARGIN = int(os.environ.get('PRESIGNED_URL_SAFETY_MARGIN', 300))
+PRESIGNED_URL_CACHE_SIZE = int(os.environ.get('PRESIGNED_URL_CACHE_SIZE', 10000))
+
 def load_bucket_name_from_ssm():
     ssm = boto3.client('ssm', region_name=REGION_NAME)
     param_name = '/steam-market-predictor/s3-bucket-name'
@@ -44,6 +49,10 @@ class S3StorageManager:
             logger.info(f"Failed to initialize S3 client: {e}")
             self.s3_client = None
 
+        # (operation, file_key, expiration) -> (url, reuse_until)
+        self._url_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._url_lock = threading.Lock()
+
     def upload_file(self, data: Any, file_key: str, data_type: str = 'bytes') -> bool:
         """
         Generic upload method for files (JSON dict, PNG bytes, models/scalers, etc.).
@@ -107,13 +116,36 @@ class S3StorageManager:
             logger.warning(f"Failed to download file from S3: {e}")
             return None
 
+    def open_file(self, file_key: str):
+        """
+        Open a file for streaming, returns the S3 body (read in chunks with iter_chunks, then close it) or None.
+        """
+        if not self.s3_client:
+            return None
+
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+            return response['Body']
+        except ClientError as e:
+            logger.warning(f"Failed to open file from S3: {e}")
+            return None
+
     def generate_presigned_url(self, file_key: str, operation: str = 'get_object', expiration: int = 3600) -> Optional[str]:
         """
         Generate a presigned URL for S3 operations.
+        A previously signed URL is returned while it still has a safety margin of validity left.
         """
         if not self.s3_client:
             return None
 
+        cache_key = (operation, file_key, expiration)
+        now = time.time()
+        with self._url_lock:
+            cached = self._url_cache.get(cache_key)
+            if cached and cached[1] > now:
+                self._url_cache.move_to_end(cache_key)
+                return cached[0]
+
         try:
             url = self.s3_client.generate_presigned_url(
                 operation,
@@ -123,16 +155,35 @@ class S3StorageManager:
                 },
                 ExpiresIn=expiration
             )
-            return url
         except ClientError as e:
             logger.warning(f"Failed to generate presigned URL: {e}")
             return None
 
+        margin = max(PRESIGNED_URL_SAFETY_MARGIN, expiration // 5)
+        if expiration > margin:
+            with self._url_lock:
+                self._url_cache[cache_key] = (url, now + expiration - margin)
+                self._url_cache.move_to_end(cache_key)
+                while len(self._url_cache) > PRESIGNED_URL_CACHE_SIZE:
+                    self._url_cache.popitem(last=False)
+        return url
+
     def generate_download_url(self, file_key: str, expiration: int = 3600) -> Optional[str]:
         """
         Generate a presigned URL for downloading files from S3.
         """
         return self.generate_presigned_url(file_key, 'get_object', expiration)
+
+    def generate_download_urls(self, file_keys: Iterable[str], expiration: int = 3600) -> Dict[str, Optional[str]]:
+        """
+        Generate presigned download URLs for many files at once, signing locally without network calls.
+        """
+        return {file_key: self.generate_download_url(file_key, expiration) for file_key in file_keys}
+
+    def _forget_presigned_urls(self, file_key: str):
+        with self._url_lock:
+            for cache_key in [cache_key for cache_key in self._url_cache if cache_key[1] == file_key]:
+                del self._url_cache[cache_key]
     
     def delete_file(self, file_key: str) -> bool:
         """
@@ -143,8 +194,36 @@ class S3StorageManager:
 
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
+            self._forget_presigned_urls(file_key)
             logger.info(f"File deleted from s3://{self.bucket_name}/{file_key}")
             return True
         except ClientError as e:
             logger.warning(f"Failed to delete file from S3: {e}")
-            return False
\ No newline at end of file
+            return False
+
+# Seconds between attempts to rebuild a shared manager whose S3 client failed to initialize
+STORAGE_MANAGER_RETRY_SECONDS = float(os.environ.get('STORAGE_MANAGER_RETRY_SECONDS', 30))
+
+_storage_manager = None
+_storage_manager_built_at = 0.0
+_storage_manager_lock = threading.Lock()
+
+def _needs_build(now: float) -> bool:
+    if _storage_manager is None:
+        return True
+    return _storage_manager.s3_client is None and now - _storage_manager_built_at >= STORAGE_MANAGER_RETRY_SECONDS
+
+def get_storage_manager() -> S3StorageManager:
+    """
+    Shared S3StorageManager, created on first use so the bucket lookup and client setup happen once per process.
+    If the S3 client could not be set up, it is rebuilt on a later call (at most every STORAGE_MANAGER_RETRY_SECONDS)
+    rather than keeping the failure for the life of the process.
+    """
+    global _storage_manager, _storage_manager_built_at
+    if _needs_build(time.monotonic()):
+        with _storage_manager_lock:
+            now = time.monotonic()
+            if _needs_build(now):
+                _storage_manager = S3StorageManager()
+                _storage_manager_built_at = now
+    return _storage_manager
@@ -0,0 +1,55 @@
+from typing import Tuple
+
+# Exact types of a well-formed entry as decoded from JSON, anything else goes through the full checks
+_PRICE_TYPES = {float, int}
+_QUANTITY_TYPES = {str, int}
+
+
+# Check the entries one by one in order and return the first error
+def _first_entry_error(prices: list) -> str:
+    for entry in prices:
+        if not (isinstance(entry, list) and len(entry) == 3):
+            return "Each price entry must be a list of [date, price, quantity]"
+        date, price, quantity = entry
+        if not isinstance(date, str):
+            return "Date must be a string"
+        try:
+            float(price)
+        except (ValueError, TypeError):
+            return "Price must be a number"
+        if not (isinstance(quantity, (str, int))):
+            return "Quantity must be a string or integer"
+    return ""
+
+
+# True if every entry is a [str, float | int, str | int] list, stopping at the first one that is not
+def _well_formed(prices: list) -> bool:
+    if set(map(type, prices)) != {list}:
+        return False
+    price_types, quantity_types = _PRICE_TYPES, _QUANTITY_TYPES
+    try:
+        for date, price, quantity in prices:
+            if type(date) is not str or type(price) not in price_types or type(quantity) not in quantity_types:
+                return False
+    except (ValueError, TypeError):
+        # An entry that is not exactly three values long
+        return False
+    return True
+
+
+# Validate json price history structure
+def validate_price_history(price_history: dict) -> Tuple[bool, str]:
+    """
+    Checks that price_history holds a non-empty 'prices' list of [date, price, quantity] entries.
+    Histories decoded from JSON pass a single tight pass on exact types, the per-entry checks
+    (which also accept numeric strings as prices) only run when that pass stops early.
+    """
+    if not isinstance(price_history, dict):
+        return False, "Price history must be a dictionary"
+    prices = price_history.get("prices")
+    if not isinstance(prices, list) or not prices:
+        return False, "Missing or invalid 'prices' list"
+    if _well_formed(prices):
+        return True, ""
+    error = _first_entry_error(prices)
+    return not error, error
@@ -1,8 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
-from utils_ml import PriceModel, validate_price_history
-import os, uvicorn, logging, base64
+from utils_ml import PriceModel
+from steam_market_s3_utils import (
+    validate_price_history,
+    accepts_msgpack,
+    encode_results,
+    series_to_lists,
+    MSGPACK_MEDIA_TYPE,
+)
+import os, uvicorn, logging
 from sqs_worker import sqs_worker, start_sqs_worker
+from executor import train_executor, predict_executor, ExecutorBusy, ClientDisconnected
 
 LOG_FILE = os.environ.get("ML_LOG_FILE", "/tmp/ml_service.log")
 logging.basicConfig(
@@ -27,6 +36,11 @@ async def startup_event():
     else:
         logger.info("SQS_QUEUE_URL not set, starting in HTTP mode")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    train_executor.shutdown()
+    predict_executor.shutdown()
+
 
 # Models
 class TrainRequest(BaseModel):
@@ -51,44 +65,56 @@ class MLResponse(BaseModel):
     message: str
     data: dict = None
 
+# Graph bytes stay in storage, results carry their key and URL. msgpack when the caller accepts it,
+# so the predicted series goes as packed arrays, JSON with the series spelled out otherwise.
+def _results_response(http_request: Request, message: str, result: dict):
+    result.pop("graph", None)
+    if accepts_msgpack(http_request.headers.get("accept")):
+        content = encode_results({"success": True, "message": message, "data": result})
+        return Response(content=content, media_type=MSGPACK_MEDIA_TYPE)
+    if "series" in result:
+        result["series"] = series_to_lists(result["series"])
+    return MLResponse(success=True, message=message, data=result)
+
 # Endpoints
 @app.post("/train", response_model=MLResponse)
-async def train_model(request: TrainRequest):
+async def train_model(request: TrainRequest, http_request: Request):
     """Train a model"""
     try:
         model = PriceModel(request.user_id, request.username, request.item_id, request.item_name)
         logging.info(f"Training model for item {request.item_name} (ID: {request.item_id}) of user {request.username} (ID: {request.user_id})")
         raw_prices = request.price_history.get("prices")
-        logging.info(f"Price history raw_prices: \n===========\n{raw_prices[40:]}\n===========")
-        result = model.create_model(raw_prices)
+        logging.info(f"Price history of {len(raw_prices) if isinstance(raw_prices, list) else 0} entries")
+        # Fitting takes minutes, it runs on the training executor so the other endpoints stay responsive
+        result = await train_executor.run(model.create_model, raw_prices, is_disconnected=http_request.is_disconnected)
 
         #logging.info(f"Training result: {result}")
-        if isinstance(result.get("graph"), bytes):
-            result["graph"] = base64.b64encode(result["graph"]).decode("utf-8")
-        return MLResponse(
-            success=True,
-            message="Model trained successfully",
-            data=result
-        )
+        return _results_response(http_request, "Model trained successfully", result)
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ClientDisconnected as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         logger.error(f"Error during training: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/predict", response_model=MLResponse)
-async def predict_price(request: PredictRequest):
+async def predict_price(request: PredictRequest, http_request: Request):
     """Make prediction"""
     try:
         model = PriceModel(request.user_id, request.username, request.item_id, request.item_name)
-        result = model.generate_prediction(request.start_time, request.end_time, request.data_hash)
-        #logging.info(f"Prediction result: {result}")
-
-        if isinstance(result.get("graph"), bytes):
-            result["graph"] = base64.b64encode(result["graph"]).decode("utf-8")
-        return MLResponse(
-            success=True,
-            message="Prediction completed",
-            data=result
+        result = await predict_executor.run(
+            model.generate_prediction, request.start_time, request.end_time, request.data_hash,
+            is_disconnected=http_request.is_disconnected,
         )
+        #logging.info(f"Prediction result: {result}")
+        return _results_response(http_request, "Prediction completed", result)
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ClientDisconnected as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         logger.error(f"Error during prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -96,7 +122,8 @@ async def predict_price(request: PredictRequest):
 @app.post("/validate", response_model=MLResponse)
 async def validate_price_history_endpoint(price_history: dict):
     """Validate price history data format"""
-    logger.info(f"Received for validation: {price_history}")
+    prices = price_history.get("prices")
+    logger.info(f"Received for validation: {len(prices) if isinstance(prices, list) else 0} price entries")
     try:
         is_valid, message = validate_price_history(price_history)
         logger.info(f"Validation result: valid={is_valid}, message='{message}'")
@@ -116,7 +143,8 @@ async def health_check():
         "app_status": "healthy",
         "sqs_worker_status": "healthy" if sqs_worker.running else "stopped",
         "sqs_queue_url": sqs_worker.queue_url,
-        "sqs_dlq_url": sqs_worker.dlq_url
+        "sqs_dlq_url": sqs_worker.dlq_url,
+        "executors": {"train": train_executor.status(), "predict": predict_executor.status()},
     }
 
 if __name__ == "__main__":
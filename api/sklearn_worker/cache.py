@@ -0,0 +1,57 @@
+import redis
+import os, json, logging
+
+logger = logging.getLogger(__name__)
+
+# Same Redis and key layout as the API cache (app/services/redis.py)
+REDIS_HOST = os.environ.get("REDIS_HOST")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+REDIS_DB = int(os.environ.get("REDIS_DB", 0))
+REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
+
+GENERATION_KEY_PREFIX = "gen:"
+GENERATION_TTL = int(os.environ.get("CACHE_GENERATION_TTL", 7 * 24 * 3600))
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+_client = None
+
+def _get_client():
+    global _client
+    if _client is None and REDIS_HOST:
+        _client = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            socket_timeout=5,
+        )
+    return _client
+
+# Bump namespace generations so the API stops serving keys derived from the old ones
+def bump_generation(*namespaces: str) -> bool:
+    client = _get_client()
+    if client is None:
+        logger.warning("REDIS_HOST not set, cannot invalidate cached API data")
+        return False
+
+    generation_keys = [GENERATION_KEY_PREFIX + namespace for namespace in namespaces]
+    try:
+        pipe = client.pipeline(transaction=False)
+        for gen_key in generation_keys:
+            pipe.incr(gen_key)
+            pipe.expire(gen_key, GENERATION_TTL)
+        # API replicas hold generations in a local tier, tell them to drop the old ones
+        pipe.publish(INVALIDATION_CHANNEL, json.dumps({
+            "origin": "sklearn_worker",
+            "keys": generation_keys,
+            "patterns": [],
+        }))
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to bump cache generations {namespaces}: {e}")
+        return False
+
+# A saved model index changes the group's models and has_model flag, as seen by the group listing too
+def invalidate_group_models(group_id: int, user_id: int) -> bool:
+    return bump_generation(f"group:{group_id}", f"user:{user_id}", "groups")
@@ -5,6 +5,7 @@ from psycopg2 import sql
 from distutils.util import strtobool
 import os, boto3, json, logging
 from botocore.exceptions import ClientError
+from steam_market_s3_utils import unpack_price_points
 
 logger = logging.getLogger(__name__)
 
@@ -112,4 +113,20 @@ def model_save_ml_index(user_id: int, group_id: int, item_id: int, data_hash: st
         "group_id": group_id,
         "item_id": item_id,
         "data_hash": data_hash,
-    }
\ No newline at end of file
+    }
+
+# Get the packed price points of an item as numpy arrays, or None if it has none stored.
+# Items referencing a shared market price history read it from market_price_histories.
+def model_get_item_price_points(item_id: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COALESCE(group_item_prices.points, market_price_histories.points) FROM group_items
+        LEFT JOIN group_item_prices ON group_item_prices.item_id = group_items.id
+        LEFT JOIN market_price_histories ON market_price_histories.id = group_items.price_history_id
+        WHERE group_items.id = %s
+    """, (item_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return unpack_price_points(row[0]) if row and row[0] is not None else None
\ No newline at end of file
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio, functools, logging, os, threading
+
+logger = logging.getLogger(__name__)
+
+# Trainings running at once, also the size of the training semaphore in utils_ml
+ML_TRAIN_WORKERS = int(os.environ.get("ML_TRAIN_WORKERS", 2))
+ML_TRAIN_QUEUE_LIMIT = int(os.environ.get("ML_TRAIN_QUEUE_LIMIT", 8))
+# Predictions get their own workers so they are not stuck behind minutes-long trainings
+ML_PREDICT_WORKERS = int(os.environ.get("ML_PREDICT_WORKERS", 4))
+ML_PREDICT_QUEUE_LIMIT = int(os.environ.get("ML_PREDICT_QUEUE_LIMIT", 32))
+# Seconds between checks whether the client that asked for a job is still connected
+ML_DISCONNECT_POLL = float(os.environ.get("ML_DISCONNECT_POLL", 0.5))
+
+
+class ExecutorBusy(RuntimeError):
+    pass
+
+
+class ClientDisconnected(RuntimeError):
+    pass
+
+
+class JobExecutor:
+    """
+    Runs CPU-bound jobs on a dedicated thread pool so the event loop keeps serving /health and /validate.
+    At most max_workers jobs run and max_queued wait, further jobs are refused with ExecutorBusy.
+    Jobs receive a threading.Event that is set when the client goes away: a job still queued is dropped,
+    a running one can check the event between its stages and stop early.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queued: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.pending = 0
+        self.cancelled = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"ml-{name}")
+
+    async def run(self, func: Callable[..., Any], *args,
+                  is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> Any:
+        """Run func(*args, cancelled=event) on the pool, raises ClientDisconnected if the client left first."""
+        if self.pending >= self.max_workers + self.max_queued:
+            raise ExecutorBusy(f"Too many {self.name} jobs in progress, please try again later.")
+
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(functools.partial(func, *args, cancelled=cancelled))
+        # Counted until the job actually finishes, even if its caller stopped waiting for it
+        self.pending += 1
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(self._job_done, done))
+        job = asyncio.wrap_future(future)
+
+        while True:
+            done, _ = await asyncio.wait({job}, timeout=ML_DISCONNECT_POLL if is_disconnected else None)
+            if done:
+                return job.result()
+            if await is_disconnected():
+                cancelled.set()
+                self.cancelled += 1
+                # Only stops a job that has not started, a running one sees the event
+                future.cancel()
+                # Nobody awaits the job anymore, retrieve its outcome so it is not reported as unhandled
+                job.add_done_callback(lambda abandoned: abandoned.cancelled() or abandoned.exception())
+                raise ClientDisconnected(f"Client disconnected, {self.name} job cancelled")
+
+    def _job_done(self, future):
+        self.pending -= 1
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"{self.name} job failed: {future.exception()}")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "running": min(self.pending, self.max_workers),
+            "queued": max(0, self.pending - self.max_workers),
+            "cancelled": self.cancelled,
+        }
+
+
+train_executor = JobExecutor("training", ML_TRAIN_WORKERS, ML_TRAIN_QUEUE_LIMIT)
+predict_executor = JobExecutor("prediction", ML_PREDICT_WORKERS, ML_PREDICT_QUEUE_LIMIT)
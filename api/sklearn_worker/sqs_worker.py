@@ -5,9 +5,11 @@ import logging
 import time
 import threading
 from botocore.exceptions import ClientError
-from utils_ml import PriceModel, validate_price_history
+from utils_ml import PriceModel
+from steam_market_s3_utils import validate_price_history
 from fastapi.responses import JSONResponse
-from db import model_save_ml_index
+from db import model_save_ml_index, model_get_item_price_points
+from cache import invalidate_group_models
 
 logger = logging.getLogger(__name__)
 
@@ -75,13 +77,21 @@ class SQSWorker:
             
             logger.info(f"Training model for {item_name} (group_id: {group_id},item_id: {item_id}, user: {username})")
             
-            is_valid, error_msg = validate_price_history(price_history)
-            if not is_valid:
-                logger.error(f"Invalid price history: {error_msg}")
-                return False
+            if price_history is None:
+                # Jobs without an inline history read the packed price points straight from the database
+                raw_prices = model_get_item_price_points(item_id)
+                if raw_prices is None or len(raw_prices) == 0:
+                    logger.error(f"No stored price points for item {item_id}")
+                    return False
+            else:
+                is_valid, error_msg = validate_price_history(price_history)
+                if not is_valid:
+                    logger.error(f"Invalid price history: {error_msg}")
+                    return False
+                raw_prices = price_history.get('prices')
             
             model = PriceModel(user_id, username, item_id, item_name)
-            result = model.create_model(price_history.get('prices'))
+            result = model.create_model(raw_prices)
 
             model_save_ml_index(
                 user_id,
@@ -89,6 +99,7 @@ class SQSWorker:
                 item_id,
                 result["data_hash"]
             )
+            invalidate_group_models(group_id, user_id)
             
             logger.info(f"Model training completed for item {item_id}")
             return True
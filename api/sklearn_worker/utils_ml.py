@@ -3,18 +3,18 @@ from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from queue import Queue, Full
 from distutils.util import strtobool 
-from steam_market_s3_utils import S3StorageManager
+from typing import Optional
+from steam_market_s3_utils import S3StorageManager, PricePoints, pack_series
 #from shared.steam_market_s3_utils import S3StorageManager
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from executor import ML_TRAIN_WORKERS
 import pandas as pd
 import numpy as np
 import os, json, threading, hashlib, io, joblib, logging
 
-# Limit concurrent trainings
-MAX_CONCURRENT_TRAININGS = 2
-training_semaphore = threading.Semaphore(MAX_CONCURRENT_TRAININGS)
+# Limit concurrent trainings to the training executor's workers, the SQS worker waits for a free slot
+training_semaphore = threading.Semaphore(ML_TRAIN_WORKERS)
 
 # Global S3 storage manager instance
 s3_storage_manager = S3StorageManager()
@@ -23,27 +23,6 @@ LOCAL_STORAGE = bool(strtobool(os.environ.get("LOCAL_STORAGE", "False")))
 #LOCAL_STORAGE = True
 logger = logging.getLogger(__name__)
 
-# Validate json price history structure
-def validate_price_history(price_history: dict):
-    if not isinstance(price_history, dict):
-        return False, "Price history must be a dictionary"
-    prices = price_history.get("prices")
-    if not isinstance(prices, list) or not prices:
-        return False, "Missing or invalid 'prices' list"
-    for entry in prices:
-        if not (isinstance(entry, list) and len(entry) == 3):
-            return False, "Each price entry must be a list of [date, price, quantity]"
-        date, price, quantity = entry
-        if not isinstance(date, str):
-            return False, "Date must be a string"
-        try:
-            float(price)
-        except (ValueError, TypeError):
-            return False, "Price must be a number"
-        if not (isinstance(quantity, (str, int))):
-            return False, "Quantity must be a string or integer"
-    return True, ""
-
 class PriceModel:
     """
     PriceModel provides methods to train, save, and use a machine learning model for predicting item prices over time.
@@ -52,7 +31,6 @@ class PriceModel:
     """
 
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) #+ "/sklearn_worker/"
-    QUEUE_STATUS_PATH = os.path.join(BASE_DIR, "tmp/queue_status.txt")
     MODEL_DIR = os.path.join(BASE_DIR, "tmp/models/")
     SCALER_DIR = os.path.join(BASE_DIR, "tmp/scalers/")
     FEATURES_DIR = os.path.join(BASE_DIR, "tmp/features/")
@@ -62,102 +40,39 @@ class PriceModel:
         "is_weekend", "price_rolling_mean_7", "price_diff", "volume_rolling_mean_7"
     ]
 
-    # Shared queue for all training instances among users
-    shared_queue = Queue(maxsize=20)
-    _worker_started = False
-
     def __init__(self, user_id: int, username: str, item_id: int, item_name: str):
         self.user_id = user_id
         self.username = username
         self.item_id = item_id
         self.item_name = item_name
 
-    # Get a snapshot of the queue contents
-    @classmethod
-    def write_queue_status(cls):
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(cls.QUEUE_STATUS_PATH), exist_ok=True)
-        items = list(cls.shared_queue.queue)
-        with open(cls.QUEUE_STATUS_PATH, "w") as f:
-            f.write("\n")
-            f.write("="*30 + "\n")
-            f.write("   PriceModel Training Queue\n")
-            f.write("="*30 + "\n")
-            if not items:
-                f.write("Queue is empty.\n")
-            else:
-                for idx, job in enumerate(items, 1):
-                    desc = job.get("func", None)
-                    if desc:
-                        desc = desc.__name__
-                    else:
-                        desc = str(job)
-                    f.write(f"{idx}. Job: {desc}\n")
-            f.write("="*30 + "\n")
-            f.write(f"Total jobs in queue: {len(items)}\n")
-            f.write("="*30 + "\n")
-
-    # Start the background worker
-    @classmethod
-    def _start_worker(cls):
-        if not cls._worker_started:
-            t = threading.Thread(target=cls._queue_worker, daemon=True)
-            t.start()
-            cls._worker_started = True
-
-    # Background worker for processing jobs
-    @classmethod
-    def _queue_worker(cls):
-        while True:
-            job = cls.shared_queue.get()
-            if job is None:
-                break
-            try:
-                result = job["func"](*job["args"], **job["kwargs"])
-                job["result_queue"].put(result)
-            except Exception as e:
-                job["result_queue"].put(e)
-            finally:
-                cls.shared_queue.task_done()
-
-    # Add training job to the queue
+    # Train under the training semaphore
     def _train_and_eval(self, raw_prices: str):
-        acquired = training_semaphore.acquire(blocking=False)
-        if not acquired:
-            raise RuntimeError("Server is busy. Please try again later.")
-
-        try:
-            self._start_worker()
-            result_queue = Queue()
-            try:
-                PriceModel.shared_queue.put({
-                    "func": PriceModel._train_and_eval_actual,
-                    "args": (self, raw_prices),
-                    "kwargs": {},
-                    "result_queue": result_queue
-                }, block=False)
-            except Full:
-                raise RuntimeError("Training queue is full. Please try again later.")
-            PriceModel.write_queue_status()
-            result = result_queue.get()
-            if isinstance(result, Exception):
-                raise result
-            return result
-        finally:
-            training_semaphore.release()
+        with training_semaphore:
+            return PriceModel._train_and_eval_actual(self, raw_prices)
     
     # Normalize price data
     @staticmethod
-    def _normalize_prices(raw_prices: list):
-        # Expecting raw_prices as a list of [date, price, quantity]
-        df = pd.DataFrame(raw_prices, columns=["time", "price", "volume"])
-        logger.info(f"Processing raw prices:\n {raw_prices[:20]}")
-        df['time'] = df['time'].astype(str)
-        df['time'] = df['time'].str.replace(r' \+0$', '', regex=True)
-        df['time'] = df['time'].str.replace(r':$', '', regex=True)
-        df['time'] = pd.to_datetime(df['time'], errors='coerce')
-        df['time_numeric'] = df['time'].astype('int64') // 10**9
-        df["volume"] = pd.to_numeric(df["volume"], errors="coerce").fillna(0)
+    def _normalize_prices(raw_prices):
+        if isinstance(raw_prices, PricePoints):
+            # Columnar arrays from the database, timestamps are already epoch seconds
+            logger.info(f"Processing {len(raw_prices)} packed price points")
+            df = pd.DataFrame({
+                "time": pd.to_datetime(raw_prices.times, unit="s"),
+                "price": raw_prices.prices,
+                "volume": raw_prices.volumes.astype("float64"),
+            })
+            df['time_numeric'] = raw_prices.times
+        else:
+            # Expecting raw_prices as a list of [date, price, quantity]
+            df = pd.DataFrame(raw_prices, columns=["time", "price", "volume"])
+            logger.info(f"Processing raw prices:\n {raw_prices[:20]}")
+            df['time'] = df['time'].astype(str)
+            df['time'] = df['time'].str.replace(r' \+0$', '', regex=True)
+            df['time'] = df['time'].str.replace(r':$', '', regex=True)
+            df['time'] = pd.to_datetime(df['time'], errors='coerce')
+            df['time_numeric'] = df['time'].astype('int64') // 10**9
+            df["volume"] = pd.to_numeric(df["volume"], errors="coerce").fillna(0)
         df = df.sort_values("time")
 
         # Create dataframe for extra features
@@ -208,10 +123,8 @@ class PriceModel:
         return pipe, scaler, df, {"mse": mse, "r2": r2}
 
     # Generate training graph to display model performance
-    def _generate_training_graph(self, json_obj: str, pipe, scaler):
-        print(f"Sample prices: {json_obj[:10]}")
-        df = pd.DataFrame(json_obj)
-        df = self._normalize_prices(df)
+    def _generate_training_graph(self, json_obj, pipe, scaler):
+        df = self._normalize_prices(json_obj)
         X = df[PriceModel.FEATURE_COLS]
         X_normalized = scaler.transform(X)
         y = df['price']
@@ -220,32 +133,32 @@ class PriceModel:
         df = df.sort_values('time')
         buf = io.BytesIO()
 
-        # Create graph
-        plt.figure(figsize=(12, 6))
-        plt.plot(df['time'], y, label='Actual Price', marker='o')
-        plt.plot(df['time'], pred, label='Predicted Price', marker='x')
-        plt.xlabel('Time')
-        plt.ylabel('Price')
-        plt.title(f'Actual vs Predicted Price for user {self.username}, item {self.item_name}')
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(buf, format='png')
-        plt.close()
+        # Create graph, on its own figure since trainings and predictions draw from several threads
+        fig = Figure(figsize=(12, 6))
+        ax = fig.add_subplot()
+        ax.plot(df['time'], y, label='Actual Price', marker='o')
+        ax.plot(df['time'], pred, label='Predicted Price', marker='x')
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Price')
+        ax.set_title(f'Actual vs Predicted Price for user {self.username}, item {self.item_name}')
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(buf, format='png')
         buf.seek(0)
         return buf.getvalue()
 
     # Generate prediction graph for a given predictions
     def _generate_prediction_graph(self, prediction_df: pd.DataFrame):
         buf = io.BytesIO()
-        plt.figure(figsize=(12, 6))
-        plt.plot(prediction_df['time'], prediction_df['predicted_price'], label='Predicted Price', marker='x')
-        plt.xlabel('Time')
-        plt.ylabel('Predicted Price')
-        plt.title(f'Predicted Price for user {self.username}, item {self.item_name}')
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(buf, format='png')
-        plt.close()
+        fig = Figure(figsize=(12, 6))
+        ax = fig.add_subplot()
+        ax.plot(prediction_df['time'], prediction_df['predicted_price'], label='Predicted Price', marker='x')
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Predicted Price')
+        ax.set_title(f'Predicted Price for user {self.username}, item {self.item_name}')
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(buf, format='png')
         buf.seek(0)
         return buf.getvalue()
     
@@ -319,14 +232,23 @@ class PriceModel:
         except Exception as e:
             raise RuntimeError(f"Failed to save model data to S3: {e}")
 
+    # Stop a job whose client went away before its next stage
+    @staticmethod
+    def _check_cancelled(cancelled: Optional[threading.Event], stage: str):
+        if cancelled is not None and cancelled.is_set():
+            raise RuntimeError(f"Cancelled before {stage}")
+
     # Create model from raw price data
-    def create_model(self, raw_prices: str):
+    def create_model(self, raw_prices: str, cancelled: Optional[threading.Event] = None):
         try:
+            self._check_cancelled(cancelled, "training")
             df = self._normalize_prices(raw_prices)
             time_stamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
             data_hash = self._hash_dataset(self.user_id, self.item_id, time_stamp, df)
             
             pipe, scaler, df, metrics = self._train_and_eval(raw_prices)
+            # Artifacts of a training nobody waits for anymore would never be indexed
+            self._check_cancelled(cancelled, "saving the model")
             feature_means = {
                 "volume": float(df["volume"].mean()),
                 "price_rolling_mean_7": float(df["price_rolling_mean_7"].mean()),
@@ -370,14 +292,17 @@ class PriceModel:
                 "data_hash": data_hash,
                 "metrics": metrics,
                 "graph": graph,
+                "graph_key": graph_png,
                 "graph_url": graph_url
             }
         except Exception as e:
             raise RuntimeError(f"Error in create_model: {e}")
 
     # Generate a prediction given a time range
-    def generate_prediction(self, start_time: str, end_time: str, data_hash: str):
+    def generate_prediction(self, start_time: str, end_time: str, data_hash: str,
+                            cancelled: Optional[threading.Event] = None):
         try:
+            self._check_cancelled(cancelled, "prediction")
             # Reconstruct paths from data_hash
             model_path = f"models/model_{data_hash}.joblib"
             scaler_path = f"scalers/scaler_{data_hash}.joblib"
@@ -432,6 +357,7 @@ class PriceModel:
                 with open(graph_path, "wb") as f:
                     f.write(graph)
                 logger.info(f"Prediction graph saved locally at {graph_path}")
+                graph_key = graph_path
                 graph_url = graph_path
             elif s3_storage_manager.s3_client:
                 graph_key = png_path
@@ -440,7 +366,12 @@ class PriceModel:
                 graph_url = s3_storage_manager.generate_download_url(graph_key)
             else:
                 raise RuntimeError("No valid storage method configured for saving prediction graph. Ensure S3 client is available or LOCAL_STORAGE is set.")
-            return { "graph": graph, "graph_url": graph_url }
+            return {
+                "graph": graph,
+                "graph_key": graph_key,
+                "graph_url": graph_url,
+                "series": pack_series(times.astype("int64") // 10**9, predicted_prices),
+            }
         except Exception as e:
             raise RuntimeError(f"Error in generate_prediction: {e}")
     
@@ -1,4 +1,4 @@
-import requests, json, base64, time
+import requests, json, time
 import streamlit as st
 import os
 
@@ -447,6 +447,24 @@ def get_group_model_info(token: str):
                 st.error(f"Failed to fetch model info: {r.status_code}\n{r.text}")
 
 
+# Show a training graph from its presigned URL, or through the API when the URL is a local storage path
+def show_training_graph(token: str, group_id: int, item_id, graph_url):
+    if not graph_url:
+        return
+    caption = f"Training Graph for Item {item_id}" if item_id is not None else "Training Graph"
+    if graph_url.startswith(("http://", "https://")):
+        st.image(graph_url, caption=caption)
+        return
+    if item_id is not None:
+        r = requests.get(
+            f"{API_URL}/group/{group_id}/items/{item_id}/graph",
+            headers={"Authorization": f"Bearer {token}", "Accept": "image/png"},
+        )
+        if r.status_code == 200 and r.headers.get("content-type", "").startswith("image/"):
+            st.image(r.content, caption=caption)
+            return
+    st.info(f"{caption} is stored at {graph_url}")
+
 def train_group(token: str):
     st.header("Train Group Model")
     group_id = st.number_input(
@@ -456,7 +474,7 @@ def train_group(token: str):
         group_id = int(group_id)
         r = requests.post(
             f"{API_URL}/group/{group_id}/train",
-            headers={"Authorization": f"Bearer {token}"},
+            headers={"Authorization": f"Bearer {token}", "Accept": "image/png, application/json"},
             json={"group_id": group_id},
         )
         if r.status_code == 200:
@@ -467,27 +485,27 @@ def train_group(token: str):
             else:
                 st.success("Model trained!")
                 result = r.json()
-                trained_models = result.get("trained_models", [])
+                # A single trained item comes back as its own graph_url and metrics when the PNG was not available
+                trained_models = result.get("trained_models") or ([result] if "metrics" in result else [])
                 if trained_models:
                     for _, model in enumerate(trained_models):
-                        st.write(
-                            f"### {model.get('item_name')} | Item ID: {model.get('item_id')}"
-                        )
+                        if model.get("item_id") is not None:
+                            st.write(
+                                f"### {model.get('item_name')} | Item ID: {model.get('item_id')}"
+                            )
                         metrics = model.get("metrics", {})
                         if metrics:
                             st.write("**Metrics:**")
                             for k, v in metrics.items():
                                 st.write(f"- {k}: {v}")
-                        graph_b64 = model.get("graph")
-                        if graph_b64:
-                            img_bytes = base64.b64decode(graph_b64)
-                            st.image(
-                                img_bytes,
-                                caption=f"Training Graph for Item {model.get('item_id')}",
-                            )
+                        show_training_graph(token, group_id, model.get("item_id"), model.get("graph_url"))
                         st.write("---")
                 else:
                     st.info("No models were trained.")
+                for failure in result.get("failed_models", []):
+                    st.warning(
+                        f"{failure.get('item_name')} | Item ID: {failure.get('item_id')}: {failure.get('error')}"
+                    )
         else:
             try:
                 st.error(f"Failed to train group: {r.status_code}\n{r.json()}")
@@ -526,7 +544,7 @@ def predict_item(token: str):
         r = requests.post(
             f"{API_URL}/group/{group_id}/predict",
             json={"item_id": item_id, "start_time": start_time, "end_time": end_time},
-            headers={"Authorization": f"Bearer {token}"},
+            headers={"Authorization": f"Bearer {token}", "Accept": "image/png, application/json"},
         )
         if r.status_code == 200:
             st.success("Prediction complete!")
@@ -535,22 +553,20 @@ def predict_item(token: str):
             else:
                 result = r.json()
                 
-                # Display the prediction graph if it exists
-                graph_b64 = result.get("graph")
-                if graph_b64:
-                    try:
-                        img_bytes = base64.b64decode(graph_b64)
-                        st.image(img_bytes, caption="Prediction Graph")
-                    except Exception as e:
-                        st.error(f"Error decoding prediction graph: {e}")
+                # Display the predicted prices if they were returned
+                predictions = result.get("predictions")
+                if predictions:
+                    st.line_chart({"Predicted Price": {date: price for date, price in predictions}})
                 
-                # Display the graph URL if available
+                # Display the graph URL if available, a local storage path is not reachable from the browser
                 graph_url = result.get("graph_url")
-                if graph_url:
+                if graph_url and graph_url.startswith(("http://", "https://")):
                     st.markdown(f'[View Prediction Graph]({graph_url})')
+                elif graph_url:
+                    st.info(f"Prediction graph is stored at {graph_url}")
                 
                 # Display any other result data
-                other_data = {k: v for k, v in result.items() if k not in ['graph', 'graph_url']}
+                other_data = {k: v for k, v in result.items() if k not in ['graph_url', 'predictions']}
                 if other_data:
                     st.subheader("Additional Data:")
                     for k, v in other_data.items():